@@ -0,0 +1,59 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import FaultReport, FaultReporter
+
+DIMENSIONS = ("status", "severity", "category", "building")
+BUCKETS = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+CACHE_PREFIX = "analytics:faults:"
+
+
+def _cache_key(**params):
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return CACHE_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def fault_counts(group_by, bucket=None, filters=None, since=None, until=None, user_id=None):
+    """Fault report counts grouped by ``group_by`` and optionally a time bucket.
+
+    One GROUP BY query; the database returns a row per combination, never
+    the reports themselves. ``user_id`` limits the counts to faults that
+    user reported or added a "+1" to. Results are cached for
+    FAULT_ANALYTICS_CACHE_SECONDS, so they can lag that far behind writes.
+
+    Returns a list of dicts with the grouped fields, ``period`` (an ISO date)
+    when bucketed, and ``count``.
+    """
+    filters = {field: value for field, value in (filters or {}).items() if value}
+    key = _cache_key(group_by=group_by, bucket=bucket, filters=filters, since=since, until=until, user_id=user_id)
+    groups = cache.get(key)
+    if groups is not None:
+        return groups
+
+    reports = FaultReport.objects.filter(**filters)
+    if user_id is not None:
+        reports = reports.filter(
+            Q(reported_by_id=user_id) | Q(id__in=FaultReporter.objects.filter(user_id=user_id).values("fault_id"))
+        )
+    if since:
+        reports = reports.filter(created_at__date__gte=since)
+    if until:
+        reports = reports.filter(created_at__date__lte=until)
+    fields = list(group_by)
+    if bucket:
+        reports = reports.annotate(period=BUCKETS[bucket]("created_at"))
+        fields.append("period")
+    # order_by() clears any default ordering so it cannot widen the GROUP BY
+    rows = reports.values(*fields).annotate(count=Count("id")).order_by(*fields)
+    groups = []
+    for row in rows:
+        if bucket:
+            row["period"] = row["period"].date().isoformat()
+        groups.append(row)
+    cache.set(key, groups, settings.FAULT_ANALYTICS_CACHE_SECONDS)
+    return groups
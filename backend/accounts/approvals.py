@@ -0,0 +1,330 @@
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from . import notify, slots
+from .booking import ROOM_MODELS, room_field, approved_series
+from .models import (
+    Profile, RoleRequest, LibraryStatus, LabStatus, LibraryUpdateRequest, LabUpdateRequest,
+    RoomRequest,
+)
+
+MAX_BATCH = 500
+KINDS = ("room", "library", "lab", "role")
+ACTIONS = ("approve", "reject")
+
+
+def _lock(model, ids, related=()):
+    return {
+        obj.id: obj
+        for obj in model.objects.select_for_update().filter(id__in=ids).select_related(*related).order_by("id")
+    }
+
+
+def _room_id(req):
+    return req.lab_id if req.room_type == "lab" else req.classroom_id
+
+
+def _approve_rooms(reqs, approver, now, outcomes):
+    """Approves room requests that already name a room, refusing overlaps.
+
+    Bookings already approved, approved recurring series and the requests
+    accepted earlier in this same batch all count as taken, so two requests
+    in the batch cannot both win the same slot.
+    """
+    candidates = []
+    for req in reqs:
+        if _room_id(req):
+            candidates.append(req)
+        else:
+            outcomes[req.id] = ("needs_room", "Pick a room first, or use auto-assign")
+    if not candidates:
+        return []
+
+    rooms = defaultdict(set)
+    days = {req.requested_date for req in candidates}
+    for req in candidates:
+        rooms[req.room_type].add(_room_id(req))
+    taken = defaultdict(list)  # (room_type, room_id, day) -> [(start, end)]
+    for room_type, room_ids in rooms.items():
+        # Same lock the single approve takes, so the two paths serialize
+        list(ROOM_MODELS[room_type].objects.select_for_update().filter(id__in=room_ids).values_list("id", flat=True))
+        field = room_field(room_type)
+        booked = RoomRequest.objects.filter(
+            **{f"{field}_id__in": room_ids}, status="approved", requested_date__in=days,
+        ).values_list(f"{field}_id", "requested_date", "start_time", "end_time")
+        for room_id, day, start, end in booked:
+            taken[(room_type, room_id, day)].append((start, end))
+        for series in approved_series(room_type, room_ids, min(days), max(days)):
+            for day in series.occurrences(min(days), max(days)):
+                if day in days:
+                    taken[(room_type, series.room_id, day)].append((series.start_time, series.end_time))
+
+    approved = []
+    for req in candidates:
+        key = (req.room_type, _room_id(req), req.requested_date)
+        if any(start < req.end_time and end > req.start_time for start, end in taken[key]):
+            outcomes[req.id] = ("conflict", "The room is already booked for an overlapping time")
+            continue
+        taken[key].append((req.start_time, req.end_time))
+        req.status = "approved"
+        req.approved_by = approver
+        req.approved_at = now
+        req.updated_at = now
+        approved.append(req)
+        outcomes[req.id] = ("approved", "")
+    RoomRequest.objects.bulk_update(approved, ["status", "approved_by", "approved_at", "updated_at"], batch_size=MAX_BATCH)
+    slots.add_to_occupancy(
+        (req.room_type, _room_id(req), req.requested_date, slots.slot_mask(req.start_time, req.end_time))
+        for req in approved
+    )
+    return [
+        notify.notice(req.requested_by, "room.approved", room_type=req.room_type, date=str(req.requested_date))
+        for req in approved
+    ]
+
+
+def _approve_libraries(reqs, approver, now, outcomes):
+    libraries, created = {}, []
+    for req in reqs:
+        if req.library_id:
+            # Requests for the same library share one instance; later ids win
+            lib = libraries.setdefault(req.library_id, req.library)
+            lib.current_occupancy = req.requested_current_occupancy
+            lib.is_open = req.requested_is_open
+            if req.requested_name:
+                lib.name = req.requested_name
+            if req.requested_max_capacity:
+                lib.max_capacity = req.requested_max_capacity
+            lib.updated_at = now
+        else:
+            created.append(LibraryStatus(
+                name=req.requested_name or "New Library",
+                max_capacity=req.requested_max_capacity or 100,
+                current_occupancy=req.requested_current_occupancy,
+                is_open=req.requested_is_open,
+            ))
+        req.status = "approved"
+        req.approved_by = approver
+        req.updated_at = now
+        outcomes[req.id] = ("approved", "")
+    LibraryStatus.objects.bulk_update(
+        list(libraries.values()), ["current_occupancy", "is_open", "name", "max_capacity", "updated_at"], batch_size=MAX_BATCH
+    )
+    LibraryStatus.objects.bulk_create(created, batch_size=MAX_BATCH)
+    LibraryUpdateRequest.objects.bulk_update(reqs, ["status", "approved_by", "updated_at"], batch_size=MAX_BATCH)
+    return []
+
+
+def _approve_labs(reqs, approver, now, outcomes):
+    labs = {}
+    for req in reqs:
+        lab = labs.setdefault(req.lab_id, req.lab)
+        lab.current_occupancy = req.requested_current_occupancy
+        lab.is_available = req.requested_is_available
+        lab.updated_at = now
+        req.status = "approved"
+        req.approved_by = approver
+        req.updated_at = now
+        outcomes[req.id] = ("approved", "")
+    LabStatus.objects.bulk_update(
+        list(labs.values()), ["current_occupancy", "is_available", "updated_at"], batch_size=MAX_BATCH
+    )
+    LabUpdateRequest.objects.bulk_update(reqs, ["status", "approved_by", "updated_at"], batch_size=MAX_BATCH)
+    return []
+
+
+def _approve_roles(reqs, approver, now, outcomes):
+    # bulk_update skips the RoleRequest post_save signal, so profiles are set here
+    profiles = {p.user_id: p for p in Profile.objects.filter(user_id__in={req.user_id for req in reqs})}
+    missing = [Profile(user_id=req.user_id) for req in reqs if req.user_id not in profiles]
+    for profile in Profile.objects.bulk_create(missing):
+        profiles[profile.user_id] = profile
+    for req in reqs:
+        profile = profiles[req.user_id]
+        profile.role = req.requested_role
+        profile.updated_at = now
+        if req.requested_role == "manager" and not profile.manager_type:
+            print(f"WARNING: Manager role approved but manager_type is not set for {req.user.email}")
+        req.status = "approved"
+        outcomes[req.id] = ("approved", "")
+    Profile.objects.bulk_update(list(profiles.values()), ["role", "updated_at"], batch_size=MAX_BATCH)
+    notify.role_changed(list(profiles))
+    RoleRequest.objects.bulk_update(reqs, ["status"], batch_size=MAX_BATCH)
+    return [notify.notice(req.user, "role.approved", role=req.requested_role) for req in reqs]
+
+
+def _reject(kind, model, reqs, approver, reason, now, outcomes):
+    fields = ["status"]
+    for req in reqs:
+        req.status = "rejected"
+        if kind != "role":
+            req.approved_by = approver
+            req.rejection_reason = reason
+            req.updated_at = now
+        outcomes[req.id] = ("rejected", "")
+    if kind != "role":
+        fields += ["approved_by", "rejection_reason", "updated_at"]
+    model.objects.bulk_update(reqs, fields, batch_size=MAX_BATCH)
+    if kind == "room":
+        return [
+            notify.notice(req.requested_by, "room.rejected", room_type=req.room_type, date=str(req.requested_date), reason=reason)
+            for req in reqs
+        ]
+    if kind == "role":
+        return [notify.notice(req.user, "role.rejected", role=req.requested_role) for req in reqs]
+    return []
+
+
+_HANDLERS = {
+    "room": (RoomRequest, ("requested_by",), _approve_rooms),
+    "library": (LibraryUpdateRequest, ("library",), _approve_libraries),
+    "lab": (LabUpdateRequest, ("lab",), _approve_labs),
+    "role": (RoleRequest, ("user",), _approve_roles),
+}
+
+
+def bulk_decide(kind, ids, action, approver, reason=""):
+    """Approves or rejects many pending requests of one kind in one transaction.
+
+    Rows are locked and read in one query, state changes are written with
+    bulk_update and notifications queued as a single job. Returns a dict
+    of id -> (outcome, message) where outcome is one of approved, rejected,
+    not_found, not_pending, needs_room or conflict; ids that fail are
+    skipped without affecting the rest of the batch.
+    """
+    model, related, approve = _HANDLERS[kind]
+    outcomes = {}
+    now = timezone.now()
+    with transaction.atomic():
+        rows = _lock(model, ids, related)
+        pending = []
+        for obj_id in ids:
+            obj = rows.get(obj_id)
+            if obj is None:
+                outcomes[obj_id] = ("not_found", "Request not found")
+            elif obj.status != "pending":
+                outcomes[obj_id] = ("not_pending", f"Request is already {obj.status}")
+            else:
+                pending.append(obj)
+        # Duplicate ids in the input are decided once
+        pending = list({obj.id: obj for obj in pending}.values())
+        pending.sort(key=lambda obj: obj.id)
+        if action == "approve":
+            notifications = approve(pending, approver, now, outcomes)
+        else:
+            notifications = _reject(kind, model, pending, approver, reason, now, outcomes)
+        notify.notify_many(notifications)
+    return outcomes
+
+
+# Approval queue order: bookings close to their date first, since they
+# lapse if nobody decides in time, then occupancy updates, which go stale,
+# then role changes. Within a priority the oldest request comes first.
+PRIORITY_URGENT, PRIORITY_UPDATE, PRIORITY_ROLE = 0, 1, 2
+URGENT_DAYS = 2
+
+# Per kind: model, plain fields and renamed lookups shown in the queue
+_QUEUE = {
+    "room": (RoomRequest, (
+        "room_type", "purpose", "expected_attendees", "requested_date", "start_time", "end_time",
+    ), {"classroom_name": "classroom__name", "lab_name": "lab__name", "requester": "requested_by__email"}),
+    "library": (LibraryUpdateRequest, (
+        "library_id", "requested_name", "requested_current_occupancy", "requested_is_open", "requested_max_capacity",
+    ), {"library_name": "library__name", "requester": "requested_by__email"}),
+    "lab": (LabUpdateRequest, (
+        "lab_id", "requested_current_occupancy", "requested_is_available",
+    ), {"lab_name": "lab__name", "requester": "requested_by__email"}),
+    "role": (RoleRequest, (
+        "requested_role", "reason",
+    ), {"manager_type": "user__profile__manager_type", "requester": "user__email"}),
+}
+
+
+def _priority(kind, today):
+    if kind == "room":
+        return Case(
+            When(requested_date__lte=today + timedelta(days=URGENT_DAYS), then=Value(PRIORITY_URGENT)),
+            default=Value(PRIORITY_UPDATE), output_field=IntegerField(),
+        )
+    return Value(PRIORITY_ROLE if kind == "role" else PRIORITY_UPDATE, output_field=IntegerField())
+
+
+def encode_queue_cursor(entry):
+    raw = json.dumps([entry["priority"], entry["created_at"].isoformat(), entry["kind"], entry["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_queue_cursor(cursor):
+    """``(priority, created_at, kind, id)`` from a cursor, or raises ValueError."""
+    try:
+        priority, created_at, kind, obj_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(priority, int) or kind not in KINDS or not isinstance(obj_id, int):
+        raise ValueError("invalid cursor")
+    return priority, created_at, kind, obj_id
+
+
+def _after(kind, cursor):
+    """Rows of ``kind`` that sort after the cursor position."""
+    priority, created_at, cursor_kind, cursor_id = cursor
+    later = Q(priority__gt=priority) | Q(priority=priority, created_at__gt=created_at)
+    # Kind is constant within a branch, so the (kind, id) tie-break is settled here
+    if kind == cursor_kind:
+        later |= Q(priority=priority, created_at=created_at, id__gt=cursor_id)
+    elif kind > cursor_kind:
+        later |= Q(priority=priority, created_at=created_at)
+    return later
+
+
+def queue(kinds=KINDS, after=None, page_size=50):
+    """One page of pending requests of every kind, by priority then age.
+
+    The page is picked by a single UNION ALL over the four request tables,
+    then each kind on the page is read with one values() query, so a page
+    costs at most five queries however long the queue is. Returns
+    ``(entries, next_cursor)``; each entry has kind, id, priority,
+    created_at, requested_by and the kind's fields under ``details``.
+    """
+    today = timezone.localdate()
+    cursor = decode_queue_cursor(after) if after else None
+    branches = []
+    for kind in kinds:
+        model = _QUEUE[kind][0]
+        branch = model.objects.filter(status="pending").annotate(
+            kind=Value(kind, output_field=CharField()), priority=_priority(kind, today),
+        )
+        if cursor:
+            branch = branch.filter(_after(kind, cursor))
+        branches.append(branch.values("id", "created_at", "kind", "priority"))
+    if not branches:
+        return [], None
+    combined = branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+    # One extra row tells whether there is a next page without COUNT(*)
+    page = list(combined.order_by("priority", "created_at", "kind", "id")[:page_size + 1])
+    next_cursor = encode_queue_cursor(page[page_size - 1]) if len(page) > page_size else None
+    page = page[:page_size]
+
+    ids = defaultdict(list)
+    for entry in page:
+        ids[entry["kind"]].append(entry["id"])
+    details = {}
+    for kind, kind_ids in ids.items():
+        model, fields, renamed = _QUEUE[kind]
+        projection = {name: F(lookup) for name, lookup in renamed.items()}
+        for row in model.objects.filter(id__in=kind_ids).values("id", *fields, **projection):
+            details[(kind, row.pop("id"))] = row
+    entries = []
+    for entry in page:
+        row = details.get((entry["kind"], entry["id"]))
+        if row is None:
+            continue  # decided and deleted between the two queries
+        entries.append({**entry, "requested_by": row.pop("requester"), "details": row})
+    return entries, next_cursor
@@ -0,0 +1,190 @@
+import bisect
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+
+from . import notify, slots
+from .booking import ROOM_MODELS, room_field
+from .models import RoomRequest, RoomDayOccupancy
+
+
+class Request:
+    __slots__ = ("id", "room_type", "date", "mask", "attendees", "preferred", "end")
+
+    def __init__(self, id, room_type, date, start_time, end_time, attendees, preferred=None):
+        self.id = id
+        self.room_type = room_type
+        self.date = date
+        self.mask = slots.slot_mask(start_time, end_time)
+        self.attendees = attendees
+        self.preferred = preferred
+        self.end = self.mask.bit_length()
+
+
+def solve(requests, rooms, busy, refine=True):
+    """Assigns pending requests to rooms without double-booking any slot.
+
+    ``rooms`` maps room_type -> list of (capacity, room_id); ``busy`` maps
+    (room_type, room_id, date) -> bitmap of already booked slots.
+
+    Greedy pass: within each (room_type, date), the most constrained requests
+    (fewest rooms large enough) go first, then earliest finish time as in
+    interval scheduling, each taking the smallest free room that fits (or the
+    room the requester asked for, if it is free).
+
+    Refinement pass: for every request left over, look for a room where it is
+    blocked by exactly one assigned request that can itself move to another
+    free room - a length-one augmenting path, as in bipartite matching.
+
+    Returns ``(assignments, unassigned)``: request id -> room id, and request
+    id -> reason.
+    """
+    by_type = {rt: sorted(rs) for rt, rs in rooms.items()}
+    capacities = {rt: [cap for cap, _ in rs] for rt, rs in by_type.items()}
+    groups = defaultdict(list)
+    for req in requests:
+        groups[(req.room_type, req.date)].append(req)
+
+    assignments, unassigned = {}, {}
+    for (room_type, day), group in groups.items():
+        candidates = by_type.get(room_type, [])
+        caps = capacities.get(room_type, [])
+        occupied = {room_id: busy.get((room_type, room_id, day), 0) for _, room_id in candidates}
+        placed = defaultdict(list)  # room_id -> requests assigned in this run
+
+        def fitting(req):
+            return candidates[bisect.bisect_left(caps, req.attendees):]
+
+        def place(req, room_id):
+            occupied[room_id] |= req.mask
+            placed[room_id].append(req)
+            assignments[req.id] = room_id
+
+        def free_room(req, exclude=None):
+            options = fitting(req)
+            if req.preferred is not None:
+                for _, room_id in options:
+                    if room_id == req.preferred and room_id != exclude and not occupied[room_id] & req.mask:
+                        return room_id
+            for _, room_id in options:
+                if room_id != exclude and not occupied[room_id] & req.mask:
+                    return room_id
+            return None
+
+        group.sort(key=lambda r: (len(fitting(r)), r.end, -r.attendees, r.id))
+        leftover = []
+        for req in group:
+            if not req.mask:
+                unassigned[req.id] = "invalid time window"
+                continue
+            if not fitting(req):
+                unassigned[req.id] = "no room large enough"
+                continue
+            room_id = free_room(req)
+            if room_id is None:
+                leftover.append(req)
+            else:
+                place(req, room_id)
+
+        if refine:
+            still_left = []
+            for req in leftover:
+                moved = False
+                for _, room_id in fitting(req):
+                    # Existing approved bookings never move, only this run's placements
+                    if busy.get((room_type, room_id, day), 0) & req.mask:
+                        continue
+                    blockers = [other for other in placed[room_id] if other.mask & req.mask]
+                    if len(blockers) != 1:
+                        continue
+                    blocker = blockers[0]
+                    occupied[room_id] &= ~blocker.mask
+                    target = free_room(blocker, exclude=room_id)
+                    if target is None:
+                        occupied[room_id] |= blocker.mask
+                        continue
+                    placed[room_id].remove(blocker)
+                    place(blocker, target)
+                    place(req, room_id)
+                    moved = True
+                    break
+                if not moved:
+                    still_left.append(req)
+            leftover = still_left
+
+        for req in leftover:
+            unassigned[req.id] = "no free room at that time"
+    return assignments, unassigned
+
+
+def load_problem(date_from, date_to, room_type=None):
+    """Pending requests, candidate rooms and booked slots for a date range."""
+    pending = RoomRequest.objects.filter(status="pending", requested_date__range=(date_from, date_to))
+    if room_type:
+        pending = pending.filter(room_type=room_type)
+    requests = [
+        Request(r["id"], r["room_type"], r["requested_date"], r["start_time"], r["end_time"],
+                r["expected_attendees"], r["lab_id"] if r["room_type"] == "lab" else r["classroom_id"])
+        for r in pending.values(
+            "id", "room_type", "requested_date", "start_time", "end_time",
+            "expected_attendees", "classroom_id", "lab_id",
+        )
+    ]
+    room_types = [room_type] if room_type else list(ROOM_MODELS)
+    rooms = {
+        rt: list(ROOM_MODELS[rt].objects.filter(is_available=True).values_list("max_capacity", "id"))
+        for rt in room_types
+    }
+    busy = {}
+    rows = RoomDayOccupancy.objects.filter(
+        date__range=(date_from, date_to), room_type__in=room_types,
+    ).values_list("room_type", "room_id", "date", "slots")
+    for rt, room_id, day, data in rows:
+        busy[(rt, room_id, day)] = slots.from_bytes(data)
+    days = {req.date for req in requests}
+    for rt in room_types:
+        series = slots.series_masks(rt, [room_id for _, room_id in rooms[rt]], days)
+        for (room_id, day), mask in series.items():
+            busy[(rt, room_id, day)] = busy.get((rt, room_id, day), 0) | mask
+    return requests, rooms, busy
+
+
+def propose(date_from, date_to, room_type=None):
+    requests, rooms, busy = load_problem(date_from, date_to, room_type)
+    assignments, unassigned = solve(requests, rooms, busy)
+    return requests, assignments, unassigned
+
+
+def commit(date_from, date_to, approver, room_type=None):
+    """Re-solves inside one transaction and approves every assigned request.
+
+    The solver runs again under the write lock rather than trusting a preview
+    that may have gone stale since it was shown.
+    """
+    with transaction.atomic():
+        # Lock the pending rows so a concurrent single approval cannot interleave
+        list(RoomRequest.objects.select_for_update().filter(
+            status="pending", requested_date__range=(date_from, date_to)
+        ).values_list("id", flat=True))
+        requests, rooms, busy = load_problem(date_from, date_to, room_type)
+        assignments, unassigned = solve(requests, rooms, busy)
+        approved = list(RoomRequest.objects.filter(id__in=assignments).select_related("requested_by"))
+        now = datetime.now()
+        for req in approved:
+            setattr(req, f"{room_field(req.room_type)}_id", assignments[req.id])
+            req.status = "approved"
+            req.approved_by = approver
+            req.approved_at = now
+            req.updated_at = now  # bulk_update skips auto_now; calendar feeds key off it
+        RoomRequest.objects.bulk_update(
+            approved, ["classroom", "lab", "status", "approved_by", "approved_at", "updated_at"], batch_size=500
+        )
+        slots.add_to_occupancy(
+            (req.room_type, assignments[req.id], req.date, req.mask) for req in requests if req.id in assignments
+        )
+        notify.notify_many([
+            notify.notice(req.requested_by, "room.approved", room_type=req.room_type, date=str(req.requested_date))
+            for req in approved
+        ])
+    return requests, assignments, unassigned
@@ -0,0 +1,169 @@
+from django.utils import timezone
+
+from .models import RoomRequest, RecurringBooking, ClassroomStatus, LabStatus
+
+ROOM_MODELS = {
+    "classroom": ClassroomStatus,
+    "lab": LabStatus,
+}
+
+
+def room_field(room_type):
+    """Name of the RoomRequest foreign key for a room type."""
+    return "lab" if room_type == "lab" else "classroom"
+
+
+def weekday_mask(values):
+    """Bitmask for a list of weekdays given as 0-6 (Monday = 0) or "mon".."sun".
+
+    Raises ValueError for anything else.
+    """
+    mask = 0
+    for value in values:
+        if isinstance(value, str):
+            value = RecurringBooking.WEEKDAYS.index(value.strip().lower()[:3])
+        if not 0 <= int(value) <= 6:
+            raise ValueError(f"invalid weekday {value}")
+        mask |= 1 << int(value)
+    return mask
+
+
+def find_conflicts(room_type, room_id, requested_date, start_time, end_time, exclude_id=None):
+    """Approved bookings of a room overlapping [start_time, end_time) on a date.
+
+    Uses the (room, requested_date, start_time) index: equality on the first
+    two columns and a range on start_time, so the check is a single index
+    range scan regardless of how many bookings exist.
+    """
+    qs = RoomRequest.objects.filter(
+        **{f"{room_field(room_type)}_id": room_id},
+        requested_date=requested_date,
+        status="approved",
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+    if exclude_id is not None:
+        qs = qs.exclude(id=exclude_id)
+    return qs.order_by("start_time")
+
+
+def approved_series(room_type, room_ids, date_from, date_to, start_time=None, end_time=None):
+    """Approved recurring series on the given rooms whose date range meets the window.
+
+    Only series rows are read, never expanded sessions; callers filter by
+    ``occurs_on`` for the specific days they care about.
+    """
+    field = room_field(room_type)
+    qs = RecurringBooking.objects.filter(
+        **{f"{field}_id__in": room_ids},
+        status="approved",
+        start_date__lte=date_to,
+        end_date__gte=date_from,
+    )
+    if start_time is not None:
+        qs = qs.filter(start_time__lt=end_time, end_time__gt=start_time)
+    return qs
+
+
+def find_series_conflicts(room_type, room_id, requested_date, start_time, end_time, exclude_series_id=None):
+    """Approved series with an occurrence overlapping a single booking."""
+    qs = approved_series(room_type, [room_id], requested_date, requested_date, start_time, end_time)
+    if exclude_series_id is not None:
+        qs = qs.exclude(id=exclude_series_id)
+    return [series for series in qs if series.occurs_on(requested_date)]
+
+
+def conflicts_for_booking(room_type, room_id, requested_date, start_time, end_time, exclude_id=None):
+    """Conflict dicts for a single booking, against both single bookings and series."""
+    conflicts = [
+        conflict_to_dict(b)
+        for b in find_conflicts(room_type, room_id, requested_date, start_time, end_time, exclude_id)
+    ]
+    conflicts += [
+        series_conflict_to_dict(series, requested_date)
+        for series in find_series_conflicts(room_type, room_id, requested_date, start_time, end_time)
+    ]
+    return conflicts
+
+
+def find_conflicts_for_series(series, room_id):
+    """Conflicts between a recurring series and the room's existing bookings.
+
+    Single bookings come from one index range scan over the series' date
+    range and are matched against the pattern in Python. Other series are
+    compared occurrence by occurrence only where the two date ranges overlap
+    and they share a weekday, so the cost grows with the overlap rather than
+    with everything booked in the room.
+    """
+    conflicts = []
+    singles = RoomRequest.objects.filter(
+        **{f"{room_field(series.room_type)}_id": room_id},
+        requested_date__range=(series.start_date, series.end_date),
+        status="approved",
+        start_time__lt=series.end_time,
+        end_time__gt=series.start_time,
+    ).order_by("requested_date", "start_time")
+    conflicts += [conflict_to_dict(b) for b in singles if series.occurs_on(b.requested_date)]
+
+    others = approved_series(
+        series.room_type, [room_id], series.start_date, series.end_date, series.start_time, series.end_time
+    ).exclude(id=series.id)
+    for other in others:
+        if not series.weekdays & other.weekdays:
+            continue
+        window = (max(series.start_date, other.start_date), min(series.end_date, other.end_date))
+        clash = next((day for day in series.occurrences(*window) if other.occurs_on(day)), None)
+        if clash:
+            conflicts.append(series_conflict_to_dict(other, clash))
+    return conflicts
+
+
+def lock_room(room_type, room_id):
+    """Locks the room row so concurrent approvals for it are serialized.
+
+    Raises the model's DoesNotExist if the room is missing.
+    """
+    return ROOM_MODELS[room_type].objects.select_for_update().get(id=room_id)
+
+
+def booked_room_ids(room_type, at=None):
+    """Ids of rooms with an approved booking or series session in progress at ``at`` (default now)."""
+    at = timezone.localtime(at) if at else timezone.localtime()
+    field = room_field(room_type)
+    booked = set(
+        RoomRequest.objects.filter(
+            **{f"{field}__isnull": False},
+            requested_date=at.date(),
+            status="approved",
+            start_time__lte=at.time(),
+            end_time__gt=at.time(),
+        ).values_list(f"{field}_id", flat=True)
+    )
+    series = RecurringBooking.objects.filter(
+        **{f"{field}__isnull": False},
+        status="approved",
+        start_date__lte=at.date(),
+        end_date__gte=at.date(),
+        start_time__lte=at.time(),
+        end_time__gt=at.time(),
+    )
+    booked.update(s.room_id for s in series if s.occurs_on(at.date()))
+    return booked
+
+
+def conflict_to_dict(booking):
+    return {
+        "id": booking.id,
+        "requested_date": booking.requested_date.isoformat(),
+        "start_time": booking.start_time.isoformat(),
+        "end_time": booking.end_time.isoformat(),
+    }
+
+
+def series_conflict_to_dict(series, day):
+    return {
+        "series_id": series.id,
+        "requested_date": day.isoformat(),
+        "start_time": series.start_time.isoformat(),
+        "end_time": series.end_time.isoformat(),
+    }
@@ -0,0 +1,142 @@
+"""Streaming CSV and NDJSON exports.
+
+Rows come from ``values_list(...).iterator()`` so no model instances are
+built and only one chunk of rows is held at a time; output is written in
+blocks of roughly BLOCK_SIZE bytes and optionally gzipped as it streams.
+Memory use is the same for a thousand rows as for ten million.
+"""
+import csv
+import json
+import zlib
+from collections import namedtuple
+
+from django.db.models import Q
+
+from .models import FaultReport, FaultReporter, OverloadRecord, RoomRequest
+
+CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+Dataset = namedtuple("Dataset", "model columns filters managers_only")
+
+DATASETS = {
+    "faults": Dataset(
+        FaultReport,
+        {
+            "id": "id", "title": "title", "status": "status", "severity": "severity", "category": "category",
+            "building": "building", "room_number": "room_number", "location": "location",
+            "assigned_to": "assigned_to", "reported_by": "reported_by__email",
+            "duplicate_count": "duplicate_count", "created_at": "created_at", "updated_at": "updated_at",
+            "acknowledged_at": "acknowledged_at", "resolved_at": "resolved_at",
+        },
+        ("status", "severity", "category", "building"),
+        False,
+    ),
+    "bookings": Dataset(
+        RoomRequest,
+        {
+            "id": "id", "requested_by": "requested_by__email", "room_type": "room_type",
+            "classroom": "classroom__name", "lab": "lab__name", "requested_date": "requested_date",
+            "start_time": "start_time", "end_time": "end_time", "status": "status",
+            "expected_attendees": "expected_attendees", "purpose": "purpose",
+            "approved_by": "approved_by__email", "created_at": "created_at",
+        },
+        ("status", "room_type"),
+        False,
+    ),
+    "overloads": Dataset(
+        OverloadRecord,
+        {
+            "id": "id", "resource_type": "resource_type", "building": "building", "room_number": "room_number",
+            "location": "location", "threshold_value": "threshold_value", "current_value": "current_value",
+            "description": "description", "created_at": "created_at",
+        },
+        ("resource_type", "building"),
+        True,
+    ),
+}
+
+
+def queryset(name, user, see_all, filters, since=None, until=None):
+    """Rows of a dataset as tuples in column order, scoped like the list endpoints.
+
+    Users who cannot ``see_all`` get their own faults (including "+1"s) or
+    bookings.
+    """
+    dataset = DATASETS[name]
+    rows = dataset.model.objects.filter(**{field: filters[field] for field in dataset.filters if filters.get(field)})
+    if not see_all:
+        if name == "faults":
+            rows = rows.filter(Q(reported_by=user) | Q(id__in=FaultReporter.objects.filter(user=user).values("fault_id")))
+        else:
+            rows = rows.filter(requested_by=user)
+    if since:
+        rows = rows.filter(created_at__date__gte=since)
+    if until:
+        rows = rows.filter(created_at__date__lte=until)
+    return rows.order_by("id").values_list(*dataset.columns.values())
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    # Keep spreadsheet apps from evaluating user-entered text as a formula
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+class _Buffer:
+    """Collects what csv.writer writes so it can be yielded in blocks."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+    def take(self):
+        text = "".join(self.parts)
+        self.parts, self.size = [], 0
+        return text
+
+
+def csv_stream(columns, rows):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        writer.writerow([_csv_cell(value) for value in row])
+        if buffer.size >= BLOCK_SIZE:
+            yield buffer.take()
+    yield buffer.take()
+
+
+def ndjson_stream(columns, rows):
+    buffer = _Buffer()
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        buffer.write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+        if buffer.size >= BLOCK_SIZE:
+            yield buffer.take()
+    yield buffer.take()
+
+
+def gzip_stream(chunks):
+    """Gzips a stream of text chunks as they are produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(name, fmt, rows, compress=False):
+    columns = list(DATASETS[name].columns)
+    chunks = csv_stream(columns, rows) if fmt == "csv" else ndjson_stream(columns, rows)
+    if compress:
+        return gzip_stream(chunks)
+    return (chunk.encode() for chunk in chunks)
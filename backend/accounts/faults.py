@@ -0,0 +1,68 @@
+import re
+from datetime import timedelta
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import FaultReport, FaultReporter
+
+OPEN_STATUSES = ["open", "in_progress"]
+CANDIDATES = 10
+
+
+def _normalize(text):
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").casefold()))
+
+
+def similar_titles(a, b):
+    """Whether two titles plausibly describe the same fault.
+
+    A missing title says nothing about the fault, so it never matches.
+    """
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return False
+    words_a, words_b = set(a.split()), set(b.split())
+    if len(words_a & words_b) / len(words_a | words_b) >= 0.5:
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= 0.75
+
+
+def find_duplicate(building, room_number, category, title):
+    """An open report this one likely duplicates, or None.
+
+    One query on the (dedup_key, created_at) index fetches the few recent
+    open reports for the same room and category; titles are compared here.
+    Reports with neither a building nor a room have no location to share
+    and are never duplicates.
+    """
+    if not _normalize(building) and not _normalize(room_number):
+        return None
+    since = timezone.now() - timedelta(hours=settings.FAULT_DUPLICATE_WINDOW_HOURS)
+    candidates = FaultReport.objects.filter(
+        dedup_key=FaultReport.location_key(building, room_number, category),
+        created_at__gte=since,
+        status__in=OPEN_STATUSES,
+    ).order_by("-created_at")[:CANDIDATES]
+    for fault in candidates:
+        if similar_titles(fault.title, title):
+            return fault
+    return None
+
+
+def add_reporter(fault, user, description=""):
+    """Records ``user`` as another reporter of ``fault`` (a "+1").
+
+    Returns False if they had already reported it.
+    """
+    if fault.reported_by_id == user.id:
+        return False
+    _, created = FaultReporter.objects.get_or_create(fault=fault, user=user, defaults={"description": description})
+    if created:
+        FaultReport.objects.filter(pk=fault.pk).update(
+            duplicate_count=F("duplicate_count") + 1, updated_at=timezone.now(),
+        )
+        fault.refresh_from_db(fields=["duplicate_count", "updated_at"])
+    return created
@@ -0,0 +1,163 @@
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+
+
+def task(name):
+    """Registers a function as the handler for jobs named ``name``.
+
+    Handlers take the job payload (a JSON-able dict). Their database writes
+    commit atomically with the job being marked done, so a crashed worker
+    cannot apply them twice; side effects outside the database (e-mail,
+    webhooks) can repeat on retry and should be idempotent.
+    """
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload, delay=0, max_attempts=None, eager=None):
+    """Queues a job; call inside the transaction of the write it belongs to.
+
+    The row only becomes visible to workers when that transaction commits,
+    and disappears with it on rollback, so there are no jobs for writes that
+    never happened. With JOBS_EAGER (or ``eager=True``) this process also
+    runs the job once the transaction commits, unless a worker claims it
+    first; a failed eager run is retried by a worker like any other job.
+    """
+    job = Job.objects.create(
+        task=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER if eager is None else eager:
+        transaction.on_commit(partial(run_now, job.id), robust=True)
+    return job
+
+
+def run_now(job_id, worker_id=None):
+    """Claims and runs one queued job in this process; False if it was already taken."""
+    _register_tasks()
+    claimed = Job.objects.filter(id=job_id, status="queued").update(
+        status="running", locked_by=worker_id or default_worker_id(), locked_at=timezone.now(),
+        attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return False
+    return _execute(Job.objects.get(id=job_id))
+
+
+def _register_tasks():
+    from . import notify, photos  # noqa: F401 - registers the notification and thumbnail tasks
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``: exponential, capped, with jitter."""
+    base = min(settings.JOBS_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOBS_BACKOFF_MAX_SECONDS)
+    return base * random.uniform(0.8, 1.2)
+
+
+def claim(worker_id, batch=50):
+    """Marks up to ``batch`` due jobs as running for this worker and returns them.
+
+    On PostgreSQL rows other workers hold are skipped (SKIP LOCKED); on
+    SQLite the IMMEDIATE transaction serializes claimers instead. The
+    status check in the UPDATE makes a double claim impossible either way.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status="queued", run_at__lte=now)
+            .order_by("run_at")
+            .values_list("id", flat=True)[:batch]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status="queued").update(
+            status="running", locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, status="running", locked_by=worker_id).order_by("run_at"))
+
+
+def _execute(job):
+    handler = TASKS.get(job.task)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task {job.task!r}")
+        # The handler's writes commit together with the done mark
+        with transaction.atomic():
+            handler(job.payload)
+            job.status = "done"
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "finished_at", "attempts"])
+        return True
+    except Exception:
+        job.last_error = traceback.format_exc()[-4000:]
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+            print(f"ERROR: job {job.id} ({job.task}) failed after {job.attempts} attempts")
+        else:
+            job.status = "queued"
+            job.finished_at = None
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        job.save(update_fields=["status", "run_at", "last_error", "finished_at", "attempts"])
+        return False
+
+
+def reclaim_stale(older_than=None):
+    """Requeues running jobs whose worker has not finished them in time (e.g. it crashed)."""
+    cutoff = timezone.now() - timedelta(seconds=older_than or settings.JOBS_STALE_SECONDS)
+    return Job.objects.filter(status="running", locked_at__lt=cutoff).update(status="queued", locked_by="")
+
+
+def run_pending(worker_id=None, batch=50):
+    """Claims and runs one batch; returns (succeeded, failed)."""
+    _register_tasks()
+    worker_id = worker_id or default_worker_id()
+    succeeded = failed = 0
+    for job in claim(worker_id, batch):
+        if _execute(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def queue_stats():
+    """Queue depth by status, due backlog and the age of the oldest due job."""
+    now = timezone.now()
+    by_status = dict(Job.objects.values_list("status").annotate(n=Count("id")).order_by())
+    due = Job.objects.filter(status="queued", run_at__lte=now).aggregate(n=Count("id"), oldest=Min("run_at"))
+    by_task = {
+        task: n for task, n in Job.objects.filter(status__in=["queued", "running"])
+        .values_list("task").annotate(n=Count("id")).order_by()
+    }
+    return {
+        "queued": by_status.get("queued", 0),
+        "running": by_status.get("running", 0),
+        "done": by_status.get("done", 0),
+        "failed": by_status.get("failed", 0),
+        "due": due["n"],
+        "oldest_due_seconds": round((now - due["oldest"]).total_seconds(), 1) if due["oldest"] else 0,
+        "pending_by_task": by_task,
+    }
@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import sketches
+from .models import FaultDurationSketch, FaultReport, FaultTransition
+
+ACKNOWLEDGED = ("in_progress", "done", "resolved", "closed")
+RESOLVED = ("done", "resolved", "closed")
+METRICS = ("acknowledge", "resolve")
+DIMENSIONS = ("all", "category", "building", "assignee")
+PERCENTILES = (50, 90, 99)
+
+
+def _groups(fault):
+    return (
+        ("all", ""),
+        ("category", fault.category),
+        ("building", fault.building or ""),
+        ("assignee", fault.assigned_to or ""),
+    )
+
+
+def _locked_sketch(metric, dimension, value):
+    key = dict(metric=metric, dimension=dimension, value=value)
+    try:
+        return FaultDurationSketch.objects.select_for_update().get(**key)
+    except FaultDurationSketch.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return FaultDurationSketch.objects.create(**key)
+    except IntegrityError:
+        # Another request created the row between our read and insert
+        return FaultDurationSketch.objects.select_for_update().get(**key)
+
+
+def observe(metric, fault, seconds):
+    """Adds one duration to the sketches of every group ``fault`` belongs to."""
+    for dimension, value in _groups(fault):
+        sketch = _locked_sketch(metric, dimension, value)
+        sketches.add(sketch.buckets, seconds)
+        sketch.count += 1
+        sketch.save(update_fields=["buckets", "count", "updated_at"])
+
+
+def record_transition(fault, from_status, changed_by=None):
+    """Logs a status change of ``fault`` and feeds the duration sketches.
+
+    Call from inside the transaction that saves the fault, once its new
+    status and assignee are set and before it is saved: the first move out
+    of "open" sets ``acknowledged_at`` and the first move to a resolved
+    status sets ``resolved_at``, both measured from ``created_at``. A fault
+    reopened and resolved again keeps its first times.
+    """
+    now = timezone.now()
+    FaultTransition.objects.create(fault=fault, from_status=from_status, to_status=fault.status, changed_by=changed_by)
+    if fault.acknowledged_at is None and fault.status in ACKNOWLEDGED:
+        fault.acknowledged_at = now
+        observe("acknowledge", fault, (now - fault.created_at).total_seconds())
+    if fault.resolved_at is None and fault.status in RESOLVED:
+        fault.resolved_at = now
+        observe("resolve", fault, (now - fault.created_at).total_seconds())
+
+
+def percentiles(dimension="all"):
+    """{metric: [{value, count, p50, p90, p99}]} for one dimension, in seconds.
+
+    Reads one sketch row per group, however many faults there have been.
+    """
+    result = {metric: [] for metric in METRICS}
+    for sketch in FaultDurationSketch.objects.filter(dimension=dimension).order_by("metric", "value"):
+        estimates = sketches.quantiles(sketch.buckets, [p / 100 for p in PERCENTILES])
+        row = {"value": sketch.value, "count": sketch.count}
+        row.update({f"p{p}": round(estimate) for p, estimate in zip(PERCENTILES, estimates)})
+        result[sketch.metric].append(row)
+    return result
+
+
+def rebuild():
+    """Recomputes every sketch from the faults' acknowledged and resolved times.
+
+    Groups use each fault's current category, building and assignee.
+    """
+    buckets = defaultdict(dict)
+    counts = defaultdict(int)
+    faults = FaultReport.objects.filter(acknowledged_at__isnull=False).only(
+        "category", "building", "assigned_to", "created_at", "acknowledged_at", "resolved_at"
+    )
+    for fault in faults.iterator(chunk_size=2000):
+        for metric, at in (("acknowledge", fault.acknowledged_at), ("resolve", fault.resolved_at)):
+            if at is None:
+                continue
+            for group in _groups(fault):
+                sketches.add(buckets[(metric, *group)], (at - fault.created_at).total_seconds())
+                counts[(metric, *group)] += 1
+    with transaction.atomic():
+        FaultDurationSketch.objects.all().delete()
+        FaultDurationSketch.objects.bulk_create([
+            FaultDurationSketch(metric=metric, dimension=dimension, value=value,
+                                count=counts[(metric, dimension, value)], buckets=data)
+            for (metric, dimension, value), data in buckets.items()
+        ], batch_size=500)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.retention import apply_retention, get_policies
+
+
+class Command(BaseCommand):
+    help = 'Deletes or archives expired notifications and overload records in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--policy',
+            action='append',
+            choices=[policy.name for policy in get_policies()],
+            help='Only run this policy (can be repeated)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows removed per transaction')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired rows')
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running in the background, sweeping every N seconds'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            reports = apply_retention(
+                options['policy'],
+                chunk_size=options['chunk_size'],
+                pause=options['pause'],
+                dry_run=options['dry_run'],
+            )
+            for report in reports:
+                verb = 'would remove' if report['dry_run'] else (
+                    'archived' if report['action'] == 'archive' else 'deleted'
+                )
+                self.stdout.write(self.style.SUCCESS(
+                    f"{report['policy']}: {verb} {report['rows']} rows older than "
+                    f"{report['days']} days in {report['chunks']} chunks ({report['seconds']}s)"
+                ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,54 @@
+import random
+import time
+from datetime import date, timedelta, time as dtime
+
+from django.core.management.base import BaseCommand
+
+from accounts.assignment import Request, solve
+
+
+def _synthetic_problem(n_requests, n_rooms, n_days, seed):
+    rnd = random.Random(seed)
+    start_day = date(2026, 9, 1)
+    rooms = {
+        "classroom": [(rnd.choice([20, 30, 40, 60, 80, 120, 200]), i) for i in range(n_rooms)],
+        "lab": [(rnd.choice([16, 24, 32]), i) for i in range(max(n_rooms // 5, 1))],
+    }
+    requests = []
+    for i in range(n_requests):
+        room_type = "lab" if rnd.random() < 0.2 else "classroom"
+        start_slot = rnd.randrange(8 * 4, 19 * 4)  # 08:00 - 19:00
+        length = rnd.choice([4, 6, 8, 12])  # 1 - 3 hours
+        end_slot = min(start_slot + length, 22 * 4)
+        requests.append(Request(
+            i, room_type, start_day + timedelta(days=rnd.randrange(n_days)),
+            dtime(start_slot // 4, start_slot % 4 * 15), dtime(end_slot // 4, end_slot % 4 * 15),
+            rnd.choice([10, 15, 25, 35, 50, 70, 100]) if room_type == "classroom" else rnd.choice([8, 12, 20, 30]),
+        ))
+    return requests, rooms
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the room auto-assignment solver on a synthetic term-start queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help='Pending room requests')
+        parser.add_argument('--rooms', type=int, default=150, help='Classrooms (labs are a fifth of this)')
+        parser.add_argument('--days', type=int, default=10, help='Days the requests are spread over')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        requests, rooms = _synthetic_problem(options['requests'], options['rooms'], options['days'], options['seed'])
+        self.stdout.write(
+            f"{len(requests)} requests, {len(rooms['classroom'])} classrooms, "
+            f"{len(rooms['lab'])} labs over {options['days']} days"
+        )
+        for label, refine in (('greedy', False), ('greedy + refinement', True)):
+            started = time.perf_counter()
+            assignments, unassigned = solve(requests, rooms, {}, refine=refine)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:>20}: assigned {len(assignments)}/{len(requests)} "
+                f"({len(unassigned)} left) in {elapsed * 1000:.0f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
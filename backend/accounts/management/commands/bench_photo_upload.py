@@ -0,0 +1,143 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.core.management.base import BaseCommand
+from django.http.multipartparser import MultiPartParser
+from django.test import override_settings
+from PIL import Image, ImageOps
+
+from accounts import photos
+
+BOUNDARY = "benchboundary"
+
+
+class _MultipartBody:
+    """A multipart body produced on demand, so the benchmark holds no copy of it."""
+
+    def __init__(self, size):
+        self.head = (
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="photo"; filename="photo.jpg"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'
+        ).encode() + b"\xff\xd8\xff"
+        self.tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+        self.block = os.urandom(1024 * 1024)
+        self.payload = size - 3
+        self.length = len(self.head) + self.payload + len(self.tail)
+        self.position = 0
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.length - self.position
+        out = bytearray()
+        while n > 0 and self.position < self.length:
+            pos = self.position
+            if pos < len(self.head):
+                piece = self.head[pos:pos + n]
+            elif pos < len(self.head) + self.payload:
+                offset = pos - len(self.head)
+                start = offset % len(self.block)
+                piece = self.block[start:start + min(n, self.payload - offset)]
+            else:
+                offset = pos - len(self.head) - self.payload
+                piece = self.tail[offset:offset + n]
+            out += piece
+            self.position += len(piece)
+            n -= len(piece)
+        return bytes(out)
+
+    def meta(self):
+        return {"CONTENT_TYPE": f"multipart/form-data; boundary={BOUNDARY}", "CONTENT_LENGTH": str(self.length)}
+
+
+def _parse(size, handlers):
+    body = _MultipartBody(size)
+    _, files = MultiPartParser(body.meta(), body, handlers).parse()
+    return files["photo"]
+
+
+def _streamed(size):
+    upload = _parse(size, [photos.PhotoUploadHandler()])
+    os.remove(upload.temp_path)
+
+
+def _django_default(size):
+    # Django's default handlers spool to a temporary file; hashing is a second pass
+    upload = _parse(size, [MemoryFileUploadHandler(), TemporaryFileUploadHandler()])
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    upload.close()
+
+
+def _buffered(size):
+    # Read the whole body into memory, then hash and write it
+    body = _MultipartBody(size)
+    data = body.read()
+    content = data[len(body.head) - 3:len(data) - len(body.tail)]
+    hashlib.sha256(content).hexdigest()
+    with tempfile.NamedTemporaryFile() as out:
+        out.write(content)
+
+
+def _sample_jpeg(megabytes):
+    """A noisy 24-megapixel JPEG, roughly ``megabytes`` in size."""
+    width, height = 6000, 4000
+    noise = Image.merge("RGB", [Image.effect_noise((width, height), 60) for _ in range(3)])
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    Image.blend(noise, gradient, 0.5).save(buffer, "JPEG", quality=min(95 + megabytes // 20, 98))
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks fault photo upload throughput and memory, and thumbnail generation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megabytes', type=int, default=20, help='Upload size')
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--skip-thumbnail', action='store_true')
+
+    def handle(self, *args, **options):
+        size = options['megabytes'] * 1024 * 1024
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media, FAULT_PHOTO_MAX_BYTES=size * 2):
+            self.stdout.write(f"Upload of {options['megabytes']} MB, best of {options['runs']}:")
+            for label, run in (
+                ('streamed + hashed', _streamed),
+                ('django default', _django_default),
+                ('buffered in memory', _buffered),
+            ):
+                best, peak = float('inf'), 0
+                for _ in range(options['runs']):
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    run(size)
+                    best = min(best, time.perf_counter() - started)
+                    peak = max(peak, tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                self.stdout.write(
+                    f"{label:>20}: {size / 2 ** 20 / best:7.0f} MB/s, peak Python memory {peak / 2 ** 20:6.1f} MB"
+                )
+
+            if not options['skip_thumbnail']:
+                content = _sample_jpeg(options['megabytes'])
+                path = os.path.join(media, 'sample.jpg')
+                with open(path, 'wb') as out:
+                    out.write(content)
+                self.stdout.write(f"Thumbnail of a {len(content) / 2 ** 20:.1f} MB 6000x4000 JPEG:")
+                for label, draft in (('draft decode', True), ('full decode', False)):
+                    started = time.perf_counter()
+                    with Image.open(path) as image:
+                        # exif_transpose decodes the image, so without draft() first
+                        # it is decoded at full size
+                        if draft:
+                            image.draft("RGB", (640, 640))
+                        image = ImageOps.exif_transpose(image)
+                        image.thumbnail((320, 320))
+                        image.convert("RGB").save(io.BytesIO(), "JPEG", quality=85)
+                    self.stdout.write(f"{label:>20}: {(time.perf_counter() - started) * 1000:.0f} ms")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Django's previous behaviour: rollback journal, deferred transactions and the
+# sqlite3 module's default 5 second busy timeout.
+BASELINE_PRAGMAS = {"journal_mode": "DELETE"}
+
+
+def _connect(path, pragmas, timeout):
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    for key, value in pragmas.items():
+        conn.execute(f"PRAGMA {key}={value}")
+    return conn
+
+
+def _setup(path, pragmas, rows):
+    conn = _connect(path, pragmas, 5.0)
+    conn.execute("CREATE TABLE bench_fault (id INTEGER PRIMARY KEY, title TEXT, status TEXT, updated_at REAL)")
+    conn.execute("CREATE TABLE bench_notification (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, is_read INTEGER DEFAULT 0)")
+    conn.execute("CREATE INDEX bench_notification_user ON bench_notification (user_id, is_read)")
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO bench_fault (title, status, updated_at) VALUES (?, 'open', ?)",
+        ((f"Fault {i}", time.time()) for i in range(rows)),
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _worker(path, pragmas, timeout, begin, duration, write_ratio, rows, seed, results):
+    """Mimics one gunicorn worker: list reads mixed with read-then-write approvals."""
+    conn = _connect(path, pragmas, timeout)
+    rnd = random.Random(seed)
+    reads = writes = locked = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            if rnd.random() < write_ratio:
+                fault_id = rnd.randint(1, rows)
+                conn.execute(begin)
+                conn.execute("SELECT status FROM bench_fault WHERE id = ?", (fault_id,)).fetchone()
+                conn.execute(
+                    "UPDATE bench_fault SET status = ?, updated_at = ? WHERE id = ?",
+                    (rnd.choice(["open", "in_progress", "resolved"]), time.time(), fault_id),
+                )
+                conn.execute(
+                    "INSERT INTO bench_notification (user_id, title) VALUES (?, 'Fault Report Update')",
+                    (rnd.randint(1, 50),),
+                )
+                conn.execute("COMMIT")
+                writes += 1
+            else:
+                conn.execute("SELECT id, title, status FROM bench_fault ORDER BY id DESC LIMIT 50").fetchall()
+                conn.execute(
+                    "SELECT COUNT(*) FROM bench_notification WHERE user_id = ? AND is_read = 0",
+                    (rnd.randint(1, 50),),
+                ).fetchone()
+                reads += 1
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            locked += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+    conn.close()
+    results.put((reads, writes, locked))
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks mixed read/write throughput with the default vs tuned SQLite profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent worker processes')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Fraction of operations that write')
+        parser.add_argument('--rows', type=int, default=10000, help='Rows in the benchmark table')
+
+    def handle(self, *args, **options):
+        profiles = [
+            ('default', BASELINE_PRAGMAS, 5.0, 'BEGIN'),
+            ('tuned', settings.SQLITE_PRAGMAS, settings.SQLITE_BUSY_TIMEOUT_MS / 1000, 'BEGIN IMMEDIATE'),
+        ]
+        self.stdout.write(
+            f"{options['workers']} workers, {options['duration']}s per profile, "
+            f"{options['write_ratio']:.0%} writes, {options['rows']} rows"
+        )
+        throughput = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, pragmas, timeout, begin in profiles:
+                path = os.path.join(tmp, f"{name}.sqlite3")
+                _setup(path, pragmas, options['rows'])
+                results = multiprocessing.Queue()
+                procs = [
+                    multiprocessing.Process(target=_worker, args=(
+                        path, pragmas, timeout, begin, options['duration'],
+                        options['write_ratio'], options['rows'], seed, results,
+                    ))
+                    for seed in range(options['workers'])
+                ]
+                for proc in procs:
+                    proc.start()
+                totals = [results.get() for _ in procs]
+                for proc in procs:
+                    proc.join()
+
+                reads = sum(t[0] for t in totals)
+                writes = sum(t[1] for t in totals)
+                locked = sum(t[2] for t in totals)
+                throughput[name] = (reads + writes) / options['duration']
+                self.stdout.write(
+                    f"{name:>8}: {throughput[name]:10.0f} ops/s  "
+                    f"reads={reads} writes={writes} locked_errors={locked}"
+                )
+
+        if throughput['default']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Tuned profile throughput: {throughput['tuned'] / throughput['default']:.2f}x default"
+            ))
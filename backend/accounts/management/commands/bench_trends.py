@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from accounts import trends
+
+
+def _synthetic_counts(n_locations, n_days, worsening_share, seed):
+    """Poisson daily counts; a share of locations has its rate tripled in the last week."""
+    rng = np.random.default_rng(seed)
+    rates = rng.gamma(0.5, 0.2, size=n_locations)
+    counts = rng.poisson(rates[:, None], size=(n_locations, n_days)).astype(np.float32)
+    worse = rng.choice(n_locations, int(n_locations * worsening_share), replace=False)
+    counts[worse, -trends.WINDOW:] += rng.poisson(
+        2 * rates[worse, None] + 0.3, size=(len(worse), trends.WINDOW)
+    )
+    return counts, worse
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks vectorized trend and spike detection on synthetic per-location daily counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--workers', type=int, default=0, help='Process pool size (default: CPU count)')
+        parser.add_argument('--worsening', type=float, default=0.01, help='Share of locations made worse')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        counts, worse = _synthetic_counts(options['locations'], options['days'], options['worsening'], options['seed'])
+        self.stdout.write(
+            f"{counts.shape[0]} locations x {counts.shape[1]} days "
+            f"({counts.nbytes / 2 ** 20:.0f} MiB), {len(worse)} made worse"
+        )
+        for label, run in (
+            ('single process', lambda: trends.analyze(counts)),
+            ('process pool', lambda: trends.analyze_parallel(counts, workers=options['workers'] or None, threshold=0)),
+        ):
+            started = time.perf_counter()
+            stats = run()
+            elapsed = time.perf_counter() - started
+            top = trends.worsening(stats, limit=len(worse))
+            found = len(np.intersect1d(top, worse))
+            self.stdout.write(
+                f"{label:>15}: {elapsed * 1000:.0f} ms, "
+                f"{int((stats['z_score'] >= trends.SPIKE_Z).sum())} spikes, "
+                f"top {len(top)} recall {found / max(len(worse), 1):.0%}"
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
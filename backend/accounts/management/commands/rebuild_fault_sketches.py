@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from accounts.lifecycle import rebuild
+from accounts.models import FaultDurationSketch
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the fault acknowledge/resolve time sketches from the fault reports'
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {FaultDurationSketch.objects.count()} sketches'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import IssueRollup
+from accounts.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the recurring-issues rollup from the fault and overload tables'
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {IssueRollup.objects.count()} rollup rows'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.jobs import default_worker_id, queue_stats, reclaim_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (notifications and other deferred work)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=50, help='Jobs claimed per round')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs and exit')
+        parser.add_argument('--worker-id', default=None, help='Name recorded on claimed jobs (default host-pid)')
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        self.stdout.write(f"Worker {worker_id} started")
+        try:
+            while True:
+                requeued = reclaim_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale jobs"))
+                succeeded, failed = run_pending(worker_id, options['batch'])
+                if succeeded or failed:
+                    self.stdout.write(f"Ran {succeeded + failed} jobs ({failed} failed)")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        stats = queue_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stopped: {stats['due']} due, {stats['queued']} queued, {stats['failed']} failed"
+        ))
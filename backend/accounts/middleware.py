@@ -0,0 +1,71 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import notify, routers
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _pin_key(request):
+    # Pin by token rather than user id so no lookup is needed before routing
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth:
+        return None
+    return "replica-pin:" + hashlib.sha1(auth.encode()).hexdigest()
+
+
+class ReplicaPinningMiddleware:
+    """Keeps a client on the primary database for a short while after it writes.
+
+    Write requests always use the primary, and any request switches to it
+    once it writes. After a request writes, GETs from the same client read
+    from the primary for ``REPLICA_PIN_SECONDS`` so they see their own
+    changes even if the replicas have not caught up yet. Must be the
+    outermost middleware that can touch the database.
+
+    A streaming response runs its queries while the server reads the body,
+    after this middleware has returned, so the body is read under the same
+    routing as the request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = _pin_key(request)
+        is_write = request.method not in SAFE_METHODS
+        with routers.request_scope(is_write or bool(key and cache.get(key))) as pin:
+            response = self.get_response(request)
+        if key and (is_write or pin.wrote):
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        if response.streaming and not getattr(response, "is_async", False):
+            response.streaming_content = _scoped(response.streaming_content, pin.pinned)
+        return response
+
+
+def _scoped(content, pinned):
+    with routers.request_scope(pinned):
+        yield from content
+
+
+class UnreadNotificationsMiddleware:
+    """Piggybacks the unread notification count on authenticated responses.
+
+    ``require_auth`` leaves the user on the request; the count and a change
+    token come from a per-user cache entry, so most responses pay no extra
+    query. Clients that see these headers can skip their own poll.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, "user_obj", None)
+        if user is not None and response.status_code < 500:
+            unread, token = notify.unread_summary(user)
+            response["X-Unread-Notifications"] = str(unread)
+            response["X-Notifications-Token"] = token
+        return response
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:02
+
+from django.db import migrations
+
+# The SQL is copied here rather than imported from accounts.search, so this
+# migration keeps working however that module changes. A post_migrate
+# handler in accounts.signals recreates anything missing afterwards.
+FTS_TABLE = "accounts_faultreport_fts"
+
+SQLITE_FTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, location, "
+    "content='accounts_faultreport', content_rowid='id', "
+    "tokenize='porter unicode61')"
+)
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON accounts_faultreport BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, description, location)
+            VALUES (new.id, new.title, new.description, new.location);
+        END""",
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON accounts_faultreport BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, location)
+            VALUES ('delete', old.id, old.title, old.description, old.location);
+        END""",
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, description, location ON accounts_faultreport BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, location)
+            VALUES ('delete', old.id, old.title, old.description, old.location);
+            INSERT INTO {FTS_TABLE} (rowid, title, description, location)
+            VALUES (new.id, new.title, new.description, new.location);
+        END""",
+}
+
+PG_INDEX = (
+    "CREATE INDEX IF NOT EXISTS accounts_faultreport_search_idx ON accounts_faultreport USING GIN ("
+    "to_tsvector('english', coalesce(accounts_faultreport.title, '') || ' ' || "
+    "coalesce(accounts_faultreport.description, '') || ' ' || "
+    "coalesce(accounts_faultreport.location, '')))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(SQLITE_FTS)
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == "postgresql":
+            cursor.execute(PG_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS accounts_faultreport_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_overloadarchive_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_faultreport_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomrequest',
+            index=models.Index(fields=['classroom', 'requested_date', 'start_time'], name='roomrequest_classroom_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomrequest',
+            index=models.Index(fields=['lab', 'requested_date', 'start_time'], name='roomrequest_lab_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+# Copied from accounts.slots as it stood when this migration was written, so
+# the backfill does not depend on live app code
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MASK_BYTES = SLOTS_PER_DAY // 8
+
+
+def slot_mask(start_time, end_time):
+    first = (start_time.hour * 60 + start_time.minute) // SLOT_MINUTES
+    end_minutes = end_time.hour * 60 + end_time.minute + (1 if end_time.second or end_time.microsecond else 0)
+    last = min(-(-end_minutes // SLOT_MINUTES), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def to_bytes(mask):
+    return mask.to_bytes(MASK_BYTES, "big")
+
+
+def backfill_occupancy(apps, schema_editor):
+    RoomRequest = apps.get_model('accounts', 'RoomRequest')
+    RoomDayOccupancy = apps.get_model('accounts', 'RoomDayOccupancy')
+    # Read and write the database being migrated, never a replica
+    db = schema_editor.connection.alias
+    masks = {}
+    approved = RoomRequest.objects.using(db).filter(status='approved').values_list(
+        'room_type', 'classroom_id', 'lab_id', 'requested_date', 'start_time', 'end_time'
+    )
+    for room_type, classroom_id, lab_id, day, start_time, end_time in approved.iterator():
+        room_id = lab_id if room_type == 'lab' else classroom_id
+        if room_id:
+            key = (room_type, room_id, day)
+            masks[key] = masks.get(key, 0) | slot_mask(start_time, end_time)
+    RoomDayOccupancy.objects.using(db).bulk_create([
+        RoomDayOccupancy(room_type=room_type, room_id=room_id, date=day, slots=to_bytes(mask))
+        for (room_type, room_id, day), mask in masks.items() if mask
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_roomrequest_roomrequest_classroom_slot_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='roomrequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='RoomDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_type', models.CharField(choices=[('classroom', 'Classroom'), ('lab', 'Lab')], max_length=20)),
+                ('room_id', models.IntegerField()),
+                ('date', models.DateField()),
+                ('slots', models.BinaryField(max_length=12)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'room_type', 'room_id'), name='unique_room_day_occupancy')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
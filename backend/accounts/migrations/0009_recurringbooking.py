@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_alter_roomrequest_status_roomdayoccupancy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_type', models.CharField(choices=[('classroom', 'Classroom'), ('lab', 'Lab')], max_length=20)),
+                ('purpose', models.TextField()),
+                ('expected_attendees', models.IntegerField(default=1)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('weekdays', models.PositiveSmallIntegerField()),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('exceptions', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('rejection_reason', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approved_recurring_bookings', to=settings.AUTH_USER_MODEL)),
+                ('classroom', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.classroomstatus')),
+                ('lab', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.labstatus')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['classroom', 'status', 'start_date'], name='recurring_classroom_idx'), models.Index(fields=['lab', 'status', 'start_date'], name='recurring_lab_idx')],
+            },
+        ),
+    ]
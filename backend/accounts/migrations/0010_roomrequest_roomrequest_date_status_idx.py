@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_recurringbooking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomrequest',
+            index=models.Index(fields=['requested_date', 'status'], name='roomrequest_date_status_idx'),
+        ),
+    ]
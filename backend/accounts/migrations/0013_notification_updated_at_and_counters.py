@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'updated_at'], name='notification_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='role',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='unread_direct',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='unread_broadcasts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='broadcast_cursor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_notification_updated_at_and_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcast',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='broadcast',
+            name='summary',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='summary',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='digest_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificationstate',
+            name='pending_digest',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
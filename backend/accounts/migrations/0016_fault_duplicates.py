@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:27
+
+import hashlib
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def location_key(building, room_number, category):
+    # Copied from FaultReport.location_key, so the backfill does not depend
+    # on the live model
+    raw = "|".join(" ".join(re.findall(r"[a-z0-9]+", (part or "").casefold())) for part in (building, room_number, category))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def backfill_dedup_keys(apps, schema_editor):
+    FaultReport = apps.get_model('accounts', 'FaultReport')
+    # Read and write the database being migrated, never a replica
+    db = schema_editor.connection.alias
+    faults = list(FaultReport.objects.using(db).only('building', 'room_number', 'category'))
+    for fault in faults:
+        fault.dedup_key = location_key(fault.building, fault.room_number, fault.category)
+    FaultReport.objects.using(db).bulk_update(faults, ['dedup_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_notification_templates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaultReporter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='faultreport',
+            name='dedup_key',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='faultreport',
+            name='duplicate_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='faultreport',
+            index=models.Index(fields=['dedup_key', 'created_at'], name='fault_dedup_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='faultreporter',
+            name='fault',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extra_reporters', to='accounts.faultreport'),
+        ),
+        migrations.AddField(
+            model_name='faultreporter',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fault_plus_ones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='faultreporter',
+            constraint=models.UniqueConstraint(fields=('fault', 'user'), name='unique_fault_reporter'),
+        ),
+        migrations.RunPython(backfill_dedup_keys, migrations.RunPython.noop),
+    ]
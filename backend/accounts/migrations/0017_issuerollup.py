@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:33
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    # Written out here rather than calling accounts.rollups, so the backfill
+    # uses the historical models and does not depend on live app code
+    IssueRollup = apps.get_model('accounts', 'IssueRollup')
+    sources = (
+        ('fault', apps.get_model('accounts', 'FaultReport'), 'category'),
+        ('overload', apps.get_model('accounts', 'OverloadRecord'), 'resource_type'),
+    )
+    # Read and write the database being migrated, never a replica
+    db = schema_editor.connection.alias
+    for kind, model, category in sources:
+        grouped = (
+            model.objects.using(db).annotate(day=TruncDate('created_at'))
+            .values('building', 'room_number', category, 'day')
+            .annotate(n=Count('id'))
+        )
+        IssueRollup.objects.using(db).bulk_create([
+            IssueRollup(kind=kind, building=row['building'], room_number=row['room_number'],
+                        category=row[category], day=row['day'], count=row['n'])
+            for row in grouped
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_fault_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('fault', 'Fault report'), ('overload', 'Overload')], max_length=10)),
+                ('building', models.CharField(blank=True, max_length=100)),
+                ('room_number', models.CharField(blank=True, max_length=50)),
+                ('category', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'day'], name='issue_rollup_kind_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'building', 'room_number', 'category', 'day'), name='unique_issue_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_issuerollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='faultreport',
+            index=models.Index(fields=['status', 'severity', 'category'], name='fault_status_sev_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faultreport',
+            index=models.Index(fields=['created_at'], name='fault_created_idx'),
+        ),
+    ]
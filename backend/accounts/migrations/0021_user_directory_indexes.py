@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:40
+
+from django.db import migrations
+
+NAMES = ("auth_user_email_id_idx", "auth_user_email_lower_idx", "auth_user_username_lower_idx")
+
+INDEXES = {
+    "sqlite": (
+        "CREATE INDEX IF NOT EXISTS auth_user_email_id_idx ON auth_user (email, id)",
+        "CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (lower(email))",
+        "CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (lower(username))",
+    ),
+    # text_pattern_ops lets LIKE 'prefix%' use the index under any collation
+    "postgresql": (
+        "CREATE INDEX IF NOT EXISTS auth_user_email_id_idx ON auth_user (email, id)",
+        "CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (lower(email) text_pattern_ops)",
+        "CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (lower(username) text_pattern_ops)",
+    ),
+}
+
+
+def create_directory_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in INDEXES.get(schema_editor.connection.vendor, ()):
+            cursor.execute(sql)
+
+
+def drop_directory_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in INDEXES:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in NAMES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_fault_photos'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_directory_index, drop_directory_index),
+    ]
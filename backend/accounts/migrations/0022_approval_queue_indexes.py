@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_user_directory_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='labupdaterequest',
+            index=models.Index(fields=['status', 'created_at'], name='labupdate_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libraryupdaterequest',
+            index=models.Index(fields=['status', 'created_at'], name='libupdate_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rolerequest',
+            index=models.Index(fields=['status', 'created_at'], name='rolerequest_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomrequest',
+            index=models.Index(fields=['status', 'created_at'], name='roomrequest_status_created_idx'),
+        ),
+    ]
@@ -1,3 +1,8 @@
+import gzip
+import hashlib
+import json
+import re
+from datetime import timedelta
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -31,6 +36,12 @@ class RoleRequest(models.Model):
     ])
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Approval queue: pending rows, oldest first
+            models.Index(fields=['status', 'created_at'], name='rolerequest_status_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.email} - {self.requested_role}"
 
@@ -103,6 +114,12 @@ class LibraryUpdateRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Approval queue: pending rows, oldest first
+            models.Index(fields=['status', 'created_at'], name='libupdate_status_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Library update request by {self.requested_by.email}"
 
@@ -123,6 +140,12 @@ class LabUpdateRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Approval queue: pending rows, oldest first
+            models.Index(fields=['status', 'created_at'], name='labupdate_status_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Lab update request by {self.requested_by.email}"
 
@@ -136,6 +159,7 @@ class RoomRequest(models.Model):
         ('pending', 'Pending'),
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
+        ('cancelled', 'Cancelled'),
     ]
     
     requested_by = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -154,9 +178,122 @@ class RoomRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Overlap checks: equality on room and date, range on start_time
+            models.Index(fields=['classroom', 'requested_date', 'start_time'], name='roomrequest_classroom_slot_idx'),
+            models.Index(fields=['lab', 'requested_date', 'start_time'], name='roomrequest_lab_slot_idx'),
+            # Calendar windows across all rooms
+            models.Index(fields=['requested_date', 'status'], name='roomrequest_date_status_idx'),
+            # Approval queue: pending rows, oldest first
+            models.Index(fields=['status', 'created_at'], name='roomrequest_status_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Room request by {self.requested_by.email}"
 
+class RoomDayOccupancy(models.Model):
+    """Which 15-minute slots of one room are booked on one day.
+
+    ``slots`` is a 96-bit big-endian bitmap (bit n = minutes 15n to 15n+15),
+    rebuilt from approved RoomRequests whenever one is approved or cancelled.
+    """
+    room_type = models.CharField(max_length=20, choices=RoomRequest.ROOM_TYPE_CHOICES)
+    room_id = models.IntegerField()
+    date = models.DateField()
+    slots = models.BinaryField(max_length=12)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'room_type', 'room_id'], name='unique_room_day_occupancy'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type} {self.room_id} on {self.date}"
+
+class RecurringBooking(models.Model):
+    """A weekly series of room bookings, approved once.
+
+    Occurrences are never stored: ``occurs_on`` / ``occurrences`` expand the
+    pattern for whatever window is being looked at. ``weekdays`` is a bitmask
+    (bit 0 = Monday), ``interval`` repeats every N weeks counted from the week
+    of ``start_date``, and ``exceptions`` lists ISO dates that are skipped.
+    """
+    WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_bookings')
+    room_type = models.CharField(max_length=20, choices=RoomRequest.ROOM_TYPE_CHOICES)
+    classroom = models.ForeignKey(ClassroomStatus, on_delete=models.SET_NULL, null=True, blank=True)
+    lab = models.ForeignKey(LabStatus, on_delete=models.SET_NULL, null=True, blank=True)
+    purpose = models.TextField()
+    expected_attendees = models.IntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    weekdays = models.PositiveSmallIntegerField()
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    exceptions = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=RoomRequest.STATUS_CHOICES, default='pending')
+    approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_recurring_bookings')
+    approved_at = models.DateTimeField(null=True, blank=True)
+    rejection_reason = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Conflict checks: equality on room and status, range on the series dates
+            models.Index(fields=['classroom', 'status', 'start_date'], name='recurring_classroom_idx'),
+            models.Index(fields=['lab', 'status', 'start_date'], name='recurring_lab_idx'),
+        ]
+
+    @property
+    def room_id(self):
+        return self.lab_id if self.room_type == 'lab' else self.classroom_id
+
+    def weekday_names(self):
+        return [name for i, name in enumerate(self.WEEKDAYS) if self.weekdays >> i & 1]
+
+    def occurs_on(self, day):
+        if not self.start_date <= day <= self.end_date or not self.weekdays >> day.weekday() & 1:
+            return False
+        first_monday = self.start_date - timedelta(days=self.start_date.weekday())
+        if (day - first_monday).days // 7 % self.interval:
+            return False
+        return day.isoformat() not in self.exceptions
+
+    def occurrences(self, date_from=None, date_to=None):
+        """Yields the dates of the series that fall within [date_from, date_to]."""
+        day = max(self.start_date, date_from or self.start_date)
+        last = min(self.end_date, date_to or self.end_date)
+        while day <= last:
+            if self.occurs_on(day):
+                yield day
+            day += timedelta(days=1)
+
+    def __str__(self):
+        return f"Recurring {self.room_type} booking by {self.requested_by.email}"
+
+class FaultPhoto(models.Model):
+    """An uploaded photo, stored once per distinct content.
+
+    The file lives at a path derived from its SHA-256 (see photos.py), so
+    identical uploads share one file and one row. ``has_thumbnail`` is set
+    by the ``photos.thumbnail`` job, or by the thumbnail view when the job
+    could not make it.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=50)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    has_thumbnail = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
 class FaultReport(models.Model):
     SEVERITY_CHOICES = [
         ('low', 'Low'),
@@ -199,9 +336,103 @@ class FaultReport(models.Model):
     assigned_to = models.CharField(max_length=200, blank=True)
     resolution_notes = models.TextField(blank=True)
     image = models.CharField(max_length=500, blank=True, null=True)  # Store image URL instead
+    photo = models.ForeignKey(FaultPhoto, on_delete=models.SET_NULL, null=True, blank=True, related_name='faults')
+    # Hash of building, room and category (see location_key) for duplicate checks
+    dedup_key = models.CharField(max_length=16, blank=True)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    # First moves out of "open" and into a resolved status (see lifecycle.py)
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dedup_key', 'created_at'], name='fault_dedup_created_idx'),
+            # Analytics group by these and filter or bucket on created_at
+            models.Index(fields=['status', 'severity', 'category'], name='fault_status_sev_cat_idx'),
+            models.Index(fields=['created_at'], name='fault_created_idx'),
+        ]
+
+    @staticmethod
+    def location_key(building, room_number, category):
+        """Hash of the normalized building, room and category.
+
+        Reports of the same kind of fault in the same room share a key,
+        however their location was capitalized or spaced.
+        """
+        raw = "|".join(" ".join(re.findall(r"[a-z0-9]+", (part or "").casefold())) for part in (building, room_number, category))
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a save that moves the fault can move its rollup count too
+        if {'building', 'room_number', 'category'} <= set(field_names):
+            instance._loaded_location = (instance.building, instance.room_number, instance.category)
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.dedup_key = self.location_key(self.building, self.room_number, self.category)
+        super().save(*args, **kwargs)
+
+class FaultReporter(models.Model):
+    """Another user who reported a fault already on file (a "+1")."""
+    fault = models.ForeignKey(FaultReport, on_delete=models.CASCADE, related_name='extra_reporters')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='fault_plus_ones')
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fault', 'user'], name='unique_fault_reporter'),
+        ]
+
+class FaultTransition(models.Model):
+    """One status change of a fault report. Rows are only ever appended."""
+    fault = models.ForeignKey(FaultReport, on_delete=models.CASCADE, related_name='transitions')
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['fault', 'created_at'], name='fault_transition_fault_idx'),
+        ]
+
+    def __str__(self):
+        return f"Fault {self.fault_id}: {self.from_status} -> {self.to_status}"
+
+class FaultDurationSketch(models.Model):
+    """Quantile sketch of fault acknowledge or resolve times for one group.
+
+    ``buckets`` maps sketch bucket index to count (see sketches.py); it is
+    updated as faults move, so percentiles never scan the fault history.
+    ``dimension`` is all, category, building or assignee and ``value`` the
+    group within it.
+    """
+    METRIC_CHOICES = [
+        ('acknowledge', 'Time to acknowledge'),
+        ('resolve', 'Time to resolve'),
+    ]
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=200, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    buckets = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'dimension', 'value'], name='unique_fault_duration_sketch'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} sketch for {self.dimension}={self.value!r} ({self.count})"
+
 class OverloadRecord(models.Model):
     RESOURCE_CHOICES = [
         ('cpu', 'CPU'),
@@ -217,21 +448,187 @@ class OverloadRecord(models.Model):
     description = models.TextField(blank=True)
     threshold_value = models.FloatField(default=0.0)
     current_value = models.FloatField(default=0.0)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     def __str__(self):
         return f"{self.resource_type} overload at {self.location} - {self.created_at}"
 
+class IssueRollup(models.Model):
+    """Daily count of fault reports or overloads per room and category.
+
+    Maintained on insert (see rollups.py) so the recurring-issues report
+    reads these rows instead of grouping the raw tables. ``category`` holds
+    the fault category or the overload resource type.
+    """
+    KIND_CHOICES = [
+        ('fault', 'Fault report'),
+        ('overload', 'Overload'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    building = models.CharField(max_length=100, blank=True)
+    room_number = models.CharField(max_length=50, blank=True)
+    category = models.CharField(max_length=20)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'building', 'room_number', 'category', 'day'], name='unique_issue_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'day'], name='issue_rollup_kind_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.kind} at {self.building} {self.room_number} ({self.category}) on {self.day}"
+
+class OverloadArchive(models.Model):
+    """A batch of expired OverloadRecord rows, stored as gzipped JSON lines."""
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    row_count = models.IntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def rows(self):
+        return [json.loads(line) for line in gzip.decompress(self.payload).splitlines()]
+
+    def __str__(self):
+        return f"{self.row_count} overload records ({self.first_created_at:%Y-%m-%d} - {self.last_created_at:%Y-%m-%d})"
+
 class Notification(models.Model):
+    """A notification for one user.
+
+    Rows from a template (see notification_templates.py) store only the
+    template id and its parameters; ``title`` and ``message`` stay empty
+    and are rendered when read. Ad-hoc rows carry their text inline.
+    """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    template = models.CharField(max_length=50, blank=True)
+    params = models.JSONField(default=dict, blank=True)
+    title = models.CharField(max_length=200, blank=True)
+    message = models.TextField(blank=True)
+    is_read = models.BooleanField(default=False)
+    action_link = models.CharField(max_length=200, blank=True, null=True)
+    # Similar notifications arriving close together merge into one row; the
+    # message then becomes ``summary`` formatted with the merged ``count``
+    count = models.PositiveIntegerField(default=1)
+    summary = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Retention sweeps for old read notifications
+            models.Index(fields=['is_read', 'created_at'], name='notification_read_created_idx'),
+            # Delta sync: what changed for a user since the last poll
+            models.Index(fields=['user', 'updated_at'], name='notification_user_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.user.email} - {self.title or self.template}"
+
+class Broadcast(models.Model):
+    """One notification addressed to everyone in an audience.
+
+    Stored once however many recipients there are; per-user read state lives
+    in NotificationState (a watermark) and BroadcastReceipt (reads after it).
+    """
+    AUDIENCE_CHOICES = [
+        ('staff', 'Managers and admins'),
+        ('manager', 'Managers'),
+        ('admin', 'Admins'),
+        ('lecturer', 'Lecturers'),
+        ('student', 'Students'),
+        ('all', 'Everyone'),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
     title = models.CharField(max_length=200)
     message = models.TextField()
-    is_read = models.BooleanField(default=False)
     action_link = models.CharField(max_length=200, blank=True, null=True)
+    count = models.PositiveIntegerField(default=1)
+    summary = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['audience', 'created_at'], name='broadcast_audience_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Broadcast to {self.audience} - {self.title}"
+
+class BroadcastReceipt(models.Model):
+    """A broadcast one user read individually, newer than their watermark."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'broadcast'], name='unique_broadcast_receipt'),
+        ]
+
+class NotificationState(models.Model):
+    """Per-user inbox state, kept up to date as notifications change.
+
+    Every broadcast created up to ``broadcasts_read_until`` counts as read.
+    The unread counters are maintained incrementally; broadcasts up to
+    ``broadcast_cursor`` have been counted. ``version`` increases on every
+    change to the user's inbox, so an unchanged poll is one row lookup.
+    ``role`` is the role the counters were computed for.
+
+    With ``digest_minutes`` set, direct notifications collect in
+    ``pending_digest`` and are delivered as one row per period.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_state')
+    broadcasts_read_until = models.DateTimeField()
+    role = models.CharField(max_length=20, blank=True)
+    unread_direct = models.IntegerField(default=0)
+    unread_broadcasts = models.IntegerField(default=0)
+    broadcast_cursor = models.BigIntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+    digest_minutes = models.PositiveIntegerField(default=0)
+    pending_digest = models.JSONField(default=list, blank=True)
+
+    @property
+    def unread_count(self):
+        return self.unread_direct + self.unread_broadcasts
+
+    def __str__(self):
+        return f"Notification state for {self.user.email}"
+
+class Job(models.Model):
+    """A unit of background work in the database-backed queue (see jobs.py)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: equality on status, oldest due first
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
 
     def __str__(self):
-        return f"Notification for {self.user.email} - {self.title}"
+        return f"{self.task} ({self.status}, attempt {self.attempts})"
 
 # Import signals to ensure they are registered
 from . import signals
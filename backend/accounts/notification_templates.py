@@ -0,0 +1,104 @@
+"""Texts for direct notifications.
+
+Rows store a template id and the few parameters that vary; the title,
+message, link and merge summary are rendered from this registry when the
+inbox is read. Editing a text here changes it for stored rows as well.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+Template = namedtuple("Template", "title message action_link summary", defaults=(None, ""))
+
+TEMPLATES = {
+    "room.approved": Template(
+        "Room Request Approved",
+        "Your request for {room_type} on {date} has been approved.",
+        "/room-requests",
+        "{count} of your room requests were approved",
+    ),
+    "room.rejected": Template(
+        "Room Request Rejected",
+        "Your request for {room_type} on {date} was rejected: {reason}",
+        "/room-requests",
+        "{count} of your room requests were rejected",
+    ),
+    "room.cancelled": Template(
+        "Room Booking Cancelled",
+        "Your booking for {room_type} on {date} was cancelled by {by}.",
+        "/room-requests",
+    ),
+    "series.approved": Template(
+        "Recurring Room Request Approved",
+        "Your weekly {room_type} booking from {start} to {end} has been approved.",
+        "/room-requests",
+    ),
+    "series.rejected": Template(
+        "Recurring Room Request Rejected",
+        "Your weekly {room_type} booking from {start} was rejected: {reason}",
+        "/room-requests",
+    ),
+    "series.cancelled": Template(
+        "Room Booking Cancelled",
+        "{by} cancelled {what} of your weekly {room_type} booking.",
+        "/room-requests",
+    ),
+    "fault.updated": Template(
+        "Fault Report Update",
+        "The status of your report '{title}' has been updated to {status}.",
+        "/reports",
+    ),
+    "role.approved": Template(
+        "Role Request Approved",
+        "Your request for the {role} role has been approved.",
+        "/dashboard",
+    ),
+    "role.rejected": Template(
+        "Role Request Rejected",
+        "Your request for the {role} role was rejected. Please contact an administrator.",
+        "/role-select",
+    ),
+}
+
+_UNKNOWN = Template("Notification", "")
+
+
+class _Params(dict):
+    # A parameter missing from an old row shows as its placeholder rather than failing
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def get(template_id):
+    return TEMPLATES.get(template_id, _UNKNOWN)
+
+
+@lru_cache(maxsize=4096)
+def _message(template_id, params):
+    return get(template_id).message.format_map(_Params(params))
+
+
+def render(template_id, params, count=1):
+    """(title, message, action_link) for a template and its parameters.
+
+    Formatted messages are cached by (template, parameters), so the many
+    rows sharing the same values are formatted once per process.
+    """
+    template = get(template_id)
+    try:
+        message = _message(template_id, tuple(sorted(params.items())))
+    except TypeError:  # unhashable parameter values
+        message = template.message.format_map(_Params(params))
+    if count > 1 and template.summary:
+        message = f"{template.summary.format(count=count)}. Latest: {message}"
+    return template.title, message, template.action_link
+
+
+def render_notification(n):
+    """Rendered (title, message, action_link) for a Notification row.
+
+    Rows without a template carry their text inline.
+    """
+    if not n.template:
+        return n.title, n.message, n.action_link
+    title, message, action_link = render(n.template, n.params, n.count)
+    return title, message, n.action_link or action_link
@@ -0,0 +1,512 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Q
+from django.utils import timezone
+
+from . import jobs, notification_templates as templates
+from .models import Notification, Broadcast, BroadcastReceipt, NotificationState, Profile
+
+STAFF_ROLES = ["manager", "admin"]
+LATEST_BROADCAST_KEY = "notify:latest-broadcast:{}"
+LATEST_BROADCAST_TTL = 5
+# Delta queries reach back a little before the cursor so rows committed
+# late by a concurrent transaction are not skipped; clients dedupe.
+SYNC_OVERLAP_SECONDS = 2
+UNREAD_KEY = "notify:unread:{}"
+UNREAD_TTL = 60
+
+
+def audiences_for(role):
+    """Broadcast audiences a user with ``role`` belongs to."""
+    audiences = ["all", role]
+    if role in STAFF_ROLES:
+        audiences.append("staff")
+    return audiences
+
+
+def roles_in(audience):
+    """Roles that receive an audience's broadcasts, or None for everyone."""
+    if audience == "all":
+        return None
+    return STAFF_ROLES if audience == "staff" else [audience]
+
+
+def _summarize(summary, count, latest):
+    return f"{summary.format(count=count)}. Latest: {latest}"
+
+
+def _coalesce_window():
+    return timezone.now() - timedelta(seconds=settings.NOTIFY_COALESCE_SECONDS)
+
+
+def broadcast(audience, title, message, action_link=None, summary=""):
+    """Notifies a whole audience with a single insert.
+
+    With a ``summary`` (a format string taking ``count``), a broadcast with
+    the same audience, title, link and summary sent within the coalescing
+    window is replaced by one carrying the combined count, so a burst of
+    reports leaves one row rather than one per report.
+    """
+    with transaction.atomic():
+        previous = None
+        if summary:
+            previous = Broadcast.objects.select_for_update().filter(
+                audience=audience, title=title, action_link=action_link, summary=summary,
+                created_at__gte=_coalesce_window(),
+            ).order_by("-created_at").first()
+        count = previous.count + 1 if previous else 1
+        b = Broadcast.objects.create(
+            audience=audience, title=title, action_link=action_link, summary=summary, count=count,
+            message=_summarize(summary, count, message) if previous else message,
+        )
+        if previous:
+            _retire_broadcast(previous)
+    # Pollers compare this with their cursor. Publishing before commit is
+    # harmless: cursors only advance to broadcasts a query actually returned
+    cache.set(LATEST_BROADCAST_KEY.format(audience), b.id, LATEST_BROADCAST_TTL)
+    return b
+
+
+def _retire_broadcast(b):
+    """Deletes a merged broadcast, uncounting it where it was counted unread.
+
+    The replacement has a newer id, so every cursor picks it up as new.
+    """
+    counted = NotificationState.objects.filter(
+        broadcast_cursor__gte=b.id, broadcasts_read_until__lt=b.created_at, unread_broadcasts__gt=0,
+    ).exclude(user__broadcast_receipts__broadcast=b)
+    roles = roles_in(b.audience)
+    if roles is not None:
+        counted = counted.filter(role__in=roles)
+    counted.update(unread_broadcasts=F("unread_broadcasts") - 1, version=F("version") + 1)
+    b.delete()
+
+
+def notify_staff(title, message, action_link=None, summary=""):
+    return broadcast("staff", title, message, action_link, summary)
+
+
+def notice(user, template, **params):
+    """An unsaved templated Notification, for notify_many."""
+    return Notification(user=user, template=template, params=params)
+
+
+def notify_user(user, template, **params):
+    """Queues a templated notification; it is written by the job worker.
+
+    ``params`` fill the template's placeholders and must be JSON-serializable.
+    """
+    return notify_many([notice(user, template, **params)])
+
+
+def notify_many(notifications):
+    """Queues unsaved Notification instances as a single job."""
+    items = []
+    for n in notifications:
+        item = {"user_id": n.user_id}
+        if n.template:
+            item.update(template=n.template, params=n.params)
+        else:
+            item.update(title=n.title, message=n.message, action_link=n.action_link, summary=n.summary)
+        items.append(item)
+    if items:
+        return jobs.enqueue("notifications.create", {"notifications": items})
+
+
+def _merge_key(user_id, template, title, action_link, summary):
+    """What two notifications must share to merge, or None if they never do."""
+    if template:
+        return (user_id, template) if templates.get(template).summary else None
+    return (user_id, title, action_link, summary) if summary else None
+
+
+@jobs.task("notifications.create")
+def create_notifications(payload):
+    # Delivery channels (e-mail, webhooks) would hang off this task too
+    items = payload["notifications"]
+    digest = dict(NotificationState.objects.filter(
+        user_id__in={item["user_id"] for item in items}, digest_minutes__gt=0,
+    ).values_list("user_id", "digest_minutes"))
+    if digest:
+        _hold_for_digest([item for item in items if item["user_id"] in digest], digest)
+        items = [item for item in items if item["user_id"] not in digest]
+
+    rows, groups = [], {}
+    for item in items:
+        key = _merge_key(item["user_id"], item.get("template"), item.get("title"),
+                         item.get("action_link"), item.get("summary"))
+        if key is None:
+            rows.append(Notification(**item))
+        else:
+            count = groups[key][1] + 1 if key in groups else 1
+            groups[key] = (item, count)  # the latest message wins
+
+    merged = set()
+    if groups:
+        now = timezone.now()
+        # One locked read finds every unread row these groups could merge into
+        open_rows = {}
+        for n in Notification.objects.select_for_update().filter(
+            user_id__in={key[0] for key in groups}, is_read=False, created_at__gte=_coalesce_window(),
+        ).exclude(summary="", template="").order_by("created_at"):
+            open_rows[_merge_key(n.user_id, n.template, n.title, n.action_link, n.summary)] = n
+        for key, (item, count) in groups.items():
+            existing = open_rows.get(key)
+            if existing:
+                total = existing.count + count
+                if item.get("template"):
+                    changes = {"params": item["params"]}
+                else:
+                    changes = {"message": _summarize(item["summary"], total, item["message"])}
+                Notification.objects.filter(pk=existing.pk).update(
+                    count=total, created_at=now, updated_at=now, **changes,
+                )
+                merged.add(item["user_id"])
+            else:
+                if count > 1 and not item.get("template"):
+                    item = {**item, "message": _summarize(item["summary"], count, item["message"])}
+                rows.append(Notification(**item, count=count))
+
+    Notification.objects.bulk_create(rows, batch_size=500)
+    # bulk_create skips post_save, so the counters are bumped here
+    bump_unread(Counter(n.user_id for n in rows))
+    if merged:
+        NotificationState.objects.filter(user_id__in=merged).update(version=F("version") + 1)
+        _forget(merged)
+
+
+def _hold_for_digest(items, digest):
+    """Adds items to their users' pending digests, scheduling a delivery for
+    each digest that was empty."""
+    states = list(NotificationState.objects.select_for_update().filter(user_id__in=digest))
+    starting = [state.user_id for state in states if not state.pending_digest]
+    for state in states:
+        state.pending_digest = state.pending_digest + [item for item in items if item["user_id"] == state.user_id]
+    NotificationState.objects.bulk_update(states, ["pending_digest"])
+    for user_id in starting:
+        jobs.enqueue("notifications.digest", {"user_id": user_id}, delay=digest[user_id] * 60)
+
+
+@jobs.task("notifications.digest")
+def deliver_digest(payload):
+    state = NotificationState.objects.select_for_update().filter(user_id=payload["user_id"]).first()
+    if state is None or not state.pending_digest:
+        return
+    items, state.pending_digest = state.pending_digest, []
+    state.save(update_fields=["pending_digest"])
+    counts, links = Counter(), set()
+    for item in items:
+        if item.get("template"):
+            title, _, link = templates.render(item["template"], item["params"])
+        else:
+            title, link = item["title"], item["action_link"]
+        counts[title] += 1
+        links.add(link)
+    Notification.objects.create(
+        user_id=state.user_id,
+        title="Notification Digest",
+        message=", ".join(f"{n} × {title}" if n > 1 else title for title, n in counts.most_common()),
+        action_link=links.pop() if len(links) == 1 else None,
+        count=len(items),
+    )
+
+
+def digest_preference(user, digest_minutes=None):
+    """Reads, or with ``digest_minutes`` sets, the user's digest period.
+
+    Turning digests off delivers whatever is pending straight away.
+    """
+    state = _state_row(user)
+    if digest_minutes is not None:
+        state.digest_minutes = digest_minutes
+        state.save(update_fields=["digest_minutes"])
+        if not digest_minutes and state.pending_digest:
+            jobs.enqueue("notifications.digest", {"user_id": user.id})
+    return state.digest_minutes
+
+
+def bump_unread(counts):
+    """Adds to users' unread counters: one UPDATE per distinct increment."""
+    by_increment = defaultdict(list)
+    for user_id, n in counts.items():
+        by_increment[n].append(user_id)
+    for n, user_ids in by_increment.items():
+        NotificationState.objects.filter(user_id__in=user_ids).update(
+            unread_direct=F("unread_direct") + n, version=F("version") + 1,
+        )
+    _forget(counts)
+
+
+def latest_broadcast_id(role):
+    """Newest broadcast id in the user's audiences, from the cache when possible."""
+    keys = {LATEST_BROADCAST_KEY.format(audience): audience for audience in audiences_for(role)}
+    found = cache.get_many(list(keys))
+    for key, audience in keys.items():
+        if key not in found:
+            found[key] = Broadcast.objects.filter(audience=audience).aggregate(m=Max("id"))["m"] or 0
+            cache.set(key, found[key], LATEST_BROADCAST_TTL)
+    return max(found.values())
+
+
+def _remember(state):
+    cache.set(UNREAD_KEY.format(state.user_id), {
+        "role": state.role,
+        "cursor": state.broadcast_cursor,
+        "unread": state.unread_count,
+        "token": f"{state.version}.{state.broadcast_cursor}",
+    }, UNREAD_TTL)
+
+
+def _forget(user_ids):
+    cache.delete_many([UNREAD_KEY.format(user_id) for user_id in user_ids])
+
+
+def unread_summary(user):
+    """(unread count, change token) for response headers.
+
+    Served from the cache while no broadcast newer than the cached cursor
+    exists; the token is the version and broadcast parts of a sync cursor,
+    so a client can tell whether its copy of the inbox is stale. Code that
+    changes a role calls ``role_changed`` so the entry is not reused.
+    """
+    entry = cache.get(UNREAD_KEY.format(user.id))
+    if entry is None or latest_broadcast_id(entry["role"]) > entry["cursor"]:
+        prof, _ = Profile.objects.get_or_create(user=user)
+        state = get_state(user, prof.role)
+        return state.unread_count, f"{state.version}.{state.broadcast_cursor}"
+    return entry["unread"], entry["token"]
+
+
+def role_changed(user_ids):
+    """Starts the users' broadcast counts over from now for their new role.
+
+    Clearing the stored role makes the next ``get_state`` recount, and the
+    cached unread summary is dropped so it is not served with the old role.
+    """
+    NotificationState.objects.filter(user_id__in=user_ids).update(broadcasts_read_until=timezone.now(), role="")
+    _forget(user_ids)
+
+
+def _visible_broadcasts(user, role):
+    return Broadcast.objects.filter(audience__in=audiences_for(role)).annotate(
+        receipt=Exists(BroadcastReceipt.objects.filter(user=user, broadcast=OuterRef("pk")))
+    )
+
+
+def _recount(state, user, role):
+    """Recomputes the counters from scratch (new state or changed role)."""
+    if state.role:
+        # A role changed without role_changed: the new role starts reading
+        # its audiences from now, not from the day the user joined
+        state.broadcasts_read_until = timezone.now()
+    visible = _visible_broadcasts(user, role)
+    state.role = role
+    state.unread_direct = Notification.objects.filter(user=user, is_read=False).count()
+    state.broadcast_cursor = Broadcast.objects.filter(audience__in=audiences_for(role)).aggregate(m=Max("id"))["m"] or 0
+    state.unread_broadcasts = visible.filter(
+        id__lte=state.broadcast_cursor, created_at__gt=state.broadcasts_read_until, receipt=False,
+    ).count()
+    state.version += 1
+    state.save()
+    _remember(state)
+    return state
+
+
+def _state_row(user):
+    state = NotificationState.objects.filter(user=user).first()
+    if state is None:
+        # New users start with nothing unread rather than every old broadcast
+        state, _ = NotificationState.objects.get_or_create(
+            user=user, defaults={"broadcasts_read_until": user.date_joined},
+        )
+    return state
+
+
+def get_state(user, role):
+    """The user's inbox state, brought up to date with new broadcasts.
+
+    The common case is one lookup by user id plus a cache read; broadcasts
+    are only queried when one newer than the cursor exists.
+    """
+    state = _state_row(user)
+    if state.role != role:
+        return _recount(state, user, role)
+    if latest_broadcast_id(role) > state.broadcast_cursor:
+        fresh = list(_visible_broadcasts(user, role).filter(id__gt=state.broadcast_cursor).values_list(
+            "id", "created_at", "receipt",
+        ))
+        if fresh:
+            unread = sum(1 for _, created_at, receipt in fresh if created_at > state.broadcasts_read_until and not receipt)
+            # Guarded on the old cursor so two concurrent polls cannot both count them
+            NotificationState.objects.filter(pk=state.pk, broadcast_cursor=state.broadcast_cursor).update(
+                unread_broadcasts=F("unread_broadcasts") + unread,
+                broadcast_cursor=max(i for i, _, _ in fresh),
+                version=F("version") + 1,
+            )
+            state.refresh_from_db()
+    _remember(state)
+    return state
+
+
+def _direct_dict(n):
+    title, message, action_link = templates.render_notification(n)
+    return {
+        "id": n.id,
+        "kind": "direct",
+        "title": title,
+        "message": message,
+        "is_read": n.is_read,
+        "action_link": action_link,
+        "count": n.count,
+        "created_at": n.created_at,
+    }
+
+
+def _broadcast_dict(b, state):
+    return {
+        "id": b.id,
+        "kind": "broadcast",
+        "title": b.title,
+        "message": b.message,
+        "is_read": b.created_at <= state.broadcasts_read_until or b.receipt,
+        "action_link": b.action_link,
+        "count": b.count,
+        "created_at": b.created_at,
+    }
+
+
+def _finish(items, limit):
+    merged = sorted(items, key=lambda n: n["created_at"], reverse=True)
+    merged.sort(key=lambda n: n["is_read"])
+    merged = merged[:limit]
+    for n in merged:
+        n["created_at"] = n["created_at"].isoformat()
+    return merged
+
+
+def inbox(user, role, limit=50):
+    """Direct and broadcast notifications merged, unread first, newest first.
+
+    Each side is fetched with its own indexed query limited to ``limit`` rows
+    and the two short lists are merged here.
+    """
+    state = get_state(user, role)
+    direct = [_direct_dict(n) for n in Notification.objects.filter(user=user).order_by("is_read", "-created_at")[:limit]]
+    unread = Q(created_at__gt=state.broadcasts_read_until, receipt=False)
+    visible = _visible_broadcasts(user, role)
+    rows = list(visible.filter(unread).order_by("-created_at")[:limit])
+    if len(rows) < limit:
+        rows += list(visible.exclude(unread).order_by("-created_at")[:limit - len(rows)])
+    return _finish(direct + [_broadcast_dict(b, state) for b in rows], limit), state
+
+
+def make_cursor(state, at=None):
+    at = at or timezone.now()
+    return f"{state.version}.{state.broadcast_cursor}.{int(at.timestamp())}"
+
+
+def _parse_cursor(cursor):
+    try:
+        version, broadcast_cursor, ts = (int(part) for part in cursor.split("."))
+        return version, broadcast_cursor, ts
+    except (AttributeError, ValueError):
+        return None
+
+
+def sync(user, role, since=None, limit=50):
+    """Changes to the inbox since ``since`` (a cursor from a previous call).
+
+    An unchanged inbox is detected from the state row alone and answered
+    with just the cursor and counter. Otherwise only direct notifications
+    updated since the cursor time, broadcasts newer than its broadcast id
+    and broadcasts read since then are returned. Without a valid cursor the
+    full inbox is returned, as ``list_notifications`` would.
+    """
+    now = timezone.now()
+    parsed = _parse_cursor(since)
+    if parsed is None:
+        items, state = inbox(user, role, limit)
+        return {"full": True, "cursor": make_cursor(state, now), "unread_count": state.unread_count,
+                "notifications": items, "broadcasts_read_until": state.broadcasts_read_until.isoformat()}
+
+    state = get_state(user, role)
+    version, broadcast_cursor, ts = parsed
+    if (version, broadcast_cursor) == (state.version, state.broadcast_cursor):
+        return {"full": False, "cursor": since, "unread_count": state.unread_count, "notifications": []}
+
+    changed_since = datetime.fromtimestamp(ts - SYNC_OVERLAP_SECONDS, tz=dt_timezone.utc)
+    direct = Notification.objects.filter(user=user, updated_at__gt=changed_since).order_by("-updated_at")[:limit]
+    read_since = BroadcastReceipt.objects.filter(user=user, read_at__gt=changed_since).values("broadcast_id")
+    broadcasts = _visible_broadcasts(user, role).filter(
+        Q(id__gt=broadcast_cursor) | Q(id__in=read_since)
+    ).order_by("-id")[:limit]
+    items = [_direct_dict(n) for n in direct] + [_broadcast_dict(b, state) for b in broadcasts]
+    return {"full": False, "cursor": make_cursor(state, now), "unread_count": state.unread_count,
+            "notifications": _finish(items, limit), "broadcasts_read_until": state.broadcasts_read_until.isoformat()}
+
+
+def mark_read(user, role, notification_id):
+    """Marks one direct notification read; returns False if it is not the user's."""
+    state = get_state(user, role)
+    # The row and its counter change together; the state lock orders this
+    # against other writes to the same inbox
+    with transaction.atomic():
+        state = NotificationState.objects.select_for_update().get(pk=state.pk)
+        changed = Notification.objects.filter(id=notification_id, user=user, is_read=False).update(
+            is_read=True, updated_at=timezone.now(),
+        )
+        if changed:
+            NotificationState.objects.filter(pk=state.pk).update(
+                unread_direct=F("unread_direct") - 1, version=F("version") + 1,
+            )
+    if changed:
+        _forget([user.id])
+        return True
+    return Notification.objects.filter(id=notification_id, user=user).exists()
+
+
+def mark_broadcast_read(user, role, broadcast_id):
+    """Records a read receipt; returns False if the user cannot see the broadcast."""
+    b = Broadcast.objects.filter(id=broadcast_id, audience__in=audiences_for(role)).first()
+    if not b:
+        return False
+    state = get_state(user, role)
+    if b.created_at > state.broadcasts_read_until:
+        with transaction.atomic():
+            state = NotificationState.objects.select_for_update().get(pk=state.pk)
+            _, created = BroadcastReceipt.objects.get_or_create(user=user, broadcast=b)
+            if created:
+                # Broadcasts past the cursor are not counted yet, and won't be now
+                counted = 1 if b.id <= state.broadcast_cursor else 0
+                NotificationState.objects.filter(pk=state.pk).update(
+                    unread_broadcasts=F("unread_broadcasts") - counted, version=F("version") + 1,
+                )
+        if created:
+            _forget([user.id])
+    return True
+
+
+def mark_all_read(user, role):
+    """Marks direct notifications read and moves the broadcast watermark to now.
+
+    Receipts older than the watermark are implied by it, so they are dropped
+    to keep the receipt table proportional to recent individual reads.
+    """
+    state = get_state(user, role)
+    with transaction.atomic():
+        state = NotificationState.objects.select_for_update().get(pk=state.pk)
+        now = timezone.now()
+        Notification.objects.filter(user=user, is_read=False).update(is_read=True, updated_at=now)
+        NotificationState.objects.filter(pk=state.pk).update(
+            broadcasts_read_until=now,
+            unread_direct=0,
+            unread_broadcasts=0,
+            broadcast_cursor=Broadcast.objects.filter(audience__in=audiences_for(role)).aggregate(m=Max("id"))["m"] or 0,
+            version=F("version") + 1,
+        )
+        BroadcastReceipt.objects.filter(user=user, broadcast__created_at__lte=now).delete()
+    _forget([user.id])
@@ -0,0 +1,244 @@
+"""Fault photo storage: streamed uploads, content addressing and serving.
+
+Uploads are written to disk chunk by chunk as the multipart body is parsed
+(PhotoUploadHandler) and hashed on the way, so a 20 MB photo never sits in
+memory. The finished file is moved to a path derived from its SHA-256;
+uploading the same photo again keeps the existing file. Thumbnails are
+made by the ``photos.thumbnail`` job, off the request path; a worker needs
+the same MEDIA_ROOT as the web process to make them. A thumbnail still
+missing when first requested (no worker, or one without the files) is
+made then.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from PIL import Image, ImageOps
+
+from . import jobs
+from .models import FaultPhoto
+
+FIELD_NAME = "photo"
+CHUNK_SIZE = 256 * 1024
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def sniff(head):
+    """Content type from a file's first bytes, or None if it is not a supported image."""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _root():
+    return os.path.join(settings.MEDIA_ROOT, "photos")
+
+
+def path_for(sha256, thumbnail=False):
+    # Two levels of fan-out keep directories small
+    name = f"{sha256}.thumb.jpg" if thumbnail else sha256
+    return os.path.join(_root(), sha256[:2], sha256[2:4], name)
+
+
+class HashedUpload(UploadedFile):
+    """A photo already written to a temporary file, with its hash and type."""
+
+    def __init__(self, temp_path, sha256, size, content_type, name):
+        super().__init__(file=None, name=name, content_type=content_type, size=size)
+        self.temp_path = temp_path
+        self.sha256 = sha256
+
+
+class PhotoUploadHandler(FileUploadHandler):
+    """Streams the ``photo`` field of a multipart upload straight to disk.
+
+    Each chunk is hashed and written as it arrives. An upload over
+    FAULT_PHOTO_MAX_BYTES or that is not an image stops the parse and sets
+    ``error``; other file fields are ignored.
+    """
+    chunk_size = CHUNK_SIZE
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        # ``file`` is only set once the photo field starts: the parser
+        # closes ``handler.file`` whenever the attribute exists
+
+    def _receiving(self):
+        return self.field_name == FIELD_NAME and hasattr(self, "file") and not self.file.closed
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != FIELD_NAME or hasattr(self, "file"):
+            return
+        os.makedirs(os.path.join(_root(), "tmp"), exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=os.path.join(_root(), "tmp"), delete=False)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.sniffed = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self._receiving():
+            return raw_data
+        if self.sniffed is None:
+            self.sniffed = sniff(raw_data[:16])
+            if self.sniffed is None:
+                self._abort("not_an_image")
+        self.size += len(raw_data)
+        if self.size > settings.FAULT_PHOTO_MAX_BYTES:
+            self._abort("too_large")
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self._receiving():
+            return None
+        self.file.close()
+        return HashedUpload(self.file.name, self.hasher.hexdigest(), self.size, self.sniffed, self.file_name)
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def discard(self):
+        """Removes the temporary file of an upload that will not be stored."""
+        if hasattr(self, "file"):
+            self.file.close()
+            try:
+                os.remove(self.file.name)
+            except FileNotFoundError:
+                pass
+
+    def _abort(self, error):
+        self.error = error
+        self.discard()
+        raise StopUpload(connection_reset=True)
+
+
+def store(upload):
+    """The FaultPhoto for an upload, moving the file into place if it is new.
+
+    Returns ``(photo, created)``. A new photo queues its thumbnail job, so
+    call this inside the transaction that attaches it to a fault.
+    """
+    existing = FaultPhoto.objects.filter(sha256=upload.sha256).first()
+    if existing is None:
+        final = path_for(upload.sha256)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(upload.temp_path, final)
+        try:
+            with transaction.atomic():
+                photo = FaultPhoto.objects.create(sha256=upload.sha256, size=upload.size, content_type=upload.content_type)
+        except IntegrityError:
+            # Same photo uploaded concurrently; the file is identical either way
+            return FaultPhoto.objects.get(sha256=upload.sha256), False
+        jobs.enqueue("photos.thumbnail", {"sha256": photo.sha256})
+        return photo, True
+    try:
+        os.remove(upload.temp_path)
+    except FileNotFoundError:
+        pass
+    return existing, False
+
+
+def make_thumbnail(sha256):
+    """Writes a JPEG thumbnail and records the photo's dimensions."""
+    size = settings.FAULT_PHOTO_THUMBNAIL_SIZE
+    target = path_for(sha256, thumbnail=True)
+    with Image.open(path_for(sha256)) as image:
+        width, height = image.size
+        # JPEGs can decode at 1/2, 1/4 or 1/8 scale, much faster than full size
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        # A private temporary name, so two processes making it at once do not collide
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(target), suffix=".tmp", delete=False) as out:
+            image.convert("RGB").save(out, "JPEG", quality=85, optimize=True)
+    os.replace(out.name, target)
+    FaultPhoto.objects.filter(sha256=sha256).update(width=width, height=height, has_thumbnail=True)
+
+
+def ensure_thumbnail(sha256):
+    """Makes the thumbnail unless it exists; False if the photo cannot be thumbnailed."""
+    if os.path.exists(path_for(sha256, thumbnail=True)):
+        FaultPhoto.objects.filter(sha256=sha256, has_thumbnail=False).update(has_thumbnail=True)
+        return True
+    try:
+        make_thumbnail(sha256)
+    except Exception as e:
+        print(f"WARNING: Could not make thumbnail for photo {sha256}: {e}")
+        return False
+    return True
+
+
+@jobs.task("photos.thumbnail")
+def thumbnail_job(payload):
+    """Makes a new photo's thumbnail in the background.
+
+    A worker that cannot see the photo leaves it to the thumbnail view;
+    retrying would not make the file appear.
+    """
+    sha256 = payload["sha256"]
+    if not os.path.exists(path_for(sha256)):
+        print(f"WARNING: Photo {sha256} is not under this worker's MEDIA_ROOT; its thumbnail is made on request")
+        return
+    ensure_thumbnail(sha256)
+
+
+def _ranged(handle, start, length):
+    handle.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            data = handle.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        handle.close()
+
+
+def serve(request, path, etag, content_type):
+    """Serves a stored file with long-lived caching and single byte-range support."""
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+    size = os.path.getsize(path)
+    match = _RANGE.match(request.headers.get("Range", "").replace(" ", ""))
+    if match and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start, end = int(first), (min(int(last), size - 1) if last else size - 1)
+        else:  # suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        response = StreamingHttpResponse(_ranged(open(path, "rb"), start, end - start + 1), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,114 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import FaultReport, IssueRollup, OverloadRecord
+
+WINDOWS = (7, 30, 90)
+
+
+def add(kind, building, room_number, category, day, delta=1):
+    """Adds ``delta`` to one rollup row, creating it on first use."""
+    key = dict(kind=kind, building=building or "", room_number=room_number or "", category=category, day=day)
+    if IssueRollup.objects.filter(**key).update(count=F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            IssueRollup.objects.create(count=delta, **key)
+    except IntegrityError:
+        # Another request created the row between our update and insert
+        IssueRollup.objects.filter(**key).update(count=F("count") + delta)
+
+
+def fault_saved(fault, created):
+    day = timezone.localdate(fault.created_at)
+    location = (fault.building, fault.room_number, fault.category)
+    if created:
+        add("fault", *location, day)
+        return
+    previous = getattr(fault, "_loaded_location", None)
+    if previous is not None and previous != location:
+        add("fault", *previous, day, delta=-1)
+        add("fault", *location, day)
+    fault._loaded_location = location
+
+
+def _subtract(kind, building, room_number, category, day, n=1):
+    key = dict(kind=kind, building=building or "", room_number=room_number or "", category=category, day=day)
+    IssueRollup.objects.filter(**key).update(count=F("count") - n)
+
+
+def fault_deleted(fault):
+    location = getattr(fault, "_loaded_location", None) or (fault.building, fault.room_number, fault.category)
+    _subtract("fault", *location, timezone.localdate(fault.created_at))
+
+
+def overloads_removed(rows):
+    """Takes archived overload records (``values()`` dicts) out of the rollup.
+
+    One update per room, type and day, however many records a purge chunk
+    holds.
+    """
+    groups = Counter(
+        (row["building"], row["room_number"], row["resource_type"], timezone.localdate(row["created_at"]))
+        for row in rows
+    )
+    for (building, room_number, category, day), n in groups.items():
+        _subtract("overload", building, room_number, category, day, n)
+
+
+def overload_saved(record, created):
+    if created:
+        add("overload", record.building, record.room_number, record.resource_type, timezone.localdate(record.created_at))
+
+
+def recurring(kind, days=None, min_count=2):
+    """(building, room_number, category, count) groups at or over ``min_count``.
+
+    Reads only rollup rows: the cost depends on the number of rooms and days
+    in the window, not on how many reports were ever filed.
+    """
+    rows = IssueRollup.objects.filter(kind=kind)
+    if days:
+        rows = rows.filter(day__gt=timezone.localdate() - timedelta(days=days))
+    return list(
+        rows.values("building", "room_number", "category")
+        .annotate(total=Sum("count"))
+        .filter(total__gte=min_count)
+        .order_by("-total", "building", "room_number")
+        .values_list("building", "room_number", "category", "total")
+    )
+
+
+def daily_counts(kind, start, end):
+    """((building, room_number, category), day, count) rollup rows from ``start`` to ``end``."""
+    rows = IssueRollup.objects.filter(kind=kind, day__gte=start, day__lte=end, count__gt=0)
+    for building, room_number, category, day, count in rows.values_list(
+        "building", "room_number", "category", "day", "count"
+    ).iterator(chunk_size=5000):
+        yield (building, room_number, category), day, count
+
+
+def rebuild():
+    """Recomputes every rollup row from the raw tables."""
+    sources = (
+        ("fault", FaultReport, "category"),
+        ("overload", OverloadRecord, "resource_type"),
+    )
+    with transaction.atomic():
+        IssueRollup.objects.all().delete()
+        for kind, model, category in sources:
+            grouped = (
+                model.objects.annotate(day=TruncDate("created_at"))
+                .values("building", "room_number", category, "day")
+                .annotate(n=Count("id"))
+            )
+            IssueRollup.objects.bulk_create([
+                IssueRollup(kind=kind, building=row["building"], room_number=row["room_number"],
+                            category=row[category], day=row["day"], count=row["n"])
+                for row in grouped
+            ], batch_size=1000)
@@ -0,0 +1,121 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Routing state of the request being served (a RequestPin), set by
+# ReplicaPinningMiddleware; None outside a request.
+_request = ContextVar("replica_request", default=None)
+
+# Statements that do not change data; anything else sent to the primary pins.
+# BEGIN is here because every transaction.atomic() opens with one (SQLite
+# sends BEGIN IMMEDIATE), whether or not anything inside it writes.
+_READ_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN", "SHOW", "BEGIN", "SAVEPOINT", "RELEASE", "COMMIT", "ROLLBACK")
+
+# alias -> (checked_at, lag_seconds)
+_lag_cache = {}
+
+
+class RequestPin:
+    """Whether one request must read from the primary.
+
+    It starts pinned for write requests and for clients that wrote a moment
+    ago. As an execute wrapper on the primary connection it also pins the
+    rest of the request once a statement there actually changes data, so
+    lookups that merely could write (get_or_create finding its row) do not.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.wrote:
+            head = sql.lstrip()[:9].upper()
+            if not head.startswith(_READ_PREFIXES) or " FOR UPDATE" in sql:
+                self.wrote = self.pinned = True
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Routing state for one request; yields its RequestPin."""
+    pin = RequestPin(pinned)
+    token = _request.set(pin)
+    try:
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(pin):
+            yield pin
+    finally:
+        _request.reset(token)
+
+
+def measure_lag(alias):
+    """Seconds the replica is behind the primary (0 for backends without replication)."""
+    conn = connections[alias]
+    if conn.vendor != "postgresql":
+        return 0.0
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        row = cursor.fetchone()
+    # NULL means the server is not in recovery, i.e. it is not lagging behind anything
+    return float(row[0] or 0.0)
+
+
+def replica_lag(alias):
+    """Cached replica lag; an unreachable replica counts as infinitely behind."""
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached and now - cached[0] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return cached[1]
+    try:
+        lag = measure_lag(alias)
+    except Exception as e:
+        print(f"WARNING: Could not measure lag for replica {alias}: {e}")
+        lag = float("inf")
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+class PrimaryReplicaRouter:
+    """Sends reads to a healthy replica and everything else to ``default``.
+
+    Only reads inside a request (see ``ReplicaPinningMiddleware``) use
+    replicas; migrations, commands and the job worker read the primary.
+    Reads also stay on the primary once the request is pinned and when
+    every replica lags more than ``REPLICA_MAX_LAG_SECONDS``.
+    """
+
+    def __init__(self, replicas=None):
+        if replicas is None:
+            replicas = [alias for alias in settings.DATABASES if alias.startswith("replica")]
+        self.replicas = list(replicas)
+
+    def db_for_read(self, model, **hints):
+        pin = _request.get()
+        if pin is None or pin.pinned or not self.replicas:
+            return "default"
+        healthy = [
+            alias for alias in self.replicas
+            if replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+        ]
+        if not healthy:
+            return "default"
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        # Not a write by itself: get_or_create routes its lookup here too.
+        # RequestPin notices statements that really write.
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,182 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Count, Max, Q
+
+from .models import RoomRequest, RecurringBooking
+
+FEED_SALT = "accounts.calendar-feed"
+ICAL_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+
+def _scoped(qs, room_type=None, room_id=None, building=None, user=None):
+    if room_type:
+        qs = qs.filter(room_type=room_type)
+        if room_id:
+            qs = qs.filter(**{f"{'lab' if room_type == 'lab' else 'classroom'}_id": room_id})
+    if building:
+        qs = qs.filter(Q(classroom__building__iexact=building) | Q(lab__building__iexact=building))
+    if user is not None:
+        qs = qs.filter(requested_by=user)
+    return qs
+
+
+def window_bookings(date_from, date_to, **scope):
+    """Approved single bookings in [date_from, date_to], rooms joined in."""
+    return _scoped(
+        RoomRequest.objects.filter(status="approved", requested_date__range=(date_from, date_to)),
+        **scope,
+    ).select_related("classroom", "lab", "requested_by").order_by("requested_date", "start_time")
+
+
+def window_series(date_from, date_to, **scope):
+    """Approved recurring series whose date range meets [date_from, date_to]."""
+    return _scoped(
+        RecurringBooking.objects.filter(status="approved", start_date__lte=date_to, end_date__gte=date_from),
+        **scope,
+    ).select_related("classroom", "lab", "requested_by")
+
+
+def _event(obj, day, kind):
+    room = obj.lab if obj.room_type == "lab" else obj.classroom
+    return {
+        "id": obj.id,
+        "kind": kind,
+        "requested_date": day.isoformat(),
+        "start_time": obj.start_time.isoformat(),
+        "end_time": obj.end_time.isoformat(),
+        "status": obj.status,
+        "purpose": obj.purpose,
+        "room_type": obj.room_type,
+        "room_id": room.id if room else None,
+        "room_name": room.name if room else None,
+        "building": room.building if room else None,
+        "room_number": room.room_number if room else None,
+        "requested_by": obj.requested_by.email,
+    }
+
+
+def calendar_events(date_from, date_to, **scope):
+    """Approved bookings and series sessions in a window, ordered by date and time."""
+    events = [_event(b, b.requested_date, "booking") for b in window_bookings(date_from, date_to, **scope)]
+    for series in window_series(date_from, date_to, **scope):
+        events += [_event(series, day, "series") for day in series.occurrences(date_from, date_to)]
+    events.sort(key=lambda e: (e["requested_date"], e["start_time"], e["room_name"] or ""))
+    return events
+
+
+# iCalendar feeds
+
+def feed_token(scope):
+    """Signed, non-expiring token naming what a subscription URL may read.
+
+    ``scope`` is ``{"user": id}`` or ``{"room_type": ..., "room_id": ...}``.
+    Calendar clients cannot send the Bearer header, so the token in the URL
+    is the credential.
+    """
+    return signing.dumps(scope, salt=FEED_SALT, compress=True)
+
+
+def read_feed_token(token):
+    """Returns the scope for a token, or None if it was tampered with."""
+    try:
+        return signing.loads(token, salt=FEED_SALT)
+    except signing.BadSignature:
+        return None
+
+
+def feed_querysets(scope, since):
+    """Bookings and series for a feed scope, from ``since`` onwards, any status.
+
+    Cancelled and rejected rows are included so the validators below change
+    when a booking disappears; the stream itself filters to approved ones.
+    """
+    kwargs = {"user": scope["user"]} if "user" in scope else {
+        "room_type": scope["room_type"], "room_id": scope["room_id"],
+    }
+    bookings = _scoped(RoomRequest.objects.filter(requested_date__gte=since), **kwargs)
+    series = _scoped(RecurringBooking.objects.filter(end_date__gte=since), **kwargs)
+    return bookings, series
+
+
+def feed_validators(bookings, series):
+    """(etag, last_modified) from two aggregate queries, without loading rows."""
+    a = bookings.aggregate(n=Count("id"), last=Max("updated_at"))
+    b = series.aggregate(n=Count("id"), last=Max("updated_at"))
+    stamps = [s for s in (a["last"], b["last"]) if s]
+    last_modified = max(stamps) if stamps else datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+    digest = hashlib.sha1(f"{a['n']}:{b['n']}:{last_modified.isoformat()}".encode()).hexdigest()
+    return f'"{digest}"', last_modified
+
+
+def _escape(text):
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+    """Folds a content line at 75 octets as RFC 5545 requires."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not parts else 74), len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:  # don't split a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode())
+        start = end
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _local(day, at):
+    # Floating times: shown in the subscriber's local zone, like the web calendar
+    return f"{day:%Y%m%d}T{at:%H%M%S}"
+
+
+def _vevent(obj, uid, day, extra=()):
+    room = obj.lab if obj.room_type == "lab" else obj.classroom
+    location = ", ".join(p for p in (room.name, room.building, room.room_number) if p) if room else ""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_stamp(obj.updated_at)}",
+        f"DTSTART:{_local(day, obj.start_time)}",
+        f"DTEND:{_local(day, obj.end_time)}",
+        f"SUMMARY:{_escape(obj.purpose or obj.room_type.title())}",
+        f"LOCATION:{_escape(location)}",
+        *extra,
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+def ical_stream(bookings, series, name):
+    """Yields an iCalendar document one event at a time.
+
+    Single bookings become one VEVENT each; a recurring series is one VEVENT
+    with an RRULE and EXDATEs, so the feed stays as small as the series table.
+    """
+    yield "".join(_fold(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Campus//Room Bookings//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ])
+    rows = bookings.filter(status="approved").select_related("classroom", "lab").order_by("requested_date", "start_time")
+    for b in rows.iterator(chunk_size=500):
+        yield _vevent(b, f"roomrequest-{b.id}@campus", b.requested_date)
+    for s in series.filter(status="approved").select_related("classroom", "lab").iterator(chunk_size=500):
+        first = next(s.occurrences(), None)
+        if first is None:
+            continue
+        byday = ",".join(ICAL_DAYS[i] for i in range(7) if s.weekdays >> i & 1)
+        extra = [f"RRULE:FREQ=WEEKLY;WKST=MO;INTERVAL={s.interval};BYDAY={byday};UNTIL={s.end_date:%Y%m%d}T235959"]
+        extra += [f"EXDATE:{_local(datetime.fromisoformat(d).date(), s.start_time)}" for d in s.exceptions]
+        yield _vevent(s, f"recurring-{s.id}@campus", first, extra)
+    yield _fold("END:VCALENDAR")
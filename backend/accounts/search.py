@@ -0,0 +1,174 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import FaultReport
+
+FTS_TABLE = "accounts_faultreport_fts"
+
+# Postgres expression index; search queries must repeat it verbatim to use it
+PG_VECTOR = (
+    "to_tsvector('english', coalesce(accounts_faultreport.title, '') || ' ' || "
+    "coalesce(accounts_faultreport.description, '') || ' ' || "
+    "coalesce(accounts_faultreport.location, ''))"
+)
+
+# Highlight markers are control characters so user text can be HTML-escaped
+# before they are swapped for <mark> tags.
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+FILTER_FIELDS = ("status", "severity", "category", "building")
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON accounts_faultreport BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, description, location)
+            VALUES (new.id, new.title, new.description, new.location);
+        END""",
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON accounts_faultreport BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, location)
+            VALUES ('delete', old.id, old.title, old.description, old.location);
+        END""",
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, description, location ON accounts_faultreport BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, location)
+            VALUES ('delete', old.id, old.title, old.description, old.location);
+            INSERT INTO {FTS_TABLE} (rowid, title, description, location)
+            VALUES (new.id, new.title, new.description, new.location);
+        END""",
+}
+
+
+def install_search_index(conn):
+    """Creates the fault text index for the connection's backend (idempotent).
+
+    SQLite drops a table's triggers whenever Django remakes the table during a
+    migration, so this also runs after every migrate and rebuilds the FTS
+    table if any trigger had to be recreated.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "title, description, location, "
+                "content='accounts_faultreport', content_rowid='id', "
+                "tokenize='porter unicode61')"
+            )
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'accounts_faultreport'")
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == "postgresql":
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS accounts_faultreport_search_idx "
+                f"ON accounts_faultreport USING GIN ({PG_VECTOR})"
+            )
+
+
+def uninstall_search_index(conn):
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS accounts_faultreport_search_idx")
+
+
+def _terms(query):
+    # Word characters only, so the terms are safe inside MATCH / to_tsquery syntax
+    return re.findall(r"\w+", query.lower())[:10]
+
+
+def render_highlight(text):
+    if not text:
+        return text
+    return escape(text).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+
+def _filter_sql(filters, reporter_id):
+    clauses, params = [], []
+    for field in FILTER_FIELDS:
+        if filters.get(field):
+            clauses.append(f"accounts_faultreport.{field} = %s")
+            params.append(filters[field])
+    if reporter_id is not None:
+        clauses.append("accounts_faultreport.reported_by_id = %s")
+        params.append(reporter_id)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+def search_faults(query, filters=None, reporter_id=None, page=1, page_size=20):
+    """Ranked full-text search over fault title, description and location.
+
+    The last term is matched as a prefix so results appear while typing.
+    Returns ``(hits, has_more)`` where each hit is ``(fault, rank, title, snippet)``
+    with <mark> highlighted, HTML-escaped strings. Pass ``reporter_id`` to limit
+    results to one reporter's faults.
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], False
+    filters = filters or {}
+    where, params = _filter_sql(filters, reporter_id)
+    offset = (page - 1) * page_size
+    # Fetch one extra row to know whether there is a next page without COUNT(*)
+    limit = page_size + 1
+
+    connection = connections[router.db_for_read(FaultReport)]
+    if connection.vendor == "sqlite":
+        match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        sql = (
+            f"SELECT accounts_faultreport.id, bm25({FTS_TABLE}, 10.0, 1.0, 5.0) AS rank, "
+            f"highlight({FTS_TABLE}, 0, %s, %s), "
+            f"snippet({FTS_TABLE}, 1, %s, %s, '…', 16) "
+            f"FROM {FTS_TABLE} JOIN accounts_faultreport ON accounts_faultreport.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{where} "
+            "ORDER BY rank LIMIT %s OFFSET %s"
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, match, *params, limit, offset]
+    elif connection.vendor == "postgresql":
+        tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MaxWords=20, MinWords=8"
+        sql = (
+            f"SELECT accounts_faultreport.id, ts_rank_cd({PG_VECTOR}, q) AS rank, "
+            "ts_headline('english', accounts_faultreport.title, q, %s), "
+            "ts_headline('english', accounts_faultreport.description, q, %s) "
+            "FROM accounts_faultreport, to_tsquery('english', %s) q "
+            f"WHERE {PG_VECTOR} @@ q{where} "
+            "ORDER BY rank DESC, accounts_faultreport.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [options, options, tsquery, *params, limit, offset]
+    else:
+        # No text index on this backend: plain substring matching, newest first
+        qs = FaultReport.objects.all()
+        for term in terms:
+            qs = qs.filter(Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term))
+        qs = qs.filter(**{f: filters[f] for f in FILTER_FIELDS if filters.get(f)})
+        if reporter_id is not None:
+            qs = qs.filter(reported_by_id=reporter_id)
+        ids = list(qs.order_by("-created_at").values_list("id", flat=True)[offset:offset + limit])
+        rows = [(fault_id, 0.0, None, None) for fault_id in ids]
+        return _hydrate(rows[:page_size]), len(rows) > page_size
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return _hydrate(rows[:page_size]), len(rows) > page_size
+
+
+def _hydrate(rows):
+    faults = FaultReport.objects.select_related("reported_by", "photo").in_bulk([row[0] for row in rows])
+    return [
+        (faults[fault_id], rank, render_highlight(title), render_highlight(snippet))
+        for fault_id, rank, title, snippet in rows
+        if fault_id in faults
+    ]
@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, post_migrate
 from django.dispatch import receiver
-from .models import RoleRequest, Profile
+from .models import RoleRequest, Profile, Notification, FaultReport, OverloadRecord
+from .notify import bump_unread, role_changed
+from .rollups import fault_deleted, fault_saved, overload_saved
+from .search import install_search_index
 
 @receiver(post_save, sender=RoleRequest)
 def update_profile_role(sender, instance, **kwargs):
@@ -9,5 +13,29 @@ def update_profile_role(sender, instance, **kwargs):
             profile = instance.user.profile
             profile.role = instance.requested_role
             profile.save()
+            role_changed([profile.user_id])
         except Profile.DoesNotExist:
             pass
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        bump_unread({instance.user_id: 1})
+
+@receiver(post_save, sender=FaultReport)
+def roll_up_fault(sender, instance, created, **kwargs):
+    fault_saved(instance, created)
+
+@receiver(post_delete, sender=FaultReport)
+def roll_down_fault(sender, instance, **kwargs):
+    fault_deleted(instance)
+
+@receiver(post_save, sender=OverloadRecord)
+def roll_up_overload(sender, instance, created, **kwargs):
+    overload_saved(instance, created)
+
+@receiver(post_migrate)
+def ensure_search_index(sender, using='default', **kwargs):
+    # Table remakes in later migrations drop the SQLite FTS triggers
+    if sender.label == 'accounts':
+        install_search_index(connections[using])
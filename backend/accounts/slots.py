@@ -0,0 +1,172 @@
+from django.db.models import Q
+
+from .booking import ROOM_MODELS, room_field, approved_series
+from .models import RoomRequest, RoomDayOccupancy
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MASK_BYTES = SLOTS_PER_DAY // 8
+
+
+def slot_mask(start_time, end_time):
+    """Bitmap of the slots touched by [start_time, end_time).
+
+    Times that are not on a slot boundary are widened to cover the whole
+    slot, so a 10:05-10:20 booking occupies both 10:00 and 10:15.
+    """
+    first = (start_time.hour * 60 + start_time.minute) // SLOT_MINUTES
+    end_minutes = end_time.hour * 60 + end_time.minute + (1 if end_time.second or end_time.microsecond else 0)
+    last = min(-(-end_minutes // SLOT_MINUTES), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def to_bytes(mask):
+    return mask.to_bytes(MASK_BYTES, "big")
+
+
+def from_bytes(data):
+    return int.from_bytes(bytes(data), "big") if data else 0
+
+
+def slot_ranges(mask):
+    """Yields (start_minute, end_minute) for each run of set bits."""
+    slot = 0
+    while mask >> slot:
+        if mask >> slot & 1:
+            start = slot
+            while mask >> slot & 1:
+                slot += 1
+            yield start * SLOT_MINUTES, slot * SLOT_MINUTES
+        else:
+            slot += 1
+
+
+def rebuild_day(room_type, room_id, day):
+    """Recomputes one room's bitmap for a day from its approved bookings.
+
+    Recomputing (rather than OR-ing in one booking) keeps cancellations and
+    edits correct without having to know what the previous bitmap held.
+    """
+    mask = 0
+    bookings = RoomRequest.objects.filter(
+        **{f"{room_field(room_type)}_id": room_id},
+        requested_date=day,
+        status="approved",
+    ).values_list("start_time", "end_time")
+    for start_time, end_time in bookings:
+        mask |= slot_mask(start_time, end_time)
+    if mask:
+        RoomDayOccupancy.objects.update_or_create(
+            room_type=room_type, room_id=room_id, date=day,
+            defaults={"slots": to_bytes(mask)},
+        )
+    else:
+        RoomDayOccupancy.objects.filter(room_type=room_type, room_id=room_id, date=day).delete()
+    return mask
+
+
+def rebuild_for_booking(room_request):
+    room_id = room_request.lab_id if room_request.room_type == "lab" else room_request.classroom_id
+    if room_id:
+        return rebuild_day(room_request.room_type, room_id, room_request.requested_date)
+    return 0
+
+
+def add_to_occupancy(entries):
+    """ORs (room_type, room_id, day, mask) entries into the stored bitmaps.
+
+    One read and at most one bulk write each for existing and new rows,
+    however many bookings are being added. Recurring-series slots must not
+    be passed in; they are never materialized.
+    """
+    masks = {}
+    for room_type, room_id, day, mask in entries:
+        key = (room_type, room_id, day)
+        masks[key] = masks.get(key, 0) | mask
+    if not masks:
+        return
+    existing = {
+        (row.room_type, row.room_id, row.date): row
+        for row in RoomDayOccupancy.objects.filter(
+            date__in={day for _, _, day in masks}, room_id__in={room_id for _, room_id, _ in masks},
+        )
+    }
+    updated, created = [], []
+    for (room_type, room_id, day), mask in masks.items():
+        row = existing.get((room_type, room_id, day))
+        if row:
+            row.slots = to_bytes(from_bytes(row.slots) | mask)
+            updated.append(row)
+        else:
+            created.append(RoomDayOccupancy(room_type=room_type, room_id=room_id, date=day, slots=to_bytes(mask)))
+    RoomDayOccupancy.objects.bulk_update(updated, ["slots"], batch_size=500)
+    RoomDayOccupancy.objects.bulk_create(created, batch_size=500)
+
+
+def series_masks(room_type, room_ids, days):
+    """Map of (room id, day) -> slots taken by approved recurring series.
+
+    Series are not materialized into RoomDayOccupancy; their occurrences are
+    expanded here for just the requested days.
+    """
+    masks = {}
+    days = set(days)
+    if not days:
+        return masks
+    for series in approved_series(room_type, room_ids, min(days), max(days)):
+        mask = slot_mask(series.start_time, series.end_time)
+        for day in series.occurrences(min(days), max(days)):
+            if day in days:
+                key = (series.room_id, day)
+                masks[key] = masks.get(key, 0) | mask
+    return masks
+
+
+def occupancy(room_type, room_ids, days):
+    """Map of room id -> OR of its bitmaps over ``days``."""
+    masks = {}
+    rows = RoomDayOccupancy.objects.filter(
+        room_type=room_type, date__in=days, room_id__in=room_ids,
+    ).values_list("room_id", "slots")
+    for room_id, slots in rows:
+        masks[room_id] = masks.get(room_id, 0) | from_bytes(slots)
+    for (room_id, _), mask in series_masks(room_type, room_ids, days).items():
+        masks[room_id] = masks.get(room_id, 0) | mask
+    return masks
+
+
+def find_free_rooms(days, start_time, end_time, attendees=1, room_type="classroom", building=None, mode="all"):
+    """Rooms free for the window on every one of ``days``.
+
+    With ``mode="all"`` a room must be free for the whole window (its
+    occupancy AND the window mask is zero). With ``mode="any"`` a room
+    qualifies if at least one slot in the window is free, and the free
+    sub-ranges are returned. Results are ranked by capacity fit, the
+    smallest room that still seats everybody first.
+    """
+    model = ROOM_MODELS[room_type]
+    rooms = model.objects.filter(is_available=True, max_capacity__gte=attendees)
+    if building:
+        rooms = rooms.filter(Q(building__iexact=building))
+    rooms = list(rooms.values("id", "name", "building", "room_number", "max_capacity"))
+    wanted = slot_mask(start_time, end_time)
+    masks = occupancy(room_type, [room["id"] for room in rooms], days)
+
+    results = []
+    for room in rooms:
+        free = wanted & ~masks.get(room["id"], 0)
+        if mode == "all" and free != wanted:
+            continue
+        if not free:
+            continue
+        room["room_type"] = room_type
+        room["spare_seats"] = room["max_capacity"] - attendees
+        room["free_ranges"] = [
+            f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+            for start, end in slot_ranges(free)
+        ]
+        results.append(room)
+    results.sort(key=lambda room: (room["spare_seats"], room["name"]))
+    return results
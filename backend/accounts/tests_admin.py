@@ -0,0 +1,94 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+
+from . import directory
+from .models import Profile
+
+
+class AdminDirectoryTests(TestCase):
+    """Keyset-paginated admin user directory"""
+
+    def setUp(self):
+        self.client = Client()
+        admin = User.objects.create_user(username='admin@test.com', email='admin@test.com', password='password123')
+        Profile.objects.update_or_create(user=admin, defaults={'role': 'admin'})
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': 'admin@test.com', 'password': 'password123'}),
+            content_type='application/json')
+        self.headers = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _make_users(self, start, count):
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f'user{i:03d}', email=f'user{i:03d}@test.com', password='x')
+            role = ('student', 'lecturer', 'manager')[i % 3]
+            Profile.objects.update_or_create(user=user, defaults={'role': role, 'department': f'Dept {i}'})
+
+    def _get(self, **params):
+        response = self.client.get('/api/admin/users', params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _directory_queries(self, **params):
+        # Only count queries on users and profiles; the unread-badge middleware
+        # has its own cache-dependent lookups
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(**params)
+        return [q['sql'] for q in ctx.captured_queries if '"auth_user"' in q['sql'] or '"accounts_profile"' in q['sql']]
+
+    def test_query_count_independent_of_user_count(self):
+        """Test that a page costs the same number of queries for 5 or 60 users"""
+        self._make_users(0, 5)
+        small = self._directory_queries()
+        self._make_users(5, 55)
+        self.assertEqual(len(self._directory_queries()), len(small))
+        self.assertEqual(len(self._directory_queries(page_size=60)), len(small))
+        # Authentication, the admin's role check and the page itself
+        self.assertEqual(len(small), 3)
+
+        _, cursor = directory.list_users(page_size=20)
+        with self.assertNumQueries(1):
+            users, _ = directory.list_users('user0', 'lecturer', cursor, 20)
+            [(u.email, directory.profile_of(u).department) for u in users]
+
+    def test_keyset_pages_cover_everyone_once(self):
+        """Test that following next_cursor visits every user exactly once, in email order"""
+        self._make_users(0, 25)
+        User.objects.create_user(username='noprofile', email='zz@test.com', password='x')
+        seen, cursor = [], None
+        while True:
+            data = self._get(page_size=10, **({'after': cursor} if cursor else {}))
+            seen.extend(u['email'] for u in data['users'])
+            cursor = data['next_cursor']
+            self.assertEqual(data['has_more'], cursor is not None)
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted(User.objects.values_list('email', flat=True)))
+        self.assertEqual(self._get(q='zz')['users'][0]['role'], 'student')
+
+    def test_prefix_search_and_role_filter(self):
+        """Test that q matches email or username prefixes case-insensitively, combined with role"""
+        self._make_users(0, 12)
+        User.objects.create_user(username='Jane.Doe', email='jd@uni.edu', password='x')
+        self.assertEqual([u['username'] for u in self._get(q='JANE')['users']], ['Jane.Doe'])
+        self.assertEqual([u['email'] for u in self._get(q='jd@')['users']], ['jd@uni.edu'])
+        self.assertEqual(len(self._get(q='user01')['users']), 2)
+        self.assertEqual(self._get(q='ser')['users'], [])
+        managers = self._get(role='manager')['users']
+        self.assertEqual({u['role'] for u in managers}, {'manager'})
+        self.assertEqual(len(managers), 4)
+        self.assertEqual(len(self._get(q='user00', role='lecturer')['users']), 3)
+        self.assertEqual(len(self._get(role='student')['users']), 5)
+
+    def test_rejects_bad_params_and_non_admins(self):
+        """Test that bad cursors and roles are 400s and non-admins are refused"""
+        response = self.client.get('/api/admin/users', {'after': 'not-a-cursor'}, **self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/admin/users', {'role': 'wizard'}, **self.headers)
+        self.assertEqual(response.status_code, 400)
+        Profile.objects.filter(user__email='admin@test.com').update(role='manager')
+        response = self.client.get('/api/admin/users', **self.headers)
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,618 @@
+from datetime import date, time, timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .models import (
+    Profile, ClassroomStatus, LabStatus, RoomRequest, RecurringBooking, RoleRequest,
+    LabUpdateRequest, LibraryUpdateRequest, Notification,
+)
+from . import approvals, assignment, jobs, slots
+import json
+
+
+class BookingTestCase(TestCase):
+    """Shared fixtures: a manager, a lecturer and a couple of rooms"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.manager = User.objects.create_user(username='bookmgr@test.com', email='bookmgr@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.manager, defaults={'role': 'manager'})
+        self.lecturer = User.objects.create_user(username='booklecturer@test.com', email='booklecturer@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.lecturer, defaults={'role': 'lecturer'})
+        self.hall = ClassroomStatus.objects.create(name='Hall A', building='Main', room_number='A1', max_capacity=100)
+        self.small = ClassroomStatus.objects.create(name='Room B', building='Main', room_number='B2', max_capacity=30)
+        self.lab = LabStatus.objects.create(name='Chem Lab', building='Science', room_number='L1', max_capacity=24)
+        self.day = date(2026, 3, 2)  # a Monday
+        self.manager_headers = self._login('bookmgr@test.com')
+        self.lecturer_headers = self._login('booklecturer@test.com')
+
+    def _login(self, email):
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': email, 'password': 'password123'}),
+            content_type='application/json')
+        return {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _booking(self, start, end, status='approved', room=None, day=None, attendees=10):
+        room = room or self.hall
+        return RoomRequest.objects.create(
+            requested_by=self.lecturer,
+            room_type='lab' if isinstance(room, LabStatus) else 'classroom',
+            classroom=room if isinstance(room, ClassroomStatus) else None,
+            lab=room if isinstance(room, LabStatus) else None,
+            purpose='Lecture',
+            expected_attendees=attendees,
+            requested_date=day or self.day,
+            start_time=start,
+            end_time=end,
+            status=status,
+        )
+
+    def _post(self, url, payload, headers):
+        return self.client.post(url, data=json.dumps(payload), content_type='application/json', **headers)
+
+
+class BookingConflictTests(BookingTestCase):
+    """Overlap detection at create and approve time"""
+
+    def test_create_rejects_overlap(self):
+        """Test that a request overlapping an approved booking is refused"""
+        existing = self._booking(time(10, 0), time(12, 0))
+        response = self._post('/api/room-requests/create', {
+            'room_type': 'classroom', 'room_id': self.hall.id, 'purpose': 'Seminar',
+            'requested_date': self.day.isoformat(), 'start_time': '11:00', 'end_time': '13:00',
+        }, self.lecturer_headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content)['conflicts'][0]['id'], existing.id)
+
+    def test_create_rejects_bad_room_id(self):
+        """Test that a non-numeric room_id is a 400, not a server error"""
+        for room_id in ('abc', [1]):
+            response = self._post('/api/room-requests/create', {
+                'room_type': 'classroom', 'room_id': room_id, 'purpose': 'Seminar',
+                'requested_date': self.day.isoformat(), 'start_time': '11:00', 'end_time': '13:00',
+            }, self.lecturer_headers)
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(RoomRequest.objects.exists())
+
+    def test_back_to_back_bookings_allowed(self):
+        """Test that touching intervals do not conflict"""
+        self._booking(time(10, 0), time(12, 0))
+        response = self._post('/api/room-requests/create', {
+            'room_type': 'classroom', 'room_id': self.hall.id, 'purpose': 'Seminar',
+            'requested_date': self.day.isoformat(), 'start_time': '12:00', 'end_time': '13:00',
+        }, self.lecturer_headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_approve_rejects_overlap(self):
+        """Test that approving into an occupied slot fails and leaves the request pending"""
+        self._booking(time(9, 0), time(11, 0))
+        pending = self._booking(time(10, 30), time(11, 30), status='pending', room=self.small)
+        response = self._post(f'/api/room-requests/{pending.id}/approve', {'room_id': self.hall.id}, self.manager_headers)
+        self.assertEqual(response.status_code, 409)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'pending')
+
+    def test_approval_does_not_make_room_permanently_unavailable(self):
+        """Test that availability comes from current bookings, not a sticky flag"""
+        pending = self._booking(time(9, 0), time(10, 0), status='pending')
+        response = self._post(f'/api/room-requests/{pending.id}/approve', {'room_id': self.hall.id}, self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        self.hall.refresh_from_db()
+        self.assertTrue(self.hall.is_available)
+
+        now = timezone.localtime()
+        start = (now - timedelta(minutes=5)).time()
+        end = (now + timedelta(minutes=30)).time()
+        if end > start:  # skip the in-progress check right around midnight
+            self._booking(start, end, room=self.small, day=now.date())
+            response = self.client.get('/api/classrooms/list', **self.manager_headers)
+            rooms = {c['id']: c for c in json.loads(response.content)['classrooms']}
+            self.assertFalse(rooms[self.small.id]['is_available'])
+            self.assertTrue(rooms[self.hall.id]['is_available'])
+
+
+class FreeRoomSearchTests(BookingTestCase):
+    """Free-room search over per-day slot bitmaps"""
+
+    def _approve(self, start, end, room):
+        pending = self._booking(start, end, status='pending', room=room)
+        response = self._post(f'/api/room-requests/{pending.id}/approve', {}, self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        return pending
+
+    def _free(self, **params):
+        params.setdefault('date', self.day.isoformat())
+        response = self.client.get('/api/rooms/free', params, **self.lecturer_headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['rooms']
+
+    def test_slot_mask_rounds_outwards(self):
+        """Test that partial slots count as occupied"""
+        self.assertEqual(slots.slot_mask(time(10, 5), time(10, 20)), 0b11 << 40)
+        self.assertEqual(slots.slot_mask(time(23, 45), time(23, 59, 59)), 1 << 95)
+
+    def test_ranked_by_capacity_fit(self):
+        """Test that the tightest room that fits comes first"""
+        rooms = self._free(start_time='10:00', end_time='12:00', attendees=20)
+        self.assertEqual([r['name'] for r in rooms], ['Chem Lab', 'Room B', 'Hall A'])
+        rooms = self._free(start_time='10:00', end_time='12:00', attendees=40, room_type='classroom')
+        self.assertEqual([r['name'] for r in rooms], ['Hall A'])
+
+    def test_booked_room_excluded_until_cancelled(self):
+        """Test that approvals set bits and cancellations clear them"""
+        approved = self._approve(time(11, 0), time(12, 0), self.small)
+        rooms = self._free(start_time='10:00', end_time='12:00', room_type='classroom')
+        self.assertEqual([r['name'] for r in rooms], ['Hall A'])
+
+        partial = self._free(start_time='10:00', end_time='12:00', room_type='classroom', mode='any')
+        room_b = next(r for r in partial if r['name'] == 'Room B')
+        self.assertEqual(room_b['free_ranges'], ['10:00-11:00'])
+
+        response = self._post(f'/api/room-requests/{approved.id}/cancel', {}, self.lecturer_headers)
+        self.assertEqual(response.status_code, 200)
+        rooms = self._free(start_time='10:00', end_time='12:00', room_type='classroom')
+        self.assertEqual({r['name'] for r in rooms}, {'Hall A', 'Room B'})
+
+    def test_multiple_days_must_all_be_free(self):
+        """Test that bitmaps for several dates are combined"""
+        next_week = self.day + timedelta(days=7)
+        pending = self._booking(time(10, 0), time(11, 0), status='pending', room=self.hall, day=next_week)
+        self._post(f'/api/room-requests/{pending.id}/approve', {}, self.manager_headers)
+        rooms = self._free(date=f'{self.day},{next_week}', start_time='10:00', end_time='11:00', room_type='classroom')
+        self.assertEqual([r['name'] for r in rooms], ['Room B'])
+
+
+class AutoAssignTests(BookingTestCase):
+    """Batch auto-assignment of pending room requests"""
+
+    def test_solver_refinement_moves_blocking_request(self):
+        """Test that a one-step swap frees a room for a request greedy could not place"""
+        rooms = {'classroom': [(30, 1), (30, 2)]}
+        requests = [
+            # Finishes first and asks for room 1, so greedy puts it there
+            assignment.Request(1, 'classroom', self.day, time(9, 0), time(10, 0), 20, preferred=1),
+            # Room 2 is already booked at 10:30, so only room 1 works
+            assignment.Request(2, 'classroom', self.day, time(9, 30), time(11, 0), 20),
+        ]
+        busy = {('classroom', 2, self.day): slots.slot_mask(time(10, 30), time(11, 0))}
+        greedy, left = assignment.solve(requests, rooms, busy, refine=False)
+        self.assertEqual((greedy, list(left)), ({1: 1}, [2]))
+        assigned, left = assignment.solve(requests, rooms, busy)
+        self.assertEqual((assigned, left), ({1: 2, 2: 1}, {}))
+
+    def test_never_overlaps_or_overfills(self):
+        """Test that no room is double-booked and capacity is respected"""
+        rooms = {'classroom': [(30, 1), (100, 2)]}
+        requests = [
+            assignment.Request(i, 'classroom', self.day, time(9 + i % 3, 0), time(10 + i % 3, 30), 20 + i * 7)
+            for i in range(10)
+        ]
+        assigned, left = assignment.solve(requests, rooms, {})
+        caps = {1: 30, 2: 100}
+        taken = {}
+        for req in requests:
+            if req.id in assigned:
+                room = assigned[req.id]
+                self.assertLessEqual(req.attendees, caps[room])
+                self.assertFalse(taken.get(room, 0) & req.mask)
+                taken[room] = taken.get(room, 0) | req.mask
+        self.assertEqual(len(assigned) + len(left), len(requests))
+
+    def test_preview_then_commit(self):
+        """Test that preview changes nothing and commit approves in one go"""
+        self._booking(time(9, 0), time(10, 0), room=self.hall)
+        slots.rebuild_day('classroom', self.hall.id, self.day)
+        first = self._booking(time(9, 0), time(10, 0), status='pending', room=self.hall, attendees=25)
+        second = self._booking(time(9, 30), time(11, 0), status='pending', room=self.hall, attendees=90)
+        payload = {'from': self.day.isoformat(), 'to': self.day.isoformat(), 'room_type': 'classroom'}
+
+        response = self._post('/api/room-requests/auto-assign', payload, self.manager_headers)
+        data = json.loads(response.content)
+        self.assertEqual([a['room_id'] for a in data['assignments']], [self.small.id])
+        self.assertEqual(data['unassigned'][0]['request_id'], second.id)
+        self.assertEqual(RoomRequest.objects.filter(status='approved').count(), 1)
+
+        response = self._post('/api/room-requests/auto-assign', {**payload, 'commit': True}, self.manager_headers)
+        self.assertTrue(json.loads(response.content)['committed'])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.classroom_id), ('approved', self.small.id))
+        jobs.run_pending()
+        self.assertEqual(first.requested_by.notifications.count(), 1)
+        rooms = self._free(start_time='09:00', end_time='10:00')
+        self.assertEqual(rooms, [])
+
+    def _free(self, **params):
+        params.setdefault('date', self.day.isoformat())
+        params.setdefault('room_type', 'classroom')
+        response = self.client.get('/api/rooms/free', params, **self.lecturer_headers)
+        return json.loads(response.content)['rooms']
+
+
+class RecurringBookingTests(BookingTestCase):
+    """Weekly series checked and expanded without materializing sessions"""
+
+    def _series(self, **overrides):
+        payload = {
+            'room_type': 'classroom', 'room_id': self.hall.id, 'purpose': 'Algorithms',
+            'start_date': self.day.isoformat(), 'end_date': (self.day + timedelta(weeks=12)).isoformat(),
+            'weekdays': ['mon', 'wed'], 'start_time': '10:00', 'end_time': '12:00',
+        }
+        payload.update(overrides)
+        return self._post('/api/room-requests/recurring/create', payload, self.lecturer_headers)
+
+    def _approve_series(self, **overrides):
+        response = self._series(**overrides)
+        self.assertEqual(response.status_code, 200)
+        series_id = json.loads(response.content)['series']['id']
+        response = self._post(f'/api/room-requests/recurring/{series_id}/approve', {}, self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        return RecurringBooking.objects.get(id=series_id)
+
+    def test_pattern_expansion(self):
+        """Test weekdays, interval and exceptions"""
+        series = RecurringBooking(
+            start_date=self.day, end_date=self.day + timedelta(days=27), weekdays=0b101, interval=2,
+            exceptions=[(self.day + timedelta(days=14)).isoformat()],
+        )
+        days = list(series.occurrences())
+        self.assertEqual(days, [self.day, self.day + timedelta(days=2), self.day + timedelta(days=16)])
+        self.assertEqual(list(series.occurrences(self.day + timedelta(days=1), self.day + timedelta(days=3))),
+                         [self.day + timedelta(days=2)])
+
+    def test_one_row_per_series(self):
+        """Test that approval stores the series only, not its sessions"""
+        self._approve_series()
+        self.assertEqual(RecurringBooking.objects.count(), 1)
+        self.assertEqual(RoomRequest.objects.count(), 0)
+        response = self.client.get('/api/room-requests/recurring/list',
+                                   {'from': self.day.isoformat(), 'to': (self.day + timedelta(days=6)).isoformat()},
+                                   **self.lecturer_headers)
+        series = json.loads(response.content)['series'][0]
+        self.assertEqual(series['occurrences'], [self.day.isoformat(), (self.day + timedelta(days=2)).isoformat()])
+
+    def test_single_booking_conflicts_with_series(self):
+        """Test that a one-off booking on a series day is refused, other days are fine"""
+        self._approve_series()
+        wednesday = self.day + timedelta(weeks=3, days=2)
+        response = self._post('/api/room-requests/create', {
+            'room_type': 'classroom', 'room_id': self.hall.id, 'purpose': 'Seminar',
+            'requested_date': wednesday.isoformat(), 'start_time': '11:00', 'end_time': '13:00',
+        }, self.lecturer_headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('series_id', json.loads(response.content)['conflicts'][0])
+        response = self._post('/api/room-requests/create', {
+            'room_type': 'classroom', 'room_id': self.hall.id, 'purpose': 'Seminar',
+            'requested_date': (wednesday + timedelta(days=1)).isoformat(), 'start_time': '11:00', 'end_time': '13:00',
+        }, self.lecturer_headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_series_conflicts_with_bookings_and_series(self):
+        """Test that a series is checked against single bookings and other series"""
+        self._booking(time(11, 0), time(12, 0), day=self.day + timedelta(weeks=5))
+        response = self._series()
+        self.assertEqual(response.status_code, 409)
+        RoomRequest.objects.all().delete()
+
+        self._approve_series()
+        # Fortnightly Wednesdays overlap; Tuesdays and Thursdays do not
+        self.assertEqual(self._series(weekdays=['wed'], interval=2).status_code, 409)
+        self.assertEqual(self._series(weekdays=['tue', 'thu']).status_code, 200)
+
+    def test_create_validates_room_and_attendees(self):
+        """Test that unknown rooms are 404s and bad room ids or attendee counts are 400s"""
+        self.assertEqual(self._series(room_id=self.lab.id + self.hall.id + 1000).status_code, 404)
+        self.assertEqual(self._series(room_type='lab', room_id=self.hall.id + self.lab.id + 1000).status_code, 404)
+        self.assertEqual(self._series(room_id='abc').status_code, 400)
+        self.assertEqual(self._series(expected_attendees='lots').status_code, 400)
+        self.assertEqual(self._series(expected_attendees=0).status_code, 400)
+        self.assertEqual(RecurringBooking.objects.count(), 0)
+        self.assertEqual(self._series(expected_attendees='30').status_code, 200)
+
+    def test_create_checks_room_capacity(self):
+        """Test that a series needing more seats than the room has is refused"""
+        self.assertEqual(self._series(room_id=self.small.id, expected_attendees=31).status_code, 400)
+        self.assertEqual(self._series(room_type='lab', room_id=self.lab.id, expected_attendees=25).status_code, 400)
+        self.assertEqual(RecurringBooking.objects.count(), 0)
+        self.assertEqual(self._series(room_id=self.small.id, expected_attendees=30).status_code, 200)
+
+    def test_reject_locks_the_series(self):
+        """Test that rejection reads the series under a row lock, like approval"""
+        series_id = json.loads(self._series().content)['series']['id']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post(f'/api/room-requests/recurring/{series_id}/reject',
+                                  {'rejection_reason': 'Closed'}, self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RecurringBooking.objects.get(id=series_id).status, 'rejected')
+        if connection.features.has_select_for_update:
+            self.assertTrue(any('accounts_recurringbooking' in q['sql'] and 'FOR UPDATE' in q['sql']
+                                for q in ctx.captured_queries))
+
+    def test_free_rooms_and_skipped_session(self):
+        """Test that series sessions block the free-room search until skipped"""
+        series = self._approve_series()
+        params = {'date': self.day.isoformat(), 'start_time': '10:00', 'end_time': '11:00', 'room_type': 'classroom'}
+        rooms = json.loads(self.client.get('/api/rooms/free', params, **self.lecturer_headers).content)['rooms']
+        self.assertEqual([r['name'] for r in rooms], ['Room B'])
+
+        response = self._post(f'/api/room-requests/recurring/{series.id}/cancel', {'date': self.day.isoformat()}, self.lecturer_headers)
+        self.assertEqual(response.status_code, 200)
+        rooms = json.loads(self.client.get('/api/rooms/free', params, **self.lecturer_headers).content)['rooms']
+        self.assertEqual({r['name'] for r in rooms}, {'Room B', 'Hall A'})
+
+
+class CalendarTests(BookingTestCase):
+    """Date-window calendar and iCalendar feeds"""
+
+    def _calendar(self, **params):
+        params.setdefault('from', self.day.isoformat())
+        params.setdefault('to', (self.day + timedelta(days=6)).isoformat())
+        response = self.client.get('/api/calendar', params, **self.lecturer_headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['events']
+
+    def _feed_url(self, **params):
+        response = self.client.get('/api/calendar/feed-url', params, **self.lecturer_headers)
+        return json.loads(response.content)['url'].replace('http://testserver', '')
+
+    def test_window_only_approved(self):
+        """Test that only approved bookings inside the window are returned, with series sessions"""
+        self._booking(time(9, 0), time(10, 0))
+        self._booking(time(11, 0), time(12, 0), status='pending')
+        self._booking(time(9, 0), time(10, 0), day=self.day + timedelta(days=30))
+        RecurringBooking.objects.create(
+            requested_by=self.lecturer, room_type='lab', lab=self.lab, purpose='Chem practical',
+            start_date=self.day, end_date=self.day + timedelta(weeks=10), weekdays=0b10,
+            start_time=time(14, 0), end_time=time(16, 0), status='approved',
+        )
+        events = self._calendar()
+        self.assertEqual([(e['kind'], e['requested_date']) for e in events],
+                         [('booking', self.day.isoformat()), ('series', (self.day + timedelta(days=1)).isoformat())])
+        self.assertEqual(events[1]['room_name'], 'Chem Lab')
+        self.assertEqual(len(self._calendar(building='Main')), 1)
+        self.assertEqual(len(self._calendar(room_type='lab', room_id=str(self.lab.id))), 1)
+        response = self.client.get('/api/calendar', {'from': self.day.isoformat(), 'to': self.day.isoformat(),
+                                                     'room_id': 'abc'}, **self.lecturer_headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_independent_of_bookings(self):
+        """Test that rooms are joined in rather than fetched per row"""
+        rooms = [self.hall, self.small, self.lab]
+        for i in range(6):
+            self._booking(time(8 + i, 0), time(9 + i, 0), room=rooms[i % 3])
+        self._calendar()  # creates the inbox state behind the unread-count header
+        # A cold cache makes that header cost the same in both measurements,
+        # whatever expired in between
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self._calendar(to=self.day.isoformat())
+        for i in range(6):
+            self._booking(time(8 + i, 0), time(9 + i, 0), room=rooms[i % 3], day=self.day + timedelta(days=1))
+        cache.clear()
+        with CaptureQueriesContext(connection) as more:
+            self.assertEqual(len(self._calendar()), 12)
+        self.assertEqual(len(few), len(more))
+
+    def test_ics_feed_and_conditional_get(self):
+        """Test that the feed streams events and answers 304 until something changes"""
+        today = date.today()
+        self._booking(time(9, 0), time(10, 0), day=today)
+        RecurringBooking.objects.create(
+            requested_by=self.lecturer, room_type='classroom', classroom=self.hall, purpose='Algorithms, weekly',
+            start_date=today, end_date=today + timedelta(weeks=4), weekdays=0b101, interval=2,
+            start_time=time(10, 0), end_time=time(12, 0), status='approved', exceptions=[],
+        )
+        url = self._feed_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('RRULE:FREQ=WEEKLY;WKST=MO;INTERVAL=2;BYDAY=MO,WE', body)
+        self.assertIn('SUMMARY:Algorithms\\, weekly', body)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self._booking(time(13, 0), time(14, 0), day=today + timedelta(days=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_room_feed_and_bad_token(self):
+        """Test per-room feeds and that tampered tokens are refused"""
+        self._booking(time(9, 0), time(10, 0), day=date.today(), room=self.small)
+        self._booking(time(9, 0), time(10, 0), day=date.today(), room=self.hall)
+        url = self._feed_url(room_type='classroom', room_id=self.small.id)
+        body = b''.join(self.client.get(url).streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('LOCATION:Room B\\, Main\\, B2', body)
+        self.assertEqual(self.client.get(url.replace('.ics', 'x.ics')).status_code, 404)
+
+
+class BulkApprovalTests(BookingTestCase):
+    """One request and one transaction for a whole approval queue"""
+
+    def _bulk(self, kind, ids, action='approve', **extra):
+        response = self._post('/api/approvals/bulk', {'kind': kind, 'ids': ids, 'action': action, **extra}, self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        return {r['id']: r['outcome'] for r in data['results']}
+
+    def test_rooms_with_per_id_outcomes(self):
+        """Test that conflicts inside the batch and with existing bookings are reported per id"""
+        self._booking(time(8, 0), time(9, 0), room=self.small)
+        first = self._booking(time(9, 0), time(10, 0), status='pending')
+        clash = self._booking(time(9, 30), time(10, 30), status='pending')
+        taken = self._booking(time(8, 30), time(9, 30), status='pending', room=self.small)
+        done = self._booking(time(14, 0), time(15, 0), status='rejected')
+        no_room = RoomRequest.objects.create(
+            requested_by=self.lecturer, room_type='classroom', purpose='Any room', requested_date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        outcomes = self._bulk('room', [first.id, clash.id, taken.id, done.id, no_room.id, 99999])
+        self.assertEqual(outcomes, {
+            first.id: 'approved', clash.id: 'conflict', taken.id: 'conflict',
+            done.id: 'not_pending', no_room.id: 'needs_room', 99999: 'not_found',
+        })
+        self.assertEqual(list(RoomRequest.objects.filter(status='approved', classroom=self.hall).values_list('id', flat=True)), [first.id])
+        jobs.run_pending()
+        self.assertEqual(Notification.objects.filter(user=self.lecturer, template='room.approved').count(), 1)
+        self.assertEqual(slots.occupancy('classroom', [self.hall.id], [self.day])[self.hall.id],
+                         slots.slot_mask(time(9, 0), time(10, 0)))
+
+    def test_query_count_independent_of_batch_size(self):
+        """Test that a batch of 20 costs no more queries than a batch of 2"""
+        def batch(n, day):
+            return [self._booking(time(8, 0), time(9, 0), status='pending', day=day + timedelta(days=i)).id for i in range(n)]
+        small = batch(2, self.day)
+        large = batch(20, self.day + timedelta(days=10))
+        self.client.get('/api/notifications/list', **self.manager_headers)  # creates the inbox state behind the unread-count header
+        # A cold cache makes that header cost the same in both measurements,
+        # whatever expired in between
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self._bulk('room', small)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            outcomes = self._bulk('room', large)
+        self.assertEqual(set(outcomes.values()), {'approved'})
+        self.assertEqual(len(few), len(many))
+
+    def test_reject_rooms(self):
+        """Test that rejection stores the reason and notifies each requester"""
+        ids = [self._booking(time(9 + i, 0), time(10 + i, 0), status='pending').id for i in range(3)]
+        self.assertEqual(set(self._bulk('room', ids, 'reject', rejection_reason='Exams').values()), {'rejected'})
+        self.assertEqual(set(RoomRequest.objects.values_list('rejection_reason', flat=True)), {'Exams'})
+        jobs.run_pending()
+        # The three rejections for one requester merge into a single notification
+        rejected = Notification.objects.get(user=self.lecturer, template='room.rejected')
+        self.assertEqual(rejected.count, 3)
+
+    def test_roles_and_labs(self):
+        """Test that role approvals update profiles and lab approvals update labs"""
+        students = [User.objects.create_user(username=f's{i}@test.com', email=f's{i}@test.com', password='x') for i in range(3)]
+        role_ids = [RoleRequest.objects.create(user=s, requested_role='lecturer').id for s in students]
+        self.assertEqual(set(self._bulk('role', role_ids).values()), {'approved'})
+        self.assertEqual(set(Profile.objects.filter(user__in=students).values_list('role', flat=True)), {'lecturer'})
+
+        updates = [LabUpdateRequest.objects.create(lab=self.lab, requested_by=self.lecturer,
+                                                   requested_current_occupancy=n, requested_is_available=False).id
+                   for n in (5, 12)]
+        self.assertEqual(set(self._bulk('lab', updates).values()), {'approved'})
+        self.lab.refresh_from_db()
+        self.assertEqual((self.lab.current_occupancy, self.lab.is_available), (12, False))
+
+    def test_single_role_approval_writes_profile_once(self):
+        """Test that approving one role request updates the profile exactly once"""
+        student = User.objects.create_user(username='single@test.com', email='single@test.com', password='x')
+        req = RoleRequest.objects.create(user=student, requested_role='lecturer')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post(f'/api/admin/role-requests/{req.id}/approve', {}, self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['user']['role'], 'lecturer')
+        self.assertEqual(Profile.objects.get(user=student).role, 'lecturer')
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "accounts_profile"')]), 1)
+
+    def test_managers_only(self):
+        """Test that other roles cannot bulk approve"""
+        response = self._post('/api/approvals/bulk', {'kind': 'room', 'ids': [1], 'action': 'approve'}, self.lecturer_headers)
+        self.assertEqual(response.status_code, 403)
+
+
+class ApprovalQueueTests(BookingTestCase):
+    """Pending requests of every kind in one paginated queue"""
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        student = User.objects.create_user(username='queue@test.com', email='queue@test.com', password='x')
+        self.role = RoleRequest.objects.create(user=student, requested_role='lecturer')
+        self.library = LibraryUpdateRequest.objects.create(requested_by=self.lecturer, requested_name='New Wing',
+                                                           requested_current_occupancy=3, requested_is_open=True)
+        self.lab_update = LabUpdateRequest.objects.create(lab=self.lab, requested_by=self.lecturer,
+                                                          requested_current_occupancy=5, requested_is_available=True)
+        self.later = self._booking(time(9, 0), time(10, 0), status='pending', day=today + timedelta(days=30))
+        self.urgent = self._booking(time(9, 0), time(10, 0), status='pending', day=today + timedelta(days=1))
+        self._booking(time(11, 0), time(12, 0), status='approved', day=today + timedelta(days=1))
+
+    def _queue(self, **params):
+        response = self.client.get('/api/approvals/queue', params, **self.manager_headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _walk(self, page_size, **params):
+        seen, cursor = [], None
+        while True:
+            data = self._queue(page_size=page_size, **params, **({'after': cursor} if cursor else {}))
+            seen.extend((r['kind'], r['id']) for r in data['requests'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_ordered_by_priority_then_age(self):
+        """Test that near-term bookings come first, role changes last, oldest first within a priority"""
+        expected = [('room', self.urgent.id), ('library', self.library.id), ('lab', self.lab_update.id),
+                    ('room', self.later.id), ('role', self.role.id)]
+        data = self._queue()
+        self.assertEqual([(r['kind'], r['id']) for r in data['requests']], expected)
+        self.assertEqual([r['priority'] for r in data['requests']], [0, 1, 1, 1, 2])
+        self.assertEqual(data['requests'][0]['details']['classroom_name'], 'Hall A')
+        self.assertEqual(data['requests'][4]['requested_by'], 'queue@test.com')
+        self.assertEqual(self._walk(2), expected)
+        self.assertEqual(self._walk(1, kind='room,role'), [e for e in expected if e[0] in ('room', 'role')])
+        self.assertEqual(self._walk(1, kind='lab'), [('lab', self.lab_update.id)])
+
+    def test_cursor_breaks_ties_on_kind_and_id(self):
+        """Test that rows with the same priority and age are each listed exactly once"""
+        same = timezone.now() - timedelta(days=1)
+        for model in (LibraryUpdateRequest, LabUpdateRequest, RoomRequest):
+            model.objects.filter(status='pending').update(created_at=same)
+        LabUpdateRequest.objects.create(lab=self.lab, requested_by=self.lecturer,
+                                        requested_current_occupancy=7, requested_is_available=True)
+        LabUpdateRequest.objects.filter(status='pending').update(created_at=same)
+        seen = self._walk(1)
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_constant_queries_per_page(self):
+        """Test that a page costs at most five queries however many requests are queued"""
+        self.client.get('/api/notifications/list', **self.manager_headers)  # creates the inbox state behind the unread-count header
+        cache.clear()  # that header then costs the same in both measurements
+        with CaptureQueriesContext(connection) as few:
+            self._queue()
+        for i in range(20):
+            self._booking(time(9, 0), time(10, 0), status='pending', day=self.day + timedelta(days=i))
+            LabUpdateRequest.objects.create(lab=self.lab, requested_by=self.lecturer,
+                                            requested_current_occupancy=i, requested_is_available=True)
+        with self.assertNumQueries(5):
+            entries, _ = approvals.queue(page_size=50)
+        self.assertEqual(len(entries), 45)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self._queue()
+        self.assertEqual(len(few), len(many))
+
+    def test_listings_use_one_query(self):
+        """Test that the role request and pending update listings do not query per row"""
+        for i in range(5):
+            user = User.objects.create_user(username=f'rr{i}@test.com', email=f'rr{i}@test.com', password='x')
+            RoleRequest.objects.create(user=user, requested_role='manager')
+        self.client.get('/api/notifications/list', **self.manager_headers)
+        for url in ('/api/admin/role-requests', '/api/updates/pending'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, **self.manager_headers)
+            self.assertEqual(response.status_code, 200)
+            tables = ('accounts_rolerequest', 'accounts_libraryupdaterequest', 'accounts_labupdaterequest')
+            self.assertLessEqual(sum(any(t in q['sql'] for t in tables) for q in ctx.captured_queries), 2)
+        requests = json.loads(self.client.get('/api/admin/role-requests', **self.manager_headers).content)['requests']
+        self.assertEqual(len(requests), 6)
+
+    def test_managers_only(self):
+        """Test that other roles cannot see the queue and bad parameters are refused"""
+        response = self.client.get('/api/approvals/queue', **self.lecturer_headers)
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/approvals/queue', {'kind': 'parking'}, **self.manager_headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/approvals/queue', {'after': 'bogus'}, **self.manager_headers)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,157 @@
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+from . import routers
+from .middleware import ReplicaPinningMiddleware
+from .models import FaultReport, Notification, OverloadRecord, OverloadArchive
+from .retention import apply_retention
+
+
+class SQLiteProfileTests(TestCase):
+    """SQLite connection profile (WAL, pragmas, busy handling)"""
+
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Test that every new connection gets the tuned pragmas"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        self.assertEqual(self._pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self._pragma('temp_store'), 2)  # MEMORY
+        self.assertEqual(self._pragma('busy_timeout'), settings.SQLITE_BUSY_TIMEOUT_MS)
+        self.assertEqual(self._pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_write_transactions_are_immediate(self):
+        """Test that atomic blocks take the write lock up front"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class ReplicaRouterTests(TestCase):
+    """Read-replica routing with read-your-writes and lag fallback"""
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter(replicas=['replica1', 'replica2'])
+        routers._lag_cache.clear()
+        self.addCleanup(routers._lag_cache.clear)
+        lag = mock.patch.object(routers, 'measure_lag', return_value=0.0)
+        lag.start()
+        self.addCleanup(lag.stop)
+
+    def test_reads_go_to_replicas(self):
+        """Test that unpinned reads inside a request are spread over the replicas"""
+        with routers.request_scope():
+            self.assertIn(self.router.db_for_read(FaultReport), ['replica1', 'replica2'])
+        # Outside a request (migrations, commands, the job worker) reads use the primary
+        self.assertEqual(self.router.db_for_read(FaultReport), 'default')
+
+    def test_only_real_writes_pin(self):
+        """Test that a lookup routed for writing does not pin, but a write does"""
+        user = User.objects.create_user(username='pin@test.com', email='pin@test.com', password='x')
+        with routers.request_scope() as pin:
+            self.assertEqual(self.router.db_for_write(FaultReport), 'default')
+            User.objects.get_or_create(username='pin@test.com')
+            self.assertFalse(pin.pinned)
+            self.assertIn(self.router.db_for_read(FaultReport), ['replica1', 'replica2'])
+            FaultReport.objects.create(reported_by=user, title='Leak', description='x')
+            self.assertTrue(pin.wrote)
+            self.assertEqual(self.router.db_for_read(FaultReport), 'default')
+        # The next request starts unpinned again
+        with routers.request_scope() as pin:
+            self.assertFalse(pin.pinned)
+
+    def test_transaction_control_does_not_pin(self):
+        """Test that opening and closing a transaction is not a write"""
+        pin = routers.RequestPin()
+        for sql in ('BEGIN IMMEDIATE', 'BEGIN', 'SAVEPOINT "s1"', 'RELEASE SAVEPOINT "s1"', 'COMMIT', 'SELECT 1'):
+            pin(lambda *args: None, sql, None, False, {})
+        self.assertFalse(pin.pinned)
+        pin(lambda *args: None, 'UPDATE accounts_faultreport SET title = %s', ['x'], False, {})
+        self.assertTrue(pin.pinned)
+
+    def test_streaming_body_read_under_request_routing(self):
+        """Test that a streaming body's queries still run inside the request's routing scope"""
+        def body():
+            yield str(self.router.db_for_read(FaultReport)).encode()
+
+        middleware = ReplicaPinningMiddleware(lambda request: StreamingHttpResponse(body()))
+        response = middleware(RequestFactory().get('/api/calendar/feed/x.ics'))
+        self.assertIsNone(routers._request.get())
+        self.assertIn(b''.join(response.streaming_content), [b'replica1', b'replica2'])
+        self.assertIsNone(routers._request.get())
+
+    def test_lagging_replicas_fall_back_to_primary(self):
+        """Test that replicas past the lag threshold are skipped"""
+        routers.measure_lag.return_value = settings.REPLICA_MAX_LAG_SECONDS + 1
+        with routers.request_scope():
+            self.assertEqual(self.router.db_for_read(FaultReport), 'default')
+
+    def test_client_pinned_after_write_request(self):
+        """Test that a GET right after a POST from the same client reads the primary"""
+        seen = []
+        middleware = ReplicaPinningMiddleware(lambda request: seen.append(routers._request.get().pinned) or HttpResponse())
+        factory = RequestFactory()
+        auth = {'HTTP_AUTHORIZATION': 'Bearer pin-test'}
+        middleware(factory.get('/api/faults/list', **auth))
+        middleware(factory.post('/api/faults/create', **auth))
+        middleware(factory.get('/api/faults/list', **auth))
+        middleware(factory.get('/api/faults/list', HTTP_AUTHORIZATION='Bearer someone-else'))
+        self.assertEqual(seen, [False, True, True, False])
+        self.assertIsNone(routers._request.get())
+
+    def test_pinning_middleware_is_outermost(self):
+        """Test that the pinning middleware wraps every other middleware when replicas are configured"""
+        if not settings.REPLICA_DATABASE_URLS:
+            self.skipTest('Run with REPLICA_DATABASE_URLS set')
+        self.assertEqual(settings.MIDDLEWARE[0], 'accounts.middleware.ReplicaPinningMiddleware')
+        self.assertIn('replica1', self.databases)
+
+
+class RetentionTests(TestCase):
+    """Retention policies for notifications and overload records"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='retention@test.com', email='retention@test.com', password='password123')
+        old = timezone.now() - timedelta(days=120)
+        for i in range(5):
+            Notification.objects.create(user=self.user, title=f"Old {i}", message="m", is_read=i < 3)
+            OverloadRecord.objects.create(resource_type='occupancy', building='Library', current_value=120)
+        # auto_now_add ignores explicit values, so backdate with update()
+        Notification.objects.update(created_at=old)
+        OverloadRecord.objects.update(created_at=old)
+        Notification.objects.create(user=self.user, title="Recent", message="m", is_read=True)
+        OverloadRecord.objects.create(resource_type='cpu', building='Science')
+
+    def test_deletes_only_old_read_notifications(self):
+        """Test that unread and recent notifications are kept"""
+        report = apply_retention(['read_notifications'], chunk_size=2)[0]
+        self.assertEqual(report['rows'], 3)
+        self.assertEqual(report['chunks'], 2)
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertFalse(Notification.objects.filter(is_read=True, title__startswith='Old').exists())
+
+    def test_archives_old_overloads(self):
+        """Test that expired overload records are moved into compressed archives"""
+        report = apply_retention(['overload_records'], chunk_size=2)[0]
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual(OverloadRecord.objects.count(), 1)
+        archived = [row for archive in OverloadArchive.objects.all() for row in archive.rows()]
+        self.assertEqual(len(archived), 5)
+        self.assertEqual(archived[0]['building'], 'Library')
+
+    def test_dry_run_changes_nothing(self):
+        """Test that a dry run only counts rows"""
+        reports = apply_retention(dry_run=True)
+        self.assertEqual({r['policy']: r['rows'] for r in reports},
+                         {'read_notifications': 3, 'broadcasts': 0, 'finished_jobs': 0, 'overload_records': 5})
+        self.assertEqual(Notification.objects.count(), 6)
+        self.assertEqual(OverloadArchive.objects.count(), 0)
@@ -0,0 +1,90 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+
+from . import exports
+from .models import Profile, ClassroomStatus, FaultReport, OverloadRecord, RoomRequest
+
+
+class ExportTests(TestCase):
+    """Streaming CSV/NDJSON exports"""
+
+    def setUp(self):
+        self.client = Client()
+        self.headers = {}
+        self.users = {}
+        for email, role in (('mgr@test.com', 'manager'), ('s1@test.com', 'student'), ('s2@test.com', 'student')):
+            user = User.objects.create_user(username=email, email=email, password='password123')
+            Profile.objects.update_or_create(user=user, defaults={'role': role})
+            self.users[email] = user
+            response = self.client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': 'password123'}),
+                content_type='application/json')
+            self.headers[email] = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+        for i, (email, status) in enumerate((('s1@test.com', 'open'), ('s1@test.com', 'resolved'), ('s2@test.com', 'open'))):
+            FaultReport.objects.create(reported_by=self.users[email], title=f'Fault {i}', description='x',
+                                       building='Arts', room_number=str(i), status=status)
+        hall = ClassroomStatus.objects.create(name='Hall A', building='Main', room_number='A1', max_capacity=100)
+        RoomRequest.objects.create(requested_by=self.users['s1@test.com'], room_type='classroom', classroom=hall,
+                                   purpose='Lecture', requested_date=date(2026, 9, 1),
+                                   start_time=time(9), end_time=time(10))
+        OverloadRecord.objects.create(resource_type='cpu', building='IT', room_number='Server')
+
+    def _export(self, dataset, email='mgr@test.com', **params):
+        response = self.client.get(f'/api/exports/{dataset}', params, **self.headers[email])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_with_filters(self):
+        """Test that the CSV has a header row and honours the list filters"""
+        response, body = self._export('faults', status='open')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="faults-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['title'] for row in rows], ['Fault 0', 'Fault 2'])
+        self.assertEqual(rows[0]['reported_by'], 's1@test.com')
+
+    def test_ndjson_gzip(self):
+        """Test that NDJSON can be gzipped on the fly"""
+        response, body = self._export('bookings', format='ndjson', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row['classroom'], row['requested_date'], row['start_time']), ('Hall A', '2026-09-01', '09:00:00'))
+
+    def test_students_export_own_rows(self):
+        """Test that non-managers only get their own rows and no overloads"""
+        _, body = self._export('faults', email='s2@test.com')
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(body.decode())))), 1)
+        response = self.client.get('/api/exports/overloads', **self.headers['s2@test.com'])
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/exports/users', **self.headers['mgr@test.com'])
+        self.assertEqual(response.status_code, 404)
+
+    def test_formula_cells_escaped(self):
+        """Test that text starting with a formula character is neutralised in CSV"""
+        FaultReport.objects.create(reported_by=self.users['s1@test.com'], title='=HYPERLINK("x")', description='x')
+        _, body = self._export('faults')
+        self.assertIn('\'=HYPERLINK', body.decode())
+
+    def test_streams_in_chunks_without_models(self):
+        """Test that rows are read as tuples in bounded chunks"""
+        FaultReport.objects.bulk_create([
+            FaultReport(reported_by=self.users['s1@test.com'], title=f'Bulk {i}', description='x') for i in range(50)
+        ])
+        rows = exports.queryset('faults', None, True, {})
+        self.assertIsInstance(next(iter(rows)), tuple)
+        with CaptureQueriesContext(connection) as ctx:
+            _, body = self._export('faults', format='ndjson')
+        self.assertEqual(len(body.decode().splitlines()), 53)
+        self.assertEqual(sum('accounts_faultreport' in q['sql'] for q in ctx.captured_queries), 1)
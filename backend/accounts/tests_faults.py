@@ -0,0 +1,325 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from . import faults, jobs, lifecycle, sketches
+from .models import Profile, FaultReport, FaultReporter, FaultTransition, Broadcast, Notification
+import json
+
+
+class FaultSearchTests(TestCase):
+    """Server-side full-text search over fault reports"""
+
+    def setUp(self):
+        self.client = Client()
+        self.manager = User.objects.create_user(username='searchmgr@test.com', email='searchmgr@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.manager, defaults={'role': 'manager'})
+        self.student = User.objects.create_user(username='searchstudent@test.com', email='searchstudent@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.student, defaults={'role': 'student'})
+
+        FaultReport.objects.create(reported_by=self.student, title='Projector flickering', description='The projector in the lecture hall flickers constantly', location='Science Hall 101', building='Science Hall', severity='high', category='projector')
+        FaultReport.objects.create(reported_by=self.manager, title='Broken chair', description='Chair leg snapped', location='Arts 2', building='Arts', severity='low', category='furniture')
+        FaultReport.objects.create(reported_by=self.manager, title='Projection screen stuck', description='Screen will not roll down', location='Arts 5', building='Arts', severity='medium', category='projector')
+
+        self.manager_headers = self._login('searchmgr@test.com')
+        self.student_headers = self._login('searchstudent@test.com')
+
+    def _login(self, email):
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': email, 'password': 'password123'}),
+            content_type='application/json')
+        return {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _search(self, headers, **params):
+        response = self.client.get('/api/faults/search', params, **headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_prefix_search_with_highlight(self):
+        """Test that the last term matches as a prefix and hits are highlighted"""
+        data = self._search(self.manager_headers, q='project')
+        titles = {r['title'] for r in data['results']}
+        self.assertEqual(titles, {'Projector flickering', 'Projection screen stuck'})
+        self.assertIn('<mark>', data['results'][0]['title_highlight'])
+
+    def test_filters_combine_with_text(self):
+        """Test that status/severity/building filters narrow the results"""
+        data = self._search(self.manager_headers, q='project', building='Arts')
+        self.assertEqual([r['title'] for r in data['results']], ['Projection screen stuck'])
+
+    def test_students_only_see_own_reports(self):
+        """Test that search respects the same visibility as the list endpoint"""
+        data = self._search(self.student_headers, q='project')
+        self.assertEqual([r['title'] for r in data['results']], ['Projector flickering'])
+
+    def test_pagination_and_index_sync_on_update(self):
+        """Test paging and that edits are picked up by the text index"""
+        data = self._search(self.manager_headers, q='project', page_size=1)
+        self.assertTrue(data['has_more'])
+        FaultReport.objects.filter(title='Broken chair').update(title='Broken projector mount')
+        data = self._search(self.manager_headers, q='mount')
+        self.assertEqual([r['title'] for r in data['results']], ['Broken projector mount'])
+
+    def test_query_required(self):
+        """Test that an empty query is rejected"""
+        response = self.client.get('/api/faults/search', **self.manager_headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class DuplicateFaultTests(TestCase):
+    """Likely duplicate fault reports are merged into the open report"""
+
+    def setUp(self):
+        self.client = Client()
+        self.headers = {}
+        for email, role in (('mgr@test.com', 'manager'), ('s1@test.com', 'student'), ('s2@test.com', 'student')):
+            user = User.objects.create_user(username=email, email=email, password='password123')
+            Profile.objects.update_or_create(user=user, defaults={'role': role})
+            response = self.client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': 'password123'}),
+                content_type='application/json')
+            self.headers[email] = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _report(self, email, **fields):
+        data = {'title': 'Projector not working', 'description': 'No signal', 'building': 'Science Hall',
+                'room_number': '2.14', 'category': 'projector', **fields}
+        response = self.client.post('/api/faults/create', data=json.dumps(data),
+                                    content_type='application/json', **self.headers[email])
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_duplicate_becomes_plus_one(self):
+        """Test that a second report of the same fault links the reporter instead of creating a report"""
+        first = self._report('s1@test.com')
+        second = self._report('s2@test.com', title='projector NOT working!!', building=' science hall ')
+        self.assertEqual(second['duplicate_of'], first['fault']['id'])
+        self.assertEqual(FaultReport.objects.count(), 1)
+        self.assertEqual(Broadcast.objects.count(), 1)
+        fault = FaultReport.objects.get()
+        self.assertEqual(fault.duplicate_count, 1)
+        self.assertEqual(FaultReporter.objects.get().user.email, 's2@test.com')
+
+        # Reporting again changes nothing; the +1 reporter sees the fault in their list
+        self._report('s2@test.com')
+        self.assertEqual(FaultReport.objects.get().duplicate_count, 1)
+        listed = json.loads(self.client.get('/api/faults/list', **self.headers['s2@test.com']).content)['faults']
+        self.assertEqual([f['id'] for f in listed], [fault.id])
+
+    def test_plus_one_reporters_hear_about_updates(self):
+        """Test that status updates reach everyone who reported the fault"""
+        first = self._report('s1@test.com')
+        self._report('s2@test.com')
+        self.client.post(f"/api/faults/{first['fault']['id']}/update", data=json.dumps({'status': 'in_progress'}),
+                         content_type='application/json', **self.headers['mgr@test.com'])
+        jobs.run_pending()
+        self.assertEqual(set(Notification.objects.filter(template='fault.updated').values_list('user__email', flat=True)),
+                         {'s1@test.com', 's2@test.com'})
+
+    def test_different_faults_stay_separate(self):
+        """Test that other rooms, categories, titles, closed or old reports are not matched"""
+        self._report('s1@test.com')
+        self._report('s2@test.com', room_number='2.15')
+        self._report('s2@test.com', category='lighting', title='Lights flicker')
+        self._report('s2@test.com', title='Ceiling speaker buzzing')
+        self.assertEqual(FaultReport.objects.count(), 4)
+
+        FaultReport.objects.update(status='resolved')
+        self._report('s2@test.com')
+        FaultReport.objects.update(created_at=timezone.now() - timedelta(days=30))
+        self._report('s2@test.com', room_number='2.15')
+        self._report('s1@test.com', force_new=True)
+        self.assertEqual(FaultReport.objects.count(), 7)
+        self.assertFalse(FaultReporter.objects.exists())
+
+    def test_untitled_or_unlocated_reports_stay_separate(self):
+        """Test that reports without a title, or without a building and room, are never merged"""
+        self._report('s1@test.com', title='')
+        self._report('s2@test.com', title='')
+        self._report('s2@test.com')
+        self._report('s1@test.com', building='', room_number='', title='Wifi down')
+        self._report('s2@test.com', building='', room_number='', title='Wifi down')
+        self.assertEqual(FaultReport.objects.count(), 5)
+        self.assertFalse(FaultReporter.objects.exists())
+
+    def test_check_is_one_query(self):
+        """Test that the duplicate lookup is a single query on the location key"""
+        for i in range(5):
+            self._report('s1@test.com', title=f'Unrelated issue number {i}', force_new=True)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIsNone(faults.find_duplicate('Science Hall', '2.14', 'projector', 'Whiteboard missing'))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('dedup_key', ctx.captured_queries[0]['sql'])
+
+    def test_similarity(self):
+        """Test the title comparison used to confirm a match"""
+        self.assertTrue(faults.similar_titles('Projector broken', 'broken projector in room'))
+        self.assertTrue(faults.similar_titles('Projecter brokn', 'Projector broken'))
+        self.assertFalse(faults.similar_titles('Projector broken', 'Chair missing'))
+        self.assertFalse(faults.similar_titles('', 'Projector broken'))
+        self.assertFalse(faults.similar_titles('!!', ''))
+
+
+class FaultAnalyticsTests(TestCase):
+    """Grouped fault counts computed by the database"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.headers = {}
+        self.users = {}
+        for email, role in (('mgr@test.com', 'manager'), ('s1@test.com', 'student')):
+            user = User.objects.create_user(username=email, email=email, password='password123')
+            Profile.objects.update_or_create(user=user, defaults={'role': role})
+            self.users[email] = user
+            response = self.client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': 'password123'}),
+                content_type='application/json')
+            self.headers[email] = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+        student, manager = self.users['s1@test.com'], self.users['mgr@test.com']
+        for reporter, severity, category, status in (
+            (student, 'high', 'projector', 'open'),
+            (student, 'low', 'projector', 'resolved'),
+            (manager, 'high', 'lighting', 'open'),
+            (manager, 'high', 'projector', 'open'),
+        ):
+            FaultReport.objects.create(reported_by=reporter, title='Fault', description='x', building='Arts',
+                                       severity=severity, category=category, status=status)
+
+    def _analytics(self, email='mgr@test.com', **params):
+        response = self.client.get('/api/faults/analytics', params, **self.headers[email])
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_group_by_combination(self):
+        """Test that counts come back per combination of the requested fields"""
+        data = self._analytics(group_by='status,severity')
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(data['groups'], [
+            {'status': 'open', 'severity': 'high', 'count': 3},
+            {'status': 'resolved', 'severity': 'low', 'count': 1},
+        ])
+        data = self._analytics(group_by='category', status='open')
+        self.assertEqual({g['category']: g['count'] for g in data['groups']}, {'lighting': 1, 'projector': 2})
+
+    def test_time_buckets(self):
+        """Test that bucketing groups by period start"""
+        old = FaultReport.objects.filter(severity='low').get()
+        FaultReport.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        data = self._analytics(group_by='', bucket='month')
+        self.assertEqual([g['count'] for g in data['groups']], [1, 3])
+        self.assertEqual(data['groups'][-1]['period'], timezone.now().date().replace(day=1).isoformat())
+        data = self._analytics(group_by='', bucket='day', since=(timezone.now() - timedelta(days=7)).date().isoformat())
+        self.assertEqual(data['total'], 3)
+
+    def test_students_see_own_reports(self):
+        """Test that non-managers only count faults they reported"""
+        data = self._analytics(email='s1@test.com', group_by='severity')
+        self.assertEqual(data['total'], 2)
+
+    def test_cached_single_query(self):
+        """Test that a repeat request within the TTL does not hit the reports table"""
+        self._analytics(group_by='status,category', bucket='week')
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._analytics(group_by='status,category', bucket='week')
+        self.assertEqual(data['total'], 4)
+        self.assertFalse(any('accounts_faultreport' in q['sql'] for q in ctx.captured_queries))
+
+    def test_rejects_unknown_fields(self):
+        """Test that unknown grouping fields and buckets are refused"""
+        for params in ({'group_by': 'title'}, {'bucket': 'year'}, {'since': 'yesterday'}):
+            response = self.client.get('/api/faults/analytics', params, **self.headers['mgr@test.com'])
+            self.assertEqual(response.status_code, 400)
+
+
+class FaultLifecycleTests(TestCase):
+    """Status transition log and resolution-time percentiles"""
+
+    def setUp(self):
+        self.client = Client()
+        self.manager = User.objects.create_user(username='mgr@test.com', email='mgr@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.manager, defaults={'role': 'manager'})
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': 'mgr@test.com', 'password': 'password123'}),
+            content_type='application/json')
+        self.headers = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _fault(self, hours_ago, category='projector'):
+        fault = FaultReport.objects.create(reported_by=self.manager, title='Fault', description='x',
+                                           building='Arts', category=category)
+        FaultReport.objects.filter(pk=fault.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        return fault
+
+    def _update(self, fault, **data):
+        response = self.client.post(f'/api/faults/{fault.id}/update', data=json.dumps(data),
+                                    content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def _metrics(self, **params):
+        response = self.client.get('/api/faults/metrics', params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['metrics']
+
+    def test_sketch_relative_accuracy(self):
+        """Test that sketch quantiles stay within the relative accuracy bound"""
+        import random
+        rnd = random.Random(5)
+        values = sorted(rnd.lognormvariate(9, 2) for _ in range(5000))
+        buckets = {}
+        for value in values:
+            sketches.add(buckets, value)
+        for q, estimate in zip((0.5, 0.9, 0.99), sketches.quantiles(buckets, (0.5, 0.9, 0.99))):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(estimate - exact) / exact, sketches.RELATIVE_ACCURACY * 1.01)
+
+    def test_transitions_logged(self):
+        """Test that each status change appends to the history"""
+        fault = self._fault(hours_ago=1)
+        self._update(fault, status='in_progress', assigned_to='Facilities')
+        self._update(fault, severity='high')
+        self._update(fault, status='resolved')
+        response = self.client.get(f'/api/faults/{fault.id}/history', **self.headers)
+        data = json.loads(response.content)
+        self.assertEqual([(t['from_status'], t['to_status']) for t in data['transitions']],
+                         [('open', 'in_progress'), ('in_progress', 'resolved')])
+        self.assertEqual(data['transitions'][0]['changed_by'], 'mgr@test.com')
+        self.assertIsNotNone(data['resolved_at'])
+
+    def test_percentiles_per_group(self):
+        """Test that acknowledge and resolve times are reported per category and assignee"""
+        for hours in (1, 2, 3, 4, 100):
+            self._update(self._fault(hours_ago=hours), status='in_progress', assigned_to='Facilities')
+        self._update(self._fault(hours_ago=10, category='lighting'), status='closed', assigned_to='IT')
+        overall = self._metrics()
+        ack = overall['acknowledge'][0]
+        self.assertEqual(ack['count'], 6)
+        self.assertAlmostEqual(ack['p50'], 3 * 3600, delta=3 * 3600 * 0.02)
+        self.assertAlmostEqual(ack['p99'], 10 * 3600, delta=10 * 3600 * 0.02)
+        self.assertEqual(overall['resolve'][0]['count'], 1)
+        by_category = {row['value']: row['count'] for row in self._metrics(group_by='category')['acknowledge']}
+        self.assertEqual(by_category, {'lighting': 1, 'projector': 5})
+        by_assignee = {row['value']: row['count'] for row in self._metrics(group_by='assignee')['resolve']}
+        self.assertEqual(by_assignee, {'IT': 1})
+
+    def test_reopened_fault_counted_once(self):
+        """Test that reopening and resolving again keeps the first resolution time"""
+        fault = self._fault(hours_ago=5)
+        for status in ('resolved', 'open', 'resolved'):
+            self._update(fault, status=status)
+        self.assertEqual(FaultTransition.objects.filter(fault=fault).count(), 3)
+        self.assertEqual(self._metrics()['resolve'][0]['count'], 1)
+
+    def test_metrics_read_sketches_only(self):
+        """Test that the metrics endpoint does not scan faults and rebuild matches"""
+        for hours in (1, 6, 30):
+            self._update(self._fault(hours_ago=hours), status='done')
+        before = self._metrics(group_by='building')
+        with CaptureQueriesContext(connection) as ctx:
+            self._metrics(group_by='building')
+        self.assertFalse(any('accounts_faultreport' in q['sql'] for q in ctx.captured_queries))
+        lifecycle.rebuild()
+        self.assertEqual(self._metrics(group_by='building'), before)
+        response = self.client.get('/api/faults/metrics', {'group_by': 'title'}, **self.headers)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .models import Profile, Notification, Job
+from . import jobs
+import json
+
+FLAKY_CALLS = []
+
+
+@jobs.task("tests.flaky")
+def flaky(payload):
+    FLAKY_CALLS.append(payload)
+    Notification.objects.create(user_id=payload["user_id"], title="Partial", message="m")
+    if len(FLAKY_CALLS) < payload["succeed_on"]:
+        raise RuntimeError("temporary failure")
+
+
+class JobQueueTests(TestCase):
+    """Database-backed job queue and its worker"""
+
+    def setUp(self):
+        FLAKY_CALLS.clear()
+        self.client = Client()
+        self.manager = User.objects.create_user(username='jobmgr@test.com', email='jobmgr@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.manager, defaults={'role': 'manager'})
+        self.reporter = User.objects.create_user(username='jobuser@test.com', email='jobuser@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.reporter, defaults={'role': 'lecturer'})
+
+    def _headers(self, email):
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': email, 'password': 'password123'}),
+            content_type='application/json')
+        return {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _due_now(self):
+        Job.objects.filter(status='queued').update(run_at=timezone.now() - timedelta(seconds=1))
+
+    def test_notification_written_by_worker(self):
+        """Test that the request only queues the notification and the worker writes it"""
+        from .models import FaultReport
+        fault = FaultReport.objects.create(reported_by=self.reporter, title='Leak', description='Water')
+        response = self.client.post(f'/api/faults/{fault.id}/update', data=json.dumps({'status': 'in_progress'}),
+                                    content_type='application/json', **self._headers('jobmgr@test.com'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(Job.objects.get().task, 'notifications.create')
+
+        self.assertEqual(jobs.run_pending('test-worker'), (1, 0))
+        self.assertEqual(Notification.objects.get().user, self.reporter)
+        self.assertEqual(Job.objects.get().status, 'done')
+
+    def test_retry_with_backoff_then_success(self):
+        """Test that a failing job is retried later and its partial writes are rolled back"""
+        job = jobs.enqueue('tests.flaky', {'user_id': self.reporter.id, 'succeed_on': 2})
+        self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('temporary failure', job.last_error)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        self.assertEqual(jobs.run_pending(), (0, 0))  # not due yet
+        self._due_now()
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that a job that keeps failing ends up failed"""
+        job = jobs.enqueue('tests.flaky', {'user_id': self.reporter.id, 'succeed_on': 99}, max_attempts=2)
+        jobs.run_pending()
+        self._due_now()
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(jobs.queue_stats()['failed'], 1)
+
+    def test_stale_jobs_are_reclaimed(self):
+        """Test that jobs held by a dead worker go back to the queue"""
+        job = jobs.enqueue('notifications.create', {'notifications': []})
+        self.assertEqual(len(jobs.claim('dead-worker')), 1)
+        self.assertEqual(jobs.claim('other-worker'), [])
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.reclaim_stale(), 1)
+        self.assertEqual([j.id for j in jobs.claim('other-worker')], [job.id])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode(self):
+        """Test that JOBS_EAGER runs jobs in-process once the transaction commits"""
+        payload = {'notifications': [
+            {'user_id': self.reporter.id, 'title': 'Now', 'message': 'm', 'action_link': None},
+        ]}
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.enqueue('notifications.create', payload)
+            self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+
+        # A job a worker already claimed is not run a second time
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.enqueue('notifications.create', payload)
+            self.assertEqual(len(jobs.claim('worker')), 1)
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(jobs.run_now(job.id))
+
+    def test_stats_endpoint(self):
+        """Test queue depth metrics for managers"""
+        jobs.enqueue('notifications.create', {'notifications': []})
+        jobs.enqueue('notifications.create', {'notifications': []}, delay=60)
+        response = self.client.get('/api/admin/jobs', **self._headers('jobmgr@test.com'))
+        stats = json.loads(response.content)
+        self.assertEqual((stats['queued'], stats['due']), (2, 1))
+        self.assertEqual(stats['pending_by_task'], {'notifications.create': 2})
+        response = self.client.get('/api/admin/jobs', **self._headers('jobuser@test.com'))
+        self.assertEqual(response.status_code, 403)
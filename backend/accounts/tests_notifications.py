@@ -0,0 +1,424 @@
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.utils import timezone
+from . import jobs, notify, notification_templates as templates
+from .models import Profile, Notification, Broadcast, BroadcastReceipt, NotificationState, Job, RoleRequest
+import json
+
+
+class BroadcastNotificationTests(TestCase):
+    """Role broadcasts stored once and read per user"""
+
+    def setUp(self):
+        self.client = Client()
+        self.managers = []
+        for i in range(4):
+            user = User.objects.create_user(username=f'mgr{i}@test.com', email=f'mgr{i}@test.com', password='password123')
+            Profile.objects.update_or_create(user=user, defaults={'role': 'admin' if i == 3 else 'manager'})
+            self.managers.append(user)
+        self.lecturer = User.objects.create_user(username='lect@test.com', email='lect@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.lecturer, defaults={'role': 'lecturer'})
+        # Accounts predate the broadcasts sent in the tests
+        User.objects.update(date_joined=timezone.now() - timedelta(days=1))
+        self.headers = {u.email: self._login(u.email) for u in self.managers + [self.lecturer]}
+
+    def _login(self, email):
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': email, 'password': 'password123'}),
+            content_type='application/json')
+        return {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _inbox(self, user):
+        response = self.client.get('/api/notifications/list', **self.headers[user.email])
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _report_fault(self):
+        # A different room each time, so reports are not merged as duplicates
+        self.rooms_reported = getattr(self, 'rooms_reported', 0) + 1
+        response = self.client.post('/api/faults/create', data=json.dumps({
+            'title': 'Broken projector', 'description': 'No signal', 'building': 'Main',
+            'room_number': str(100 + self.rooms_reported),
+        }), content_type='application/json', **self.headers[self.lecturer.email])
+        self.assertEqual(response.status_code, 200)
+
+    def test_fault_report_writes_one_row(self):
+        """Test that notifying every manager costs a single insert"""
+        self._report_fault()
+        self.assertEqual(Broadcast.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+        for manager in self.managers:
+            inbox = self._inbox(manager)
+            self.assertEqual(inbox['unread_count'], 1)
+            self.assertEqual(inbox['notifications'][0]['kind'], 'broadcast')
+        self.assertEqual(self._inbox(self.lecturer)['unread_count'], 0)
+
+    def test_receipts_are_per_user(self):
+        """Test that one manager reading a broadcast leaves it unread for the others"""
+        self._report_fault()
+        broadcast = Broadcast.objects.get()
+        response = self.client.post(f'/api/notifications/broadcast/{broadcast.id}/read', **self.headers['mgr0@test.com'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._inbox(self.managers[0])['unread_count'], 0)
+        self.assertTrue(self._inbox(self.managers[0])['notifications'][0]['is_read'])
+        self.assertEqual(self._inbox(self.managers[1])['unread_count'], 1)
+
+        response = self.client.post(f'/api/notifications/broadcast/{broadcast.id}/read', **self.headers['lect@test.com'])
+        self.assertEqual(response.status_code, 404)
+
+    def test_inbox_merges_direct_and_broadcast(self):
+        """Test that direct notifications and broadcasts share one list and one counter"""
+        manager = self.managers[0]
+        Notification.objects.create(user=manager, title='Direct', message='For you')
+        self._report_fault()
+        inbox = self._inbox(manager)
+        self.assertEqual(inbox['unread_count'], 2)
+        self.assertEqual([n['title'] for n in inbox['notifications']], ['New Fault Reported', 'Direct'])
+
+    def test_read_all_moves_watermark(self):
+        """Test that read-all clears both kinds and compacts receipts"""
+        manager = self.managers[0]
+        Notification.objects.create(user=manager, title='Direct', message='For you')
+        self._report_fault()
+        self._report_fault()
+        first = Broadcast.objects.order_by('id').first()
+        self.client.post(f'/api/notifications/broadcast/{first.id}/read', **self.headers[manager.email])
+        self.assertEqual(BroadcastReceipt.objects.count(), 1)
+
+        self.client.post('/api/notifications/read-all', **self.headers[manager.email])
+        self.assertEqual(self._inbox(manager)['unread_count'], 0)
+        self.assertEqual(BroadcastReceipt.objects.count(), 0)
+        self._report_fault()
+        self.assertEqual(self._inbox(manager)['unread_count'], 1)
+
+    def test_new_staff_start_with_empty_inbox(self):
+        """Test that broadcasts sent before an account existed are not unread for it"""
+        self._report_fault()
+        newcomer = User.objects.create_user(username='new@test.com', email='new@test.com', password='password123')
+        Profile.objects.update_or_create(user=newcomer, defaults={'role': 'manager'})
+        self.headers[newcomer.email] = self._login(newcomer.email)
+        self.assertEqual(self._inbox(newcomer)['unread_count'], 0)
+
+
+class InboxSyncTests(TestCase):
+    """Incrementally maintained unread counters and the delta sync endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.manager = User.objects.create_user(username='mgr@test.com', email='mgr@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.manager, defaults={'role': 'manager'})
+        User.objects.update(date_joined=timezone.now() - timedelta(days=1))
+        self.manager.refresh_from_db()
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': 'mgr@test.com', 'password': 'password123'}),
+            content_type='application/json')
+        self.headers = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _sync(self, since=None):
+        url = '/api/notifications/sync' + (f'?since={since}' if since else '')
+        response = self.client.get(url, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _true_unread(self):
+        state = NotificationState.objects.get(user=self.manager)
+        direct = Notification.objects.filter(user=self.manager, is_read=False).count()
+        broadcasts = Broadcast.objects.filter(
+            audience__in=notify.audiences_for('manager'), created_at__gt=state.broadcasts_read_until,
+        ).exclude(receipts__user=self.manager).count()
+        return direct + broadcasts
+
+    def test_counters_track_every_change(self):
+        """Test that the stored counter matches a full recount after each kind of change"""
+        self._sync()
+        first = Notification.objects.create(user=self.manager, title='One', message='Direct')
+        notify.create_notifications({'notifications': [
+            {'user_id': self.manager.id, 'title': 'Two', 'message': 'Queued', 'action_link': None},
+        ]})
+        b1 = notify.notify_staff('Fault', 'Broken projector')
+        notify.broadcast('lecturer', 'Not for managers', 'Ignored')
+        self.assertEqual(self._sync()['unread_count'], 3)
+        self.assertEqual(self._true_unread(), 3)
+
+        self.client.post(f'/api/notifications/{first.id}/read', **self.headers)
+        self.client.post(f'/api/notifications/{first.id}/read', **self.headers)
+        self.client.post(f'/api/notifications/broadcast/{b1.id}/read', **self.headers)
+        self.client.post(f'/api/notifications/broadcast/{b1.id}/read', **self.headers)
+        self.assertEqual(self._sync()['unread_count'], 1)
+        self.assertEqual(self._true_unread(), 1)
+
+        self.client.post('/api/notifications/read-all', **self.headers)
+        notify.notify_staff('Fault', 'Another')
+        self.assertEqual(self._sync()['unread_count'], 1)
+        self.assertEqual(self._true_unread(), 1)
+
+    def test_failed_counter_write_rolls_back_reads(self):
+        """Test that a read mark and its counter update commit or fail together"""
+        first = Notification.objects.create(user=self.manager, title='One', message='Direct')
+        Notification.objects.create(user=self.manager, title='Two', message='Direct')
+        self.assertEqual(self._sync()['unread_count'], 2)
+        update = QuerySet.update
+
+        def failing_update(qs, **kwargs):
+            if qs.model is NotificationState:
+                raise DatabaseError('counter write failed')
+            return update(qs, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', failing_update):
+            with self.assertRaises(DatabaseError):
+                notify.mark_read(self.manager, 'manager', first.id)
+            with self.assertRaises(DatabaseError):
+                notify.mark_all_read(self.manager, 'manager')
+        self.assertEqual(Notification.objects.filter(user=self.manager, is_read=False).count(), 2)
+        self.assertEqual(self._true_unread(), 2)
+        self.assertEqual(self._sync()['unread_count'], 2)
+
+    def test_role_change_recounts(self):
+        """Test that a new role counts only broadcasts sent after the change"""
+        notify.broadcast('lecturer', 'Lecturers only', 'Hello')
+        self.assertEqual(self._sync()['unread_count'], 0)
+        Profile.objects.filter(user=self.manager).update(role='lecturer')
+        self.assertEqual(self._sync()['unread_count'], 0)
+        notify.broadcast('lecturer', 'Lecturers only', 'Again')
+        self.assertEqual(self._sync()['unread_count'], 1)
+        Profile.objects.filter(user=self.manager).update(role='manager')
+        self.assertEqual(self._sync()['unread_count'], 0)
+        self.assertEqual(self._true_unread(), 0)
+
+    def test_unchanged_poll_is_cheap(self):
+        """Test that polling an unchanged inbox returns nothing and reads only the state row"""
+        Notification.objects.create(user=self.manager, title='One', message='Direct')
+        cursor = self._sync()['cursor']
+        with CaptureQueriesContext(connection) as ctx:
+            body = self._sync(cursor)
+        self.assertEqual(body['notifications'], [])
+        self.assertEqual(body['cursor'], cursor)
+        self.assertEqual(body['unread_count'], 1)
+        notification_queries = [q['sql'] for q in ctx.captured_queries if 'notification' in q['sql'].lower()]
+        self.assertEqual(len(notification_queries), 1)
+
+    def test_delta_returns_only_changes(self):
+        """Test that a sync after changes returns the changed rows, not the whole inbox"""
+        old = Notification.objects.create(user=self.manager, title='Old', message='Seen already')
+        Notification.objects.filter(id=old.id).update(updated_at=timezone.now() - timedelta(minutes=5))
+        cursor = self._sync()['cursor']
+
+        fresh = Notification.objects.create(user=self.manager, title='Fresh', message='New')
+        b = notify.notify_staff('Fault', 'Broken projector')
+        body = self._sync(cursor)
+        self.assertFalse(body['full'])
+        self.assertEqual({(n['kind'], n['id']) for n in body['notifications']}, {('direct', fresh.id), ('broadcast', b.id)})
+        self.assertEqual(body['unread_count'], 3)
+
+        self.client.post(f'/api/notifications/broadcast/{b.id}/read', **self.headers)
+        body = self._sync(body['cursor'])
+        read = [n for n in body['notifications'] if n['kind'] == 'broadcast']
+        self.assertEqual([(n['id'], n['is_read']) for n in read], [(b.id, True)])
+        self.assertEqual(body['unread_count'], 2)
+
+    def test_invalid_cursor_returns_full_inbox(self):
+        """Test that a missing or garbled cursor falls back to the full list"""
+        Notification.objects.create(user=self.manager, title='One', message='Direct')
+        body = self._sync('garbage')
+        self.assertTrue(body['full'])
+        self.assertEqual(len(body['notifications']), 1)
+
+    def test_authenticated_responses_carry_unread_header(self):
+        """Test that any authenticated response reports the unread count and change token"""
+        response = self.client.get('/api/notifications/list', **self.headers)
+        self.assertEqual(response['X-Unread-Notifications'], '0')
+        token = response['X-Notifications-Token']
+        self.assertEqual(token, '.'.join(json.loads(response.content)['cursor'].split('.')[:2]))
+
+        Notification.objects.create(user=self.manager, title='One', message='Direct')
+        notify.notify_staff('Fault', 'Broken projector')
+        response = self.client.get('/api/room-requests/list', **self.headers)
+        self.assertEqual(response['X-Unread-Notifications'], '2')
+        self.assertNotEqual(response['X-Notifications-Token'], token)
+
+        # Unchanged inbox: served from the cache without touching notification tables
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/room-requests/list', **self.headers)
+        self.assertEqual(response['X-Unread-Notifications'], '2')
+        self.assertFalse([q for q in ctx.captured_queries if 'notification' in q['sql'].lower()])
+
+        self.assertFalse(self.client.get('/api/room-requests/list').has_header('X-Unread-Notifications'))
+
+    def test_approved_role_applies_to_cached_header(self):
+        """Test that approving a role, singly or in bulk, drops the cached unread summary"""
+        students = []
+        for email in ('s1@test.com', 's2@test.com'):
+            student = User.objects.create_user(username=email, email=email, password='password123')
+            Profile.objects.update_or_create(user=student, defaults={'role': 'student'})
+            response = self.client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': 'password123'}),
+                content_type='application/json')
+            headers = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+            self.assertEqual(self.client.get('/api/room-requests/list', **headers)['X-Unread-Notifications'], '0')
+            students.append((RoleRequest.objects.create(user=student, requested_role='manager'), headers))
+
+        (single, _), (bulk, _) = students
+        notify.notify_staff('Fault', 'Sent before the promotion')
+        response = self.client.post(f'/api/admin/role-requests/{single.id}/approve', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/approvals/bulk', data=json.dumps({'kind': 'role', 'ids': [bulk.id], 'action': 'approve'}),
+                                    content_type='application/json', **self.headers)
+        self.assertEqual(json.loads(response.content)['succeeded'], 1)
+
+        notify.notify_staff('Fault', 'Broken projector')
+        for _, headers in students:
+            self.assertEqual(self.client.get('/api/room-requests/list', **headers)['X-Unread-Notifications'], '1')
+
+
+class CoalescingTests(TestCase):
+    """Bursts of similar notifications merge into one row; digests batch the rest"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.manager = User.objects.create_user(username='mgr@test.com', email='mgr@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.manager, defaults={'role': 'manager'})
+        self.lecturer = User.objects.create_user(username='lect@test.com', email='lect@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.lecturer, defaults={'role': 'lecturer'})
+        User.objects.update(date_joined=timezone.now() - timedelta(days=1))
+        self.headers = {}
+        for email in ('mgr@test.com', 'lect@test.com'):
+            response = self.client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': 'password123'}),
+                content_type='application/json')
+            self.headers[email] = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _report_fault(self, building='Science Hall'):
+        # A different room each time, so reports are not merged as duplicates
+        self.rooms_reported = getattr(self, 'rooms_reported', 0) + 1
+        response = self.client.post('/api/faults/create', data=json.dumps({
+            'title': 'Broken projector', 'description': 'No signal', 'building': building,
+            'room_number': str(100 + self.rooms_reported),
+        }), content_type='application/json', **self.headers['lect@test.com'])
+        self.assertEqual(response.status_code, 200)
+
+    def _inbox(self, email='mgr@test.com'):
+        return json.loads(self.client.get('/api/notifications/list', **self.headers[email]).content)
+
+    def test_fault_burst_becomes_one_broadcast(self):
+        """Test that faults in one building merge and keep a running count"""
+        for _ in range(3):
+            self._report_fault()
+        self._report_fault('Main')
+        self.assertEqual(Broadcast.objects.count(), 2)
+        merged = Broadcast.objects.get(count=3)
+        self.assertTrue(merged.message.startswith('3 new fault reports in Science Hall'))
+        inbox = self._inbox()
+        self.assertEqual(inbox['unread_count'], 2)
+        self.assertEqual(sorted(n['count'] for n in inbox['notifications']), [1, 3])
+
+    def test_merge_after_read_is_unread_again(self):
+        """Test that a report merged into a broadcast the manager already read shows as new"""
+        self._report_fault()
+        self.assertEqual(self._inbox()['unread_count'], 1)
+        first = Broadcast.objects.get()
+        self.client.post(f'/api/notifications/broadcast/{first.id}/read', **self.headers['mgr@test.com'])
+        self.assertEqual(self._inbox()['unread_count'], 0)
+        self._report_fault()
+        inbox = self._inbox()
+        self.assertEqual(inbox['unread_count'], 1)
+        self.assertEqual([(n['count'], n['is_read']) for n in inbox['notifications']], [(2, False)])
+        # Merging into a still-unread broadcast does not count it twice
+        self._report_fault()
+        self.assertEqual(self._inbox()['unread_count'], 1)
+
+    def test_outside_window_starts_new_row(self):
+        """Test that only notifications inside the coalescing window merge"""
+        self._report_fault()
+        Broadcast.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        self._report_fault()
+        self.assertEqual(sorted(Broadcast.objects.values_list('count', flat=True)), [1, 1])
+
+    def test_direct_notifications_merge_while_unread(self):
+        """Test that a batch of approvals for one user becomes one row"""
+        notify.notify_many([
+            notify.notice(self.lecturer, 'room.approved', room_type='classroom', date=f'2026-09-0{i + 1}')
+            for i in range(5)
+        ])
+        jobs.run_pending()
+        row = Notification.objects.get(user=self.lecturer)
+        self.assertEqual(row.count, 5)
+        inbox = self._inbox('lect@test.com')
+        self.assertEqual(inbox['notifications'][0]['message'],
+                         '5 of your room requests were approved. Latest: Your request for classroom on 2026-09-05 has been approved.')
+
+        notify.notify_user(self.lecturer, 'room.approved', room_type='lab', date='2026-09-08')
+        jobs.run_pending()
+        self.assertEqual(Notification.objects.get(user=self.lecturer).count, 6)
+        self.assertEqual(self._inbox('lect@test.com')['unread_count'], 1)
+
+        self.client.post(f'/api/notifications/{row.id}/read', **self.headers['lect@test.com'])
+        notify.notify_user(self.lecturer, 'room.approved', room_type='lab', date='2026-09-09')
+        jobs.run_pending()
+        self.assertEqual(Notification.objects.filter(user=self.lecturer).count(), 2)
+        self.assertEqual(self._inbox('lect@test.com')['unread_count'], 1)
+
+    def test_templates_without_summary_do_not_merge(self):
+        """Test that only templates with a summary coalesce"""
+        for status in ('in_progress', 'resolved'):
+            notify.notify_user(self.lecturer, 'fault.updated', title='Projector', status=status)
+        jobs.run_pending()
+        self.assertEqual(Notification.objects.filter(user=self.lecturer).count(), 2)
+
+    def test_digest_batches_direct_notifications(self):
+        """Test that digest mode holds notifications and delivers one row per period"""
+        response = self.client.post('/api/notifications/preferences', data=json.dumps({'digest_minutes': 60}),
+                                    content_type='application/json', **self.headers['lect@test.com'])
+        self.assertEqual(json.loads(response.content)['digest_minutes'], 60)
+        notify.notify_user(self.lecturer, 'room.approved', room_type='lab', date='2026-09-01')
+        notify.notify_user(self.lecturer, 'room.approved', room_type='lab', date='2026-09-02')
+        notify.notify_user(self.lecturer, 'fault.updated', title='Projector', status='resolved')
+        jobs.run_pending()
+        self.assertFalse(Notification.objects.filter(user=self.lecturer).exists())
+        self.assertEqual(Job.objects.filter(task='notifications.digest', status='queued').count(), 1)
+
+        Job.objects.filter(task='notifications.digest').update(run_at=timezone.now())
+        jobs.run_pending()
+        digest = Notification.objects.get(user=self.lecturer)
+        self.assertEqual(digest.count, 3)
+        self.assertEqual(digest.message, '2 × Room Request Approved, Fault Report Update')
+        self.assertEqual(self._inbox('lect@test.com')['unread_count'], 1)
+
+        response = self.client.post('/api/notifications/preferences', data=json.dumps({'digest_minutes': -5}),
+                                    content_type='application/json', **self.headers['lect@test.com'])
+        self.assertEqual(response.status_code, 400)
+
+
+class NotificationTemplateTests(TestCase):
+    """Notifications stored as a template id plus parameters"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lect@test.com', email='lect@test.com', password='password123')
+
+    def test_rows_store_parameters_not_text(self):
+        """Test that templated rows keep no rendered text and render on read"""
+        notify.create_notifications({'notifications': [
+            {'user_id': self.user.id, 'template': 'role.rejected', 'params': {'role': 'manager'}},
+        ]})
+        row = Notification.objects.get()
+        self.assertEqual((row.title, row.message), ('', ''))
+        self.assertEqual(templates.render_notification(row), (
+            'Role Request Rejected',
+            'Your request for the manager role was rejected. Please contact an administrator.',
+            '/role-select',
+        ))
+
+    def test_inline_rows_and_missing_parameters(self):
+        """Test that untemplated rows render as stored and missing parameters do not fail"""
+        row = Notification(user=self.user, title='Hello', message='Inline text', action_link='/x')
+        self.assertEqual(templates.render_notification(row), ('Hello', 'Inline text', '/x'))
+        self.assertEqual(templates.render('fault.updated', {'title': 'Lamp'})[1],
+                         "The status of your report 'Lamp' has been updated to {status}.")
+        self.assertEqual(templates.render('no.such.template', {})[0], 'Notification')
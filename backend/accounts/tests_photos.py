@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from PIL import Image
+
+from . import jobs, photos
+from .models import Profile, FaultPhoto, FaultReport, Job
+
+
+def _jpeg(size=(800, 600), color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class FaultPhotoTests(TestCase):
+    """Streamed, content-addressed fault photo uploads"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        overrides = override_settings(MEDIA_ROOT=self.media)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = Client()
+        self.headers = {}
+        self.users = {}
+        for email, role in (('mgr@test.com', 'manager'), ('s1@test.com', 'student'), ('s2@test.com', 'student')):
+            user = User.objects.create_user(username=email, email=email, password='password123')
+            Profile.objects.update_or_create(user=user, defaults={'role': role})
+            self.users[email] = user
+            response = self.client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': 'password123'}),
+                content_type='application/json')
+            self.headers[email] = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+        self.fault = FaultReport.objects.create(reported_by=self.users['s1@test.com'], title='Leak', description='x')
+
+    def _upload(self, content, fault=None, email='s1@test.com', name='photo.jpg'):
+        fault = fault or self.fault
+        response = self.client.post(f'/api/faults/{fault.id}/photo',
+                                    {'photo': SimpleUploadedFile(name, content, content_type='image/jpeg')},
+                                    **self.headers[email])
+        jobs.run_pending()  # the thumbnail job, as the worker runs it
+        return response
+
+    def _temp_files(self):
+        tmp = os.path.join(self.media, 'photos', 'tmp')
+        return os.listdir(tmp) if os.path.isdir(tmp) else []
+
+    def test_upload_stores_by_hash_and_thumbnails(self):
+        """Test that an upload is stored under its hash and thumbnailed in the background"""
+        response = self._upload(_jpeg())
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        photo = FaultPhoto.objects.get()
+        self.assertTrue(os.path.exists(photos.path_for(photo.sha256)))
+        self.assertTrue(photo.has_thumbnail)
+        self.assertEqual((photo.width, photo.height), (800, 600))
+        self.assertEqual(data['photo']['url'], f'/api/photos/{photo.sha256}')
+        with Image.open(photos.path_for(photo.sha256, thumbnail=True)) as thumb:
+            self.assertLessEqual(max(thumb.size), 320)
+        self.assertEqual(self._temp_files(), [])
+        listed = json.loads(self.client.get('/api/faults/list', **self.headers['s1@test.com']).content)
+        self.assertEqual(listed['faults'][0]['photo']['thumbnail_url'], f'/api/photos/{photo.sha256}/thumbnail')
+
+    def test_upload_leaves_thumbnail_to_the_queue(self):
+        """Test that the upload request only queues the thumbnail, and a worker without the file skips it"""
+        self.client.post(f'/api/faults/{self.fault.id}/photo',
+                         {'photo': SimpleUploadedFile('photo.jpg', _jpeg(), content_type='image/jpeg')},
+                         **self.headers['s1@test.com'])
+        photo = FaultPhoto.objects.get()
+        self.assertFalse(os.path.exists(photos.path_for(photo.sha256, thumbnail=True)))
+        self.assertEqual(Job.objects.get().task, 'photos.thumbnail')
+        elsewhere = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, elsewhere)
+        with override_settings(MEDIA_ROOT=elsewhere):
+            jobs.run_pending()
+        self.assertEqual(Job.objects.get().status, 'done')
+        photo.refresh_from_db()
+        self.assertFalse(photo.has_thumbnail)
+
+    def test_missing_thumbnail_made_on_request(self):
+        """Test that a thumbnail the job never made is made when first requested"""
+        response = self.client.post(f'/api/faults/{self.fault.id}/photo',
+                                    {'photo': SimpleUploadedFile('photo.jpg', _jpeg(), content_type='image/jpeg')},
+                                    **self.headers['s1@test.com'])
+        photo = FaultPhoto.objects.get()
+        self.assertFalse(photo.has_thumbnail)
+        self.assertEqual(json.loads(response.content)['photo']['thumbnail_url'], f'/api/photos/{photo.sha256}/thumbnail')
+        response = self.client.get(f'/api/photos/{photo.sha256}/thumbnail')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        photo.refresh_from_db()
+        self.assertTrue(photo.has_thumbnail)
+
+    def test_identical_uploads_stored_once(self):
+        """Test that the same photo on two faults shares one file"""
+        other = FaultReport.objects.create(reported_by=self.users['s1@test.com'], title='Crack', description='x')
+        content = _jpeg()
+        self._upload(content)
+        response = self._upload(content, fault=other, name='again.jpg')
+        self.assertTrue(json.loads(response.content)['deduplicated'])
+        self.assertEqual(FaultPhoto.objects.count(), 1)
+        self.assertEqual(FaultReport.objects.filter(photo__isnull=False).count(), 2)
+        self.assertEqual(self._temp_files(), [])
+
+    def test_rejects_non_images_and_oversized(self):
+        """Test that non-images and photos over the limit are refused without leftovers"""
+        response = self._upload(b'%PDF-1.4 not a photo', name='doc.pdf')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(FAULT_PHOTO_MAX_BYTES=100 * 1024):
+            response = self._upload(b'\xff\xd8\xff' + os.urandom(400 * 1024))
+            self.assertEqual(response.status_code, 413)
+            response = self._upload(b'\xff\xd8\xff' + os.urandom(120 * 1024))
+            self.assertEqual(response.status_code, 413)
+        self.assertFalse(FaultPhoto.objects.exists())
+        self.assertEqual(self._temp_files(), [])
+
+    def test_only_reporter_or_manager(self):
+        """Test that other students cannot attach photos to a fault"""
+        self.assertEqual(self._upload(_jpeg(), email='s2@test.com').status_code, 403)
+        self.assertEqual(self._upload(_jpeg(), email='mgr@test.com').status_code, 200)
+
+    def test_serving_ranges_and_caching(self):
+        """Test that photos are served with cache headers and byte ranges"""
+        content = _jpeg()
+        self._upload(content)
+        sha256 = FaultPhoto.objects.get().sha256
+        response = self.client.get(f'/api/photos/{sha256}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(f'/api/photos/{sha256}', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(content)}')
+        response = self.client.get(f'/api/photos/{sha256}', HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), content[-5:])
+        response = self.client.get(f'/api/photos/{sha256}', HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(f'/api/photos/{sha256}', HTTP_IF_NONE_MATCH=f'"{sha256}"')
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(f'/api/photos/{sha256}/thumbnail')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(self.client.get('/api/photos/' + '0' * 64).status_code, 404)
@@ -1,7 +1,13 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
-from .models import Profile, FaultReport, OverloadRecord
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from . import rollups, trends
+from .retention import apply_retention
+from .models import Profile, FaultReport, OverloadRecord, IssueRollup
 import json
+import numpy as np
 from datetime import datetime, timedelta
 
 class AuthenticationFlowTests(TestCase):
@@ -130,3 +136,166 @@ class RecurringPatternTests(TestCase):
         self.assertEqual(len(data['recurring_overloads']), 1)
         self.assertEqual(data['recurring_overloads'][0]['building'], "Library")
         self.assertEqual(data['recurring_overloads'][0]['count'], 2)
+
+
+class IssueRollupTests(TestCase):
+    """US-11: recurring issues served from the incrementally maintained rollup"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(username='admin@test.com', email='admin@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.admin, defaults={'role': 'admin'})
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': 'admin@test.com', 'password': 'password123'}),
+            content_type='application/json')
+        self.headers = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _fault(self, room='101', category='projector', days_ago=0):
+        fault = FaultReport.objects.create(reported_by=self.admin, title='Fault', building='Science',
+                                           room_number=room, category=category)
+        if days_ago:
+            # update() skips the rollup signal; tests that backdate call rollups.rebuild()
+            FaultReport.objects.filter(pk=fault.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return fault
+
+    def _recurring(self, **params):
+        response = self.client.get('/api/reports/recurring', params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_inserts_update_rollup(self):
+        """Test that each insert bumps one daily row"""
+        self._fault()
+        self._fault()
+        OverloadRecord.objects.create(resource_type='occupancy', building='Library', room_number='Main')
+        self.assertEqual(IssueRollup.objects.get(kind='fault').count, 2)
+        self.assertEqual(IssueRollup.objects.get(kind='overload').count, 1)
+
+    def test_deletes_and_archiving_update_rollup(self):
+        """Test that deleting a fault or archiving overloads takes them out of the rollup"""
+        for _ in range(3):
+            OverloadRecord.objects.create(resource_type='occupancy', building='Library', room_number='Main')
+        OverloadRecord.objects.create(resource_type='cpu', building='Library', room_number='Main')
+        OverloadRecord.objects.filter(resource_type='occupancy').update(created_at=timezone.now() - timedelta(days=200))
+        rollups.rebuild()
+        self._fault()
+        self._fault().delete()
+        apply_retention(['overload_records'], chunk_size=2)
+        counts = set(IssueRollup.objects.filter(count__gt=0).values_list('kind', 'category', 'count'))
+        self.assertEqual(counts, {('fault', 'projector', 1), ('overload', 'cpu', 1)})
+        # Matches a rebuild from the raw tables, apart from rows left at zero
+        fields = ('kind', 'building', 'room_number', 'category', 'day', 'count')
+        maintained = set(IssueRollup.objects.filter(count__gt=0).values_list(*fields))
+        rollups.rebuild()
+        self.assertEqual(maintained, set(IssueRollup.objects.values_list(*fields)))
+
+    def test_windows_and_thresholds(self):
+        """Test that days and min_count narrow the report"""
+        for days_ago in (0, 1, 20, 60):
+            self._fault(days_ago=days_ago)
+        self._fault(room='102')
+        rollups.rebuild()
+        self.assertEqual([f['count'] for f in self._recurring()['recurring_faults']], [4])
+        self.assertEqual([f['count'] for f in self._recurring(days=7)['recurring_faults']], [2])
+        self.assertEqual([f['count'] for f in self._recurring(days=30)['recurring_faults']], [3])
+        self.assertEqual(len(self._recurring(min_count=1)['recurring_faults']), 2)
+        self.assertEqual(self._recurring(days=7, min_count=3)['recurring_faults'], [])
+        response = self.client.get('/api/reports/recurring', {'days': 'week'}, **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_category_change_moves_count(self):
+        """Test that recategorising a fault moves it between rollup rows"""
+        fault = self._fault()
+        self._fault()
+        fault = FaultReport.objects.get(pk=fault.pk)
+        fault.category = 'lighting'
+        fault.save()
+        counts = dict(IssueRollup.objects.filter(kind='fault').values_list('category', 'count'))
+        self.assertEqual(counts, {'projector': 1, 'lighting': 1})
+        self.assertEqual(self._recurring()['recurring_faults'], [])
+
+    def test_report_does_not_touch_raw_tables(self):
+        """Test that the report reads only the rollup"""
+        for _ in range(3):
+            self._fault()
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._recurring(days=30)
+        self.assertEqual(data['recurring_faults'][0]['count'], 3)
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('accounts_faultreport', tables)
+        self.assertNotIn('accounts_overloadrecord', tables)
+
+    def test_rebuild_matches_incremental(self):
+        """Test that a full rebuild agrees with the incrementally kept counts"""
+        for room in ('101', '101', '102'):
+            self._fault(room=room)
+        OverloadRecord.objects.create(resource_type='cpu', building='IT', room_number='Server')
+        before = set(IssueRollup.objects.values_list('kind', 'building', 'room_number', 'category', 'day', 'count'))
+        rollups.rebuild()
+        after = set(IssueRollup.objects.values_list('kind', 'building', 'room_number', 'category', 'day', 'count'))
+        self.assertEqual(before, after)
+
+
+class IssueTrendTests(TestCase):
+    """US-11: vectorized trend and spike detection over the rollup"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(username='admin@test.com', email='admin@test.com', password='password123')
+        Profile.objects.update_or_create(user=self.admin, defaults={'role': 'admin'})
+        response = self.client.post('/api/auth/login',
+            data=json.dumps({'email': 'admin@test.com', 'password': 'password123'}),
+            content_type='application/json')
+        self.headers = {'HTTP_AUTHORIZATION': f"Bearer {json.loads(response.content)['token']}"}
+
+    def _counts(self):
+        rng = np.random.default_rng(3)
+        counts = rng.poisson(0.3, size=(50, 60)).astype(np.float32)
+        counts[7, -7:] += 3  # one location jumps in the last week
+        return counts
+
+    def test_spike_ranked_first(self):
+        """Test that a location whose last week jumps ranks first with a high z-score"""
+        counts = self._counts()
+        stats = trends.analyze(counts)
+        top = trends.worsening(stats, limit=5)
+        self.assertEqual(top[0], 7)
+        self.assertGreaterEqual(stats['z_score'][7], trends.SPIKE_Z)
+        self.assertAlmostEqual(stats['recent_rate'][7], counts[7, -7:].mean(), places=5)
+        self.assertAlmostEqual(stats['week_change'][7], counts[7, -7:].sum() - counts[7, -14:-7].sum(), places=4)
+
+    def test_steady_location_not_worsening(self):
+        """Test that a constant series has no trend"""
+        stats = trends.analyze(np.full((1, 30), 2, dtype=np.float32))
+        self.assertEqual(stats['z_score'][0], 0)
+        self.assertEqual(len(trends.worsening(stats)), 0)
+
+    def test_pool_matches_single_process(self):
+        """Test that splitting across worker processes gives the same statistics"""
+        counts = self._counts()
+        single = trends.analyze(counts)
+        pooled = trends.analyze_parallel(counts, workers=2, threshold=0)
+        for field in trends.FIELDS:
+            np.testing.assert_allclose(pooled[field], single[field])
+
+    def test_endpoint_reads_rollup(self):
+        """Test that the trends report ranks locations from the rollup rows"""
+        today = timezone.localdate()
+        for days_ago in range(7):
+            IssueRollup.objects.create(kind='fault', building='Science', room_number='101',
+                                       category='projector', day=today - timedelta(days=days_ago), count=2)
+        for days_ago in range(60):
+            IssueRollup.objects.create(kind='fault', building='Arts', room_number='5',
+                                       category='lighting', day=today - timedelta(days=days_ago), count=1)
+        response = self.client.get('/api/reports/trends', {'days': 60}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['locations']), 1)
+        location = data['locations'][0]
+        self.assertEqual((location['building'], location['room_number']), ('Science', '101'))
+        self.assertEqual(location['recent_count'], 14)
+        self.assertTrue(location['spike'])
+        response = self.client.get('/api/reports/trends', {'days': 7}, **self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/reports/trends', {'kind': 'bookings'}, **self.headers)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,116 @@
+"""Vectorized trend and spike detection over per-location daily counts.
+
+Everything here works on a (locations x days) NumPy array and computes the
+statistics for all locations at once. The module deliberately imports
+nothing from Django so process-pool workers can load it without setting
+Django up; rollups.daily_counts() supplies the rows.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+WINDOW = 7
+EWMA_ALPHA = 0.1  # roughly a 19-day span
+# Floor on the baseline daily rate, so a location with no history does not
+# turn a single report into an infinite z-score
+MIN_RATE = 1 / 28
+SPIKE_Z = 3.0
+# Below this many locations the pool's start-up and pickling cost more than it saves
+POOL_THRESHOLD = 20000
+FIELDS = ("recent_rate", "previous_rate", "week_change", "baseline", "z_score")
+
+
+def matrix(rows, start, days):
+    """Builds the count matrix from (location, day, count) rows.
+
+    Returns ``(locations, counts)``: the distinct location keys in first-seen
+    order and a float32 array with one row per location and one column per
+    day from ``start``.
+    """
+    index, loc_idx, day_idx, values = {}, [], [], []
+    for location, day, count in rows:
+        loc_idx.append(index.setdefault(location, len(index)))
+        day_idx.append((day - start).days)
+        values.append(count)
+    counts = np.zeros((len(index), days), dtype=np.float32)
+    if values:
+        np.add.at(counts, (np.array(loc_idx), np.array(day_idx)), np.array(values, dtype=np.float32))
+    return list(index), counts
+
+
+def analyze(counts, window=WINDOW, alpha=EWMA_ALPHA):
+    """Trend statistics for every row of ``counts``.
+
+    - recent_rate / previous_rate: mean daily count over the last ``window``
+      days and the ``window`` days before that (rolling sums via cumsum)
+    - week_change: recent minus previous, in events per window
+    - baseline: EWMA of the daily count over the history before the recent
+      window, with an EW variance alongside it
+    - z_score: how far the recent rate sits above the baseline, in standard
+      errors of a ``window``-day mean; the variance is at least the mean, as
+      for Poisson counts
+
+    Returns a dict of float64 arrays, one value per location.
+    """
+    n, days = counts.shape
+    csum = np.zeros((n, days + 1))
+    np.cumsum(counts, axis=1, out=csum[:, 1:])
+    recent = (csum[:, days] - csum[:, max(days - window, 0)]) / window
+    previous = (csum[:, max(days - window, 0)] - csum[:, max(days - 2 * window, 0)]) / window
+
+    # Column-major so each day in the recursion below is a contiguous vector
+    history = np.asfortranarray(counts[:, :max(days - window, 0)])
+    mean = np.zeros(n)
+    var = np.zeros(n)
+    if history.shape[1]:
+        mean[:] = history[:, 0]
+        diff = np.empty(n)
+        # The recursion runs over days, each step a few in-place vector
+        # operations over all locations
+        for t in range(1, history.shape[1]):
+            np.subtract(history[:, t], mean, out=diff)
+            mean += alpha * diff
+            var += alpha * diff * diff
+            var *= 1 - alpha
+    floor = np.maximum(mean, MIN_RATE)
+    z = (recent - mean) / np.sqrt(np.maximum(var, floor) / window)
+    return {
+        "recent_rate": recent,
+        "previous_rate": previous,
+        "week_change": (recent - previous) * window,
+        "baseline": mean,
+        "z_score": z,
+    }
+
+
+def analyze_parallel(counts, workers=None, threshold=POOL_THRESHOLD, **kwargs):
+    """``analyze`` split across a process pool once there are enough rows."""
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or counts.shape[0] < threshold:
+        return analyze(counts, **kwargs)
+    chunks = np.array_split(counts, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(partial(analyze, **kwargs), chunks))
+    return {field: np.concatenate([part[field] for part in parts]) for field in FIELDS}
+
+
+def worsening(stats, limit=20, min_events=2, window=WINDOW):
+    """Indices of locations getting worse, most significant first.
+
+    A location qualifies when its recent rate is above both its baseline and
+    the previous window, with at least ``min_events`` in the recent window.
+    """
+    recent = stats["recent_rate"]
+    mask = (
+        (recent * window >= min_events)
+        & (recent > stats["baseline"])
+        & (recent > stats["previous_rate"])
+    )
+    candidates = np.flatnonzero(mask)
+    if len(candidates) > limit:
+        # argpartition keeps this linear in the number of locations
+        top = np.argpartition(-stats["z_score"][candidates], limit - 1)[:limit]
+        candidates = candidates[top]
+    return candidates[np.argsort(-stats["z_score"][candidates], kind="stable")]
@@ -30,32 +30,62 @@ urlpatterns = [
     path("updates/library/<int:request_id>/reject", views.reject_library_update, name="reject_library_update"),
     path("updates/lab/<int:request_id>/approve", views.approve_lab_update, name="approve_lab_update"),
     path("updates/lab/<int:request_id>/reject", views.reject_lab_update, name="reject_lab_update"),
+    path("approvals/bulk", views.bulk_decide_requests, name="bulk_decide_requests"),
+    path("approvals/queue", views.approval_queue, name="approval_queue"),
     
     # Room request endpoints
     path("room-requests/create", views.create_room_request, name="create_room_request"),
     path("room-requests/list", views.list_room_requests, name="list_room_requests"),
     path("room-requests/<int:request_id>/approve", views.approve_room_request, name="approve_room_request"),
     path("room-requests/<int:request_id>/reject", views.reject_room_request, name="reject_room_request"),
+    path("room-requests/<int:request_id>/cancel", views.cancel_room_request, name="cancel_room_request"),
+    path("room-requests/recurring/create", views.create_recurring_booking, name="create_recurring_booking"),
+    path("room-requests/recurring/list", views.list_recurring_bookings, name="list_recurring_bookings"),
+    path("room-requests/recurring/<int:series_id>/approve", views.approve_recurring_booking, name="approve_recurring_booking"),
+    path("room-requests/recurring/<int:series_id>/reject", views.reject_recurring_booking, name="reject_recurring_booking"),
+    path("room-requests/recurring/<int:series_id>/cancel", views.cancel_recurring_booking, name="cancel_recurring_booking"),
+    path("room-requests/auto-assign", views.auto_assign_room_requests, name="auto_assign_room_requests"),
+    path("rooms/free", views.find_free_rooms, name="find_free_rooms"),
+    
+    # Calendar endpoints
+    path("calendar", views.calendar, name="calendar"),
+    path("calendar/feed-url", views.calendar_feed_url, name="calendar_feed_url"),
+    path("calendar/feed/<str:token>.ics", views.calendar_feed, name="calendar_feed"),
     
     # Fault report endpoints
     path("faults/create", views.create_fault, name="create_fault"),
     path("faults/list", views.list_faults, name="list_faults"),
+    path("faults/search", views.search_faults, name="search_faults"),
+    path("faults/analytics", views.fault_analytics, name="fault_analytics"),
+    path("faults/metrics", views.fault_metrics, name="fault_metrics"),
+    path("faults/<int:fault_id>/history", views.fault_history, name="fault_history"),
     path("faults/<int:fault_id>/update", views.update_fault, name="update_fault"),
+    path("faults/<int:fault_id>/photo", views.upload_fault_photo, name="upload_fault_photo"),
+    path("photos/<slug:sha256>", views.fault_photo, name="fault_photo"),
+    path("photos/<slug:sha256>/thumbnail", views.fault_photo, {"thumbnail": True}, name="fault_photo_thumbnail"),
+    
+    # Streaming exports
+    path("exports/<str:dataset>", views.export_data, name="export_data"),
     
     # Admin endpoints
     path("admin/users", views.admin_users, name="admin_users"),
     path("admin/stats", views.admin_stats, name="admin_stats"),
+    path("admin/jobs", views.admin_job_stats, name="admin_job_stats"),
     path("admin/role-requests", views.admin_role_requests, name="admin_role_requests"),
     path("admin/role-requests/<int:request_id>/approve", views.admin_approve_role, name="admin_approve_role"),
     path("admin/role-requests/<int:request_id>/reject", views.admin_reject_role, name="admin_reject_role"),
     
     # Recurring issues (US-11)
     path("reports/recurring", views.get_recurring_issues, name="recurring_issues"),
+    path("reports/trends", views.get_issue_trends, name="issue_trends"),
     path("reports/log-overload", views.log_overload, name="log_overload"),
     
     # Notifications
     path("notifications/list", views.list_notifications, name="list_notifications"),
+    path("notifications/sync", views.notifications_sync, name="notifications_sync"),
+    path("notifications/preferences", views.notification_preferences, name="notification_preferences"),
     path("notifications/<int:notification_id>/read", views.mark_notification_read, name="mark_notification_read"),
+    path("notifications/broadcast/<int:broadcast_id>/read", views.mark_broadcast_read, name="mark_broadcast_read"),
     path("notifications/read-all", views.mark_all_notifications_read, name="mark_all_notifications_read"),
     
     # Test endpoints
@@ -1,18 +1,27 @@
 import json
-from datetime import datetime, date, time
-from django.http import JsonResponse
+from datetime import datetime, date, time, timedelta
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.conf import settings
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import F, Q
 from .models import (
     Profile, RoleRequest, LibraryStatus, LabStatus, ClassroomStatus,
-    LibraryUpdateRequest, LabUpdateRequest, RoomRequest, FaultReport,
-    OverloadRecord, Notification
+    LibraryUpdateRequest, LabUpdateRequest, RoomRequest, RecurringBooking,
+    FaultReport, FaultReporter, FaultPhoto, OverloadRecord
 )
 from .jwt import encode_token, decode_token
 from .auth import get_user_from_request, require_auth
+from . import (
+    analytics, approvals, assignment, booking, directory, exports, faults, jobs, lifecycle, notify, photos,
+    rollups, schedule, search, slots, trends,
+)
 
 def _user_to_dict(user):
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -27,6 +36,64 @@ def _user_to_dict(user):
         "manager_type": prof.manager_type,
     }
 
+def _series_to_dict(series, date_from=None, date_to=None):
+    room = series.lab if series.room_type == "lab" else series.classroom
+    data = {
+        "id": series.id,
+        "requested_by": series.requested_by.email,
+        "room_type": series.room_type,
+        "room_id": room.id if room else None,
+        "room_name": room.name if room else None,
+        "purpose": series.purpose,
+        "expected_attendees": series.expected_attendees,
+        "start_date": series.start_date.isoformat(),
+        "end_date": series.end_date.isoformat(),
+        "weekdays": series.weekday_names(),
+        "interval": series.interval,
+        "start_time": series.start_time.isoformat(),
+        "end_time": series.end_time.isoformat(),
+        "exceptions": series.exceptions,
+        "status": series.status,
+        "approved_by": series.approved_by.email if series.approved_by else None,
+        "created_at": series.created_at.isoformat(),
+    }
+    if date_from and date_to:
+        # Expanded only for the requested window
+        data["occurrences"] = [day.isoformat() for day in series.occurrences(date_from, date_to)]
+    return data
+
+def _fault_to_dict(fault):
+    return {
+        "id": fault.id,
+        "title": fault.title,
+        "description": fault.description,
+        "location": fault.location,
+        "building": fault.building,
+        "room_number": fault.room_number,
+        "severity": fault.severity,
+        "category": fault.category,
+        "status": fault.status,
+        "assigned_to": fault.assigned_to,
+        "duplicate_count": fault.duplicate_count,
+        "reported_by": fault.reported_by.email,
+        "reporter_email": fault.reported_by.email,  # For compatibility
+        "created_at": fault.created_at.isoformat(),
+        "created_date": fault.created_at.isoformat(),  # For compatibility
+        "updated_at": fault.updated_at.isoformat() if fault.updated_at else None,
+        "photo": _photo_to_dict(fault.photo) if fault.photo_id else None,
+    }
+
+def _photo_to_dict(photo):
+    return {
+        "url": f"/api/photos/{photo.sha256}",
+        # Served even before has_thumbnail is set; the view makes a missing one
+        "thumbnail_url": f"/api/photos/{photo.sha256}/thumbnail",
+        "size": photo.size,
+        "content_type": photo.content_type,
+        "width": photo.width,
+        "height": photo.height,
+    }
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def test_endpoint(request):
@@ -185,6 +252,7 @@ def me(request):
 @csrf_exempt
 @require_http_methods(["POST", "OPTIONS"])
 @require_auth
+@transaction.atomic
 def set_role(request):
     # Handle OPTIONS preflight request
     if request.method == "OPTIONS":
@@ -266,14 +334,12 @@ def set_role(request):
                 status="pending"
             )
             # Notify managers and admins
-            managers = User.objects.filter(profile__role__in=["manager", "admin"])
-            for m in managers:
-                Notification.objects.create(
-                    user=m,
-                    title="New Role Request",
-                    message=f"{user.email} requested to be a {role}.",
-                    action_link="/manager-requests"
-                )
+            notify.notify_staff(
+                title="New Role Request",
+                message=f"{user.email} requested to be a {role}.",
+                action_link="/manager-requests",
+                summary="{count} new role requests",
+            )
             return JsonResponse({
                 "user": _user_to_dict(user),
                 "message": f"Role request for {role} submitted for approval.",
@@ -285,6 +351,7 @@ def set_role(request):
             if user.is_superuser:
                 prof.role = "admin"
                 prof.save()
+                notify.role_changed([user.id])
                 return JsonResponse({
                     "user": _user_to_dict(user),
                     "message": "Admin role set successfully",
@@ -299,14 +366,12 @@ def set_role(request):
                     status="pending"
                 )
                 # Notify managers and admins
-                managers = User.objects.filter(profile__role__in=["manager", "admin"])
-                for m in managers:
-                    Notification.objects.create(
-                        user=m,
-                        title="New Admin Request",
-                        message=f"{user.email} requested admin access.",
-                        action_link="/manager-requests"
-                    )
+                notify.notify_staff(
+                    title="New Admin Request",
+                    message=f"{user.email} requested admin access.",
+                    action_link="/manager-requests",
+                    summary="{count} new admin requests",
+                )
                 return JsonResponse({
                     "user": _user_to_dict(user),
                     "message": "Admin role request submitted for approval. You can use the system as a student for now.",
@@ -410,6 +475,7 @@ def create_library(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def library_update(request):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -471,6 +537,7 @@ def library_update(request):
 @require_auth
 def list_labs(request):
     labs = LabStatus.objects.all().order_by("building", "name")
+    booked = booking.booked_room_ids("lab")
     return JsonResponse({
         "labs": [{
             "id": lab.id,
@@ -479,7 +546,10 @@ def list_labs(request):
             "room_number": lab.room_number,
             "max_capacity": lab.max_capacity,
             "current_occupancy": lab.current_occupancy,
-            "is_available": lab.is_available,
+            # is_available is the manual in/out of service flag; a booking in
+            # progress makes the lab unavailable only for its duration
+            "is_available": lab.is_available and lab.id not in booked,
+            "booked_now": lab.id in booked,
             "equipment_status": lab.equipment_status,
         } for lab in labs]
     })
@@ -540,6 +610,7 @@ def create_lab(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def update_lab(request, lab_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -604,6 +675,7 @@ def update_lab(request, lab_id):
 @require_auth
 def list_classrooms(request):
     classrooms = ClassroomStatus.objects.all().order_by("building", "name")
+    booked = booking.booked_room_ids("classroom")
     return JsonResponse({
         "classrooms": [{
             "id": cls.id,
@@ -612,7 +684,8 @@ def list_classrooms(request):
             "room_number": cls.room_number,
             "max_capacity": cls.max_capacity,
             "current_occupancy": cls.current_occupancy,
-            "is_available": cls.is_available,
+            "is_available": cls.is_available and cls.id not in booked,
+            "booked_now": cls.id in booked,
         } for cls in classrooms]
     })
 
@@ -653,6 +726,7 @@ def create_classroom(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def update_classroom(request, classroom_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -705,35 +779,71 @@ def list_pending_updates(request):
     if prof.role not in ["manager", "admin"]:
         return JsonResponse({"message": "Only managers and admins can view pending updates"}, status=403)
     
-    library_requests = LibraryUpdateRequest.objects.filter(status="pending").order_by("-created_at")
-    lab_requests = LabUpdateRequest.objects.filter(status="pending").order_by("-created_at")
+    library_requests = LibraryUpdateRequest.objects.filter(status="pending").order_by("-created_at").values(
+        "id", "library_id", "requested_name", "requested_current_occupancy", "requested_is_open",
+        "requested_max_capacity", "created_at", library_name=F("library__name"), requester=F("requested_by__email"),
+    )
+    lab_requests = LabUpdateRequest.objects.filter(status="pending").order_by("-created_at").values(
+        "id", "lab_id", "requested_current_occupancy", "requested_is_available", "created_at",
+        lab_name=F("lab__name"), requester=F("requested_by__email"),
+    )
     
     return JsonResponse({
         "library_requests": [{
-            "id": req.id,
-            "library_id": req.library.id if req.library else None,
-            "library_name": req.library.name if req.library else req.requested_name,
-            "requested_by": req.requested_by.email,
-            "requested_current_occupancy": req.requested_current_occupancy,
-            "requested_is_open": req.requested_is_open,
-            "requested_name": req.requested_name,
-            "requested_max_capacity": req.requested_max_capacity,
-            "created_at": req.created_at.isoformat(),
+            "id": req["id"],
+            "library_id": req["library_id"],
+            "library_name": req["library_name"] if req["library_id"] else req["requested_name"],
+            "requested_by": req["requester"],
+            "requested_current_occupancy": req["requested_current_occupancy"],
+            "requested_is_open": req["requested_is_open"],
+            "requested_name": req["requested_name"],
+            "requested_max_capacity": req["requested_max_capacity"],
+            "created_at": req["created_at"].isoformat(),
         } for req in library_requests],
         "lab_requests": [{
-            "id": req.id,
-            "lab_id": req.lab.id,
-            "lab_name": req.lab.name,
-            "requested_by": req.requested_by.email,
-            "requested_current_occupancy": req.requested_current_occupancy,
-            "requested_is_available": req.requested_is_available,
-            "created_at": req.created_at.isoformat(),
+            "id": req["id"],
+            "lab_id": req["lab_id"],
+            "lab_name": req["lab_name"],
+            "requested_by": req["requester"],
+            "requested_current_occupancy": req["requested_current_occupancy"],
+            "requested_is_available": req["requested_is_available"],
+            "created_at": req["created_at"].isoformat(),
         } for req in lab_requests],
     })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def approval_queue(request):
+    """Pending room, library, lab and role requests in one list, by priority then age"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view the approval queue"}, status=403)
+    
+    kinds = tuple(k for k in request.GET.get("kind", "").split(",") if k) or approvals.KINDS
+    if any(k not in approvals.KINDS for k in kinds):
+        return JsonResponse({"message": f"kind must be a comma-separated list of: {', '.join(approvals.KINDS)}"}, status=400)
+    try:
+        page_size = min(max(int(request.GET.get("page_size", 50)), 1), 200)
+    except ValueError:
+        return JsonResponse({"message": "page_size must be an integer"}, status=400)
+    try:
+        entries, next_cursor = approvals.queue(kinds, request.GET.get("after") or None, page_size)
+    except ValueError:
+        return JsonResponse({"message": "Invalid cursor"}, status=400)
+    
+    return JsonResponse({
+        "requests": entries,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    })
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def approve_library_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -773,6 +883,7 @@ def approve_library_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def reject_library_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -795,6 +906,7 @@ def reject_library_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def approve_lab_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -821,6 +933,7 @@ def approve_lab_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def reject_lab_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -840,10 +953,47 @@ def reject_lab_update(request, request_id):
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+def bulk_decide_requests(request):
+    """Approves or rejects a list of pending room, library, lab or role requests in one transaction"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can approve requests"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        kind = data["kind"]
+        action = data["action"]
+        ids = [int(i) for i in data["ids"]]
+    except (KeyError, ValueError, TypeError):
+        return JsonResponse({"message": "kind, action and a list of ids are required"}, status=400)
+    if kind not in approvals.KINDS or action not in approvals.ACTIONS:
+        return JsonResponse({"message": f"kind must be one of {', '.join(approvals.KINDS)} and action approve or reject"}, status=400)
+    if not ids or len(ids) > approvals.MAX_BATCH:
+        return JsonResponse({"message": f"Between 1 and {approvals.MAX_BATCH} ids are allowed per batch"}, status=400)
+    
+    try:
+        outcomes = approvals.bulk_decide(kind, ids, action, user, data.get("rejection_reason", ""))
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+    
+    results = [{"id": i, "outcome": outcome, "message": message} for i, (outcome, message) in outcomes.items()]
+    done = sum(1 for r in results if r["outcome"] in ["approved", "rejected"])
+    return JsonResponse({
+        "message": f"{done} of {len(results)} requests {action}d",
+        "succeeded": done,
+        "failed": len(results) - done,
+        "results": results,
+    })
+
 # Room request endpoints
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def create_room_request(request):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -853,12 +1003,26 @@ def create_room_request(request):
     try:
         data = json.loads(request.body)
         room_type = data.get("room_type")
-        room_id = data.get("room_id")
+        try:
+            room_id = int(data["room_id"]) if data.get("room_id") else None
+        except (TypeError, ValueError):
+            return JsonResponse({"message": "Invalid room_id"}, status=400)
         
         requested_date = datetime.fromisoformat(data["requested_date"].replace("Z", "+00:00")).date() if "requested_date" in data else date.today()
         start_time = time.fromisoformat(data["start_time"]) if "start_time" in data else time(9, 0)
         end_time = time.fromisoformat(data["end_time"]) if "end_time" in data else time(10, 0)
         
+        if end_time <= start_time:
+            return JsonResponse({"message": "end_time must be after start_time"}, status=400)
+        
+        if room_id and room_type in booking.ROOM_MODELS:
+            conflicts = booking.conflicts_for_booking(room_type, room_id, requested_date, start_time, end_time)
+            if conflicts:
+                return JsonResponse({
+                    "message": "The room is already booked for an overlapping time",
+                    "conflicts": conflicts,
+                }, status=409)
+        
         room_req = RoomRequest.objects.create(
             requested_by=user,
             room_type=room_type,
@@ -872,14 +1036,12 @@ def create_room_request(request):
         )
         
         # Notify managers and admins
-        managers = User.objects.filter(profile__role__in=["manager", "admin"])
-        for m in managers:
-            Notification.objects.create(
-                user=m,
-                title="New Room Request",
-                message=f"{user.email} requested a {room_type} for {requested_date}.",
-                action_link="/request-approvals"
-            )
+        notify.notify_staff(
+            title="New Room Request",
+            message=f"{user.email} requested a {room_type} for {requested_date}.",
+            action_link="/request-approvals",
+            summary="{count} new room requests",
+        )
             
         return JsonResponse({
             "request": {
@@ -904,6 +1066,7 @@ def list_room_requests(request):
         requests = RoomRequest.objects.all().order_by("-created_at")
     else:
         requests = RoomRequest.objects.filter(requested_by=user).order_by("-created_at")
+    requests = requests.select_related("requested_by", "classroom", "lab", "approved_by")
     
     return JsonResponse({
         "requests": [{
@@ -935,6 +1098,7 @@ def list_room_requests(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def approve_room_request(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -945,40 +1109,47 @@ def approve_room_request(request, request_id):
         data = json.loads(request.body)
         room_id = data.get("room_id")
         
-        req = RoomRequest.objects.get(id=request_id, status="pending")
+        req = RoomRequest.objects.select_for_update().get(id=request_id, status="pending")
         
-        if room_id:
-            if req.room_type == "classroom":
-                req.classroom = ClassroomStatus.objects.get(id=room_id)
-                req.classroom.is_available = False
-                req.classroom.save()
-            elif req.room_type == "lab":
-                req.lab = LabStatus.objects.get(id=room_id)
-                req.lab.is_available = False
-                req.lab.save()
+        if room_id and req.room_type in booking.ROOM_MODELS:
+            setattr(req, booking.room_field(req.room_type), booking.lock_room(req.room_type, room_id))
+        
+        # Availability is derived from approved bookings, so the room itself is
+        # not flagged; instead refuse to double-book it.
+        room = req.lab if req.room_type == "lab" else req.classroom
+        if room:
+            if not room_id:
+                booking.lock_room(req.room_type, room.id)
+            conflicts = booking.conflicts_for_booking(
+                req.room_type, room.id, req.requested_date, req.start_time, req.end_time, exclude_id=req.id
+            )
+            if conflicts:
+                return JsonResponse({
+                    "message": "The room is already booked for an overlapping time",
+                    "conflicts": conflicts,
+                }, status=409)
         
         req.status = "approved"
         req.approved_by = user
         req.approved_at = datetime.now()
         req.save()
+        slots.rebuild_for_booking(req)
         
         # Create notification
-        Notification.objects.create(
-            user=req.requested_by,
-            title="Room Request Approved",
-            message=f"Your request for {req.room_type} on {req.requested_date} has been approved.",
-            action_link="/room-requests"
-        )
+        notify.notify_user(req.requested_by, "room.approved", room_type=req.room_type, date=str(req.requested_date))
         
         return JsonResponse({"message": "Room request approved"})
     except RoomRequest.DoesNotExist:
         return JsonResponse({"message": "Request not found"}, status=404)
+    except (ClassroomStatus.DoesNotExist, LabStatus.DoesNotExist):
+        return JsonResponse({"message": "Room not found"}, status=404)
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def reject_room_request(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -994,11 +1165,9 @@ def reject_room_request(request, request_id):
         req.save()
         
         # Create notification
-        Notification.objects.create(
-            user=req.requested_by,
-            title="Room Request Rejected",
-            message=f"Your request for {req.room_type} on {req.requested_date} was rejected: {req.rejection_reason}",
-            action_link="/room-requests"
+        notify.notify_user(
+            req.requested_by, "room.rejected",
+            room_type=req.room_type, date=str(req.requested_date), reason=req.rejection_reason,
         )
         
         return JsonResponse({"message": "Room request rejected"})
@@ -1007,10 +1176,408 @@ def reject_room_request(request, request_id):
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transaction.atomic
+def cancel_room_request(request, request_id):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    try:
+        req = RoomRequest.objects.select_for_update().get(id=request_id, status__in=["pending", "approved"])
+        if req.requested_by_id != user.id and prof.role not in ["manager", "admin"]:
+            return JsonResponse({"message": "You can only cancel your own room requests"}, status=403)
+        
+        was_approved = req.status == "approved"
+        req.status = "cancelled"
+        req.save()
+        if was_approved:
+            # Frees the slots for the free-room search
+            slots.rebuild_for_booking(req)
+        
+        if req.requested_by_id != user.id:
+            notify.notify_user(
+                req.requested_by, "room.cancelled",
+                room_type=req.room_type, date=str(req.requested_date), by=user.email,
+            )
+        
+        return JsonResponse({"message": "Room request cancelled"})
+    except RoomRequest.DoesNotExist:
+        return JsonResponse({"message": "Request not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transaction.atomic
+def create_recurring_booking(request):
+    """Creates a weekly booking series that is approved once for all its sessions"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["lecturer", "student"]:
+        return JsonResponse({"message": "Only lecturers and students can create room requests"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        room_type = data.get("room_type")
+        room_id = int(data["room_id"]) if data.get("room_id") else None
+        series = RecurringBooking(
+            requested_by=user,
+            room_type=room_type,
+            classroom_id=room_id if room_type == "classroom" and room_id else None,
+            lab_id=room_id if room_type == "lab" and room_id else None,
+            purpose=data.get("purpose", ""),
+            expected_attendees=int(data.get("expected_attendees", 1)),
+            start_date=date.fromisoformat(data["start_date"]),
+            end_date=date.fromisoformat(data["end_date"]),
+            weekdays=booking.weekday_mask(data["weekdays"]),
+            interval=int(data.get("interval", 1)),
+            start_time=time.fromisoformat(data["start_time"]),
+            end_time=time.fromisoformat(data["end_time"]),
+            exceptions=sorted(date.fromisoformat(d).isoformat() for d in data.get("exceptions", [])),
+        )
+    except (KeyError, ValueError, TypeError):
+        return JsonResponse({"message": "room_type, start_date, end_date, weekdays, start_time and end_time are required"}, status=400)
+    
+    if room_type not in booking.ROOM_MODELS:
+        return JsonResponse({"message": "Invalid room_type"}, status=400)
+    room = booking.ROOM_MODELS[room_type].objects.filter(id=room_id).first() if room_id else None
+    if room_id and room is None:
+        return JsonResponse({"message": "Room not found"}, status=404)
+    if series.expected_attendees < 1:
+        return JsonResponse({"message": "expected_attendees must be at least 1"}, status=400)
+    if room and series.expected_attendees > room.max_capacity:
+        return JsonResponse({"message": f"The room holds at most {room.max_capacity} attendees"}, status=400)
+    if series.end_time <= series.start_time:
+        return JsonResponse({"message": "end_time must be after start_time"}, status=400)
+    if series.end_date < series.start_date or (series.end_date - series.start_date).days > 366:
+        return JsonResponse({"message": "A series must end after it starts and span at most a year"}, status=400)
+    if not series.weekdays or series.interval < 1:
+        return JsonResponse({"message": "At least one weekday and an interval of 1 or more are required"}, status=400)
+    if next(series.occurrences(), None) is None:
+        return JsonResponse({"message": "The pattern has no sessions in the date range"}, status=400)
+    
+    try:
+        if room_id:
+            conflicts = booking.find_conflicts_for_series(series, room_id)
+            if conflicts:
+                return JsonResponse({
+                    "message": "The room is already booked for some sessions of this series",
+                    "conflicts": conflicts,
+                }, status=409)
+        series.save()
+        
+        notify.notify_staff(
+            title="New Recurring Room Request",
+            message=f"{user.email} requested a weekly {room_type} from {series.start_date} to {series.end_date}.",
+            action_link="/request-approvals",
+            summary="{count} new recurring room requests",
+        )
+        
+        return JsonResponse({
+            "series": _series_to_dict(series),
+            "message": "Recurring booking created successfully"
+        })
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def list_recurring_bookings(request):
+    """Lists booking series; pass from/to to expand their sessions in that window"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    try:
+        date_from = date.fromisoformat(request.GET["from"]) if "from" in request.GET else None
+        date_to = date.fromisoformat(request.GET["to"]) if "to" in request.GET else None
+    except ValueError:
+        return JsonResponse({"message": "from and to must be dates (YYYY-MM-DD)"}, status=400)
+    
+    series = RecurringBooking.objects.select_related("requested_by", "approved_by", "classroom", "lab").order_by("-created_at")
+    if prof.role not in ["manager", "admin"]:
+        series = series.filter(requested_by=user)
+    if date_from and date_to:
+        series = series.filter(start_date__lte=date_to, end_date__gte=date_from)
+    
+    return JsonResponse({"series": [_series_to_dict(s, date_from, date_to) for s in series]})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transaction.atomic
+def approve_recurring_booking(request, series_id):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can approve room requests"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        room_id = data.get("room_id")
+        
+        series = RecurringBooking.objects.select_for_update().get(id=series_id, status="pending")
+        if room_id:
+            setattr(series, booking.room_field(series.room_type), booking.lock_room(series.room_type, room_id))
+        elif series.room_id:
+            booking.lock_room(series.room_type, series.room_id)
+        else:
+            return JsonResponse({"message": "room_id is required"}, status=400)
+        
+        conflicts = booking.find_conflicts_for_series(series, series.room_id)
+        if conflicts:
+            return JsonResponse({
+                "message": "The room is already booked for some sessions of this series",
+                "conflicts": conflicts,
+            }, status=409)
+        
+        series.status = "approved"
+        series.approved_by = user
+        series.approved_at = datetime.now()
+        series.save()
+        
+        notify.notify_user(
+            series.requested_by, "series.approved",
+            room_type=series.room_type, start=str(series.start_date), end=str(series.end_date),
+        )
+        
+        return JsonResponse({"message": "Recurring booking approved"})
+    except RecurringBooking.DoesNotExist:
+        return JsonResponse({"message": "Request not found"}, status=404)
+    except (ClassroomStatus.DoesNotExist, LabStatus.DoesNotExist):
+        return JsonResponse({"message": "Room not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transaction.atomic
+def reject_recurring_booking(request, series_id):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can reject room requests"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        series = RecurringBooking.objects.select_for_update().get(id=series_id, status="pending")
+        series.status = "rejected"
+        series.approved_by = user
+        series.rejection_reason = data.get("rejection_reason", "")
+        series.save()
+        
+        notify.notify_user(
+            series.requested_by, "series.rejected",
+            room_type=series.room_type, start=str(series.start_date), reason=series.rejection_reason,
+        )
+        
+        return JsonResponse({"message": "Recurring booking rejected"})
+    except RecurringBooking.DoesNotExist:
+        return JsonResponse({"message": "Request not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transaction.atomic
+def cancel_recurring_booking(request, series_id):
+    """Cancels a whole series, or with {"date": ...} just that one session"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    try:
+        data = json.loads(request.body or "{}")
+        series = RecurringBooking.objects.select_for_update().get(id=series_id, status__in=["pending", "approved"])
+        if series.requested_by_id != user.id and prof.role not in ["manager", "admin"]:
+            return JsonResponse({"message": "You can only cancel your own room requests"}, status=403)
+        
+        if data.get("date"):
+            day = date.fromisoformat(data["date"])
+            if not series.occurs_on(day):
+                return JsonResponse({"message": "The series has no session on that date"}, status=400)
+            series.exceptions = sorted(series.exceptions + [day.isoformat()])
+            what = f"the session on {day}"
+        else:
+            series.status = "cancelled"
+            what = "all sessions"
+        series.save()
+        
+        if series.requested_by_id != user.id:
+            notify.notify_user(series.requested_by, "series.cancelled", by=user.email, what=what, room_type=series.room_type)
+        
+        return JsonResponse({"message": f"Cancelled {what}", "series": _series_to_dict(series)})
+    except RecurringBooking.DoesNotExist:
+        return JsonResponse({"message": "Request not found"}, status=404)
+    except ValueError:
+        return JsonResponse({"message": "date must be YYYY-MM-DD"}, status=400)
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+def auto_assign_room_requests(request):
+    """Proposes (or, with commit=true, applies) rooms for pending requests in a date range"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can auto-assign room requests"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        date_from = date.fromisoformat(data["from"])
+        date_to = date.fromisoformat(data["to"])
+    except (KeyError, ValueError):
+        return JsonResponse({"message": "from and to dates are required (YYYY-MM-DD)"}, status=400)
+    room_type = data.get("room_type")
+    if room_type and room_type not in booking.ROOM_MODELS:
+        return JsonResponse({"message": "Invalid room_type"}, status=400)
+    
+    try:
+        if data.get("commit"):
+            requests, assignments, unassigned = assignment.commit(date_from, date_to, user, room_type)
+        else:
+            requests, assignments, unassigned = assignment.propose(date_from, date_to, room_type)
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+    
+    return JsonResponse({
+        "committed": bool(data.get("commit")),
+        "assignments": [{
+            "request_id": req.id,
+            "room_type": req.room_type,
+            "room_id": assignments[req.id],
+            "requested_date": req.date.isoformat(),
+            "expected_attendees": req.attendees,
+        } for req in requests if req.id in assignments],
+        "unassigned": [{"request_id": req_id, "reason": reason} for req_id, reason in unassigned.items()],
+        "total": len(requests),
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def calendar(request):
+    """Approved bookings and series sessions between from and to, optionally for one room, building or just mine"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    try:
+        date_from = date.fromisoformat(request.GET["from"])
+        date_to = date.fromisoformat(request.GET["to"])
+    except (KeyError, ValueError):
+        return JsonResponse({"message": "from and to dates are required (YYYY-MM-DD)"}, status=400)
+    if date_to < date_from or (date_to - date_from).days > 92:
+        return JsonResponse({"message": "The window must be at most 92 days long"}, status=400)
+    
+    room_type = request.GET.get("room_type") or None
+    if room_type and room_type not in booking.ROOM_MODELS:
+        return JsonResponse({"message": "Invalid room_type"}, status=400)
+    try:
+        room_id = int(request.GET["room_id"]) if request.GET.get("room_id") else None
+    except ValueError:
+        return JsonResponse({"message": "Invalid room_id"}, status=400)
+    events = schedule.calendar_events(
+        date_from, date_to,
+        room_type=room_type,
+        room_id=room_id,
+        building=request.GET.get("building") or None,
+        user=user if request.GET.get("mine") in ["1", "true"] else None,
+    )
+    if prof.role not in ["manager", "admin"]:
+        for event in events:
+            if event["requested_by"] != user.email:
+                event["requested_by"] = None
+    return JsonResponse({"from": date_from.isoformat(), "to": date_to.isoformat(), "events": events})
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def calendar_feed_url(request):
+    """Subscription URL for my bookings, or for one room with room_type and room_id"""
+    user = request.user_obj
+    room_type = request.GET.get("room_type")
+    if room_type:
+        try:
+            room = booking.ROOM_MODELS[room_type].objects.get(id=int(request.GET.get("room_id", "")))
+        except (KeyError, ValueError, ClassroomStatus.DoesNotExist, LabStatus.DoesNotExist):
+            return JsonResponse({"message": "Room not found"}, status=404)
+        scope = {"room_type": room_type, "room_id": room.id}
+    else:
+        scope = {"user": user.id}
+    token = schedule.feed_token(scope)
+    return JsonResponse({"url": request.build_absolute_uri(f"/api/calendar/feed/{token}.ics")})
+
+@require_http_methods(["GET", "HEAD"])
+def calendar_feed(request, token):
+    """Streams an iCalendar feed; the signed token in the URL stands in for a login"""
+    scope = schedule.read_feed_token(token)
+    if not scope:
+        return HttpResponse("Invalid feed token", status=404, content_type="text/plain")
+    if "user" in scope:
+        owner = User.objects.filter(id=scope["user"]).first()
+        if not owner:
+            return HttpResponse("Invalid feed token", status=404, content_type="text/plain")
+        name = f"Room bookings - {owner.email}"
+        scope = {"user": owner}
+    else:
+        room = booking.ROOM_MODELS[scope["room_type"]].objects.filter(id=scope["room_id"]).first()
+        if not room:
+            return HttpResponse("Invalid feed token", status=404, content_type="text/plain")
+        name = f"{room.name} bookings"
+    
+    bookings, series = schedule.feed_querysets(scope, date.today() - timedelta(days=30))
+    etag, last_modified = schedule.feed_validators(bookings, series)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if not_modified is not None:
+        return not_modified
+    
+    response = StreamingHttpResponse(schedule.ical_stream(bookings, series, name), content_type="text/calendar; charset=utf-8")
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = "private, max-age=300"
+    return response
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def find_free_rooms(request):
+    """Rooms free for a time window, ranked by how well their capacity fits"""
+    try:
+        days = [date.fromisoformat(d) for d in request.GET.get("date", "").split(",") if d]
+        start_time = time.fromisoformat(request.GET["start_time"])
+        end_time = time.fromisoformat(request.GET["end_time"])
+        attendees = int(request.GET.get("attendees", 1))
+    except (KeyError, ValueError):
+        return JsonResponse({"message": "date, start_time and end_time are required (ISO format)"}, status=400)
+    if not days:
+        return JsonResponse({"message": "date is required"}, status=400)
+    if end_time <= start_time:
+        return JsonResponse({"message": "end_time must be after start_time"}, status=400)
+    
+    room_type = request.GET.get("room_type", "all")
+    mode = request.GET.get("mode", "all")
+    if room_type not in ["all", *booking.ROOM_MODELS] or mode not in ["all", "any"]:
+        return JsonResponse({"message": "Invalid room_type or mode"}, status=400)
+    
+    room_types = booking.ROOM_MODELS if room_type == "all" else [room_type]
+    rooms = []
+    for rt in room_types:
+        rooms += slots.find_free_rooms(
+            days, start_time, end_time, attendees, rt, request.GET.get("building"), mode
+        )
+    rooms.sort(key=lambda room: (room["spare_seats"], room["name"]))
+    return JsonResponse({"rooms": rooms})
+
 # Fault report endpoints
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def create_fault(request):
     try:
         user = request.user_obj
@@ -1023,6 +1590,22 @@ def create_fault(request):
         if not location and (building or room_number):
             location = f"{building} {room_number}".strip()
 
+        # A likely duplicate of an open report becomes a "+1" on it rather than a new report
+        if not data.get("force_new"):
+            existing = faults.find_duplicate(building, room_number, data.get("category", "other"), data.get("title", ""))
+            if existing:
+                faults.add_reporter(existing, user, data.get("description", ""))
+                return JsonResponse({
+                    "fault": {
+                        "id": existing.id,
+                        "title": existing.title,
+                        "status": existing.status,
+                        "duplicate_count": existing.duplicate_count,
+                    },
+                    "duplicate_of": existing.id,
+                    "message": "This fault has already been reported; your report was added to it"
+                })
+
         fault = FaultReport.objects.create(
             reported_by=user,
             title=data.get("title", ""),
@@ -1036,14 +1619,13 @@ def create_fault(request):
         )
         
         # Notify managers and admins
-        managers = User.objects.filter(profile__role__in=["manager", "admin"])
-        for m in managers:
-            Notification.objects.create(
-                user=m,
-                title="New Fault Reported",
-                message=f"{fault.title} in {fault.building} {fault.room_number}",
-                action_link="/fault-management"
-            )
+        notify.notify_staff(
+            title="New Fault Reported",
+            message=f"{fault.title} in {fault.building} {fault.room_number}",
+            action_link="/fault-management",
+            # Braces in a building name must not be read as format fields
+            summary="{count} new fault reports" + (f" in {fault.building}".replace("{", "{{").replace("}", "}}") if fault.building else ""),
+        )
 
         return JsonResponse({
             "fault": {
@@ -1064,33 +1646,88 @@ def list_faults(request):
     prof, _ = Profile.objects.get_or_create(user=user)
     
     if prof.role in ["manager", "admin"]:
-        faults = FaultReport.objects.all().order_by("-created_at")
+        reports = FaultReport.objects.all().order_by("-created_at")
     else:
-        faults = FaultReport.objects.filter(reported_by=user).order_by("-created_at")
+        reports = FaultReport.objects.filter(
+            Q(reported_by=user) | Q(id__in=FaultReporter.objects.filter(user=user).values("fault_id"))
+        ).order_by("-created_at")
     
     return JsonResponse({
-        "faults": [{
-            "id": fault.id,
-            "title": fault.title,
-            "description": fault.description,
-            "location": fault.location,
-            "building": fault.building,
-            "room_number": fault.room_number,
-            "severity": fault.severity,
-            "category": fault.category,
-            "status": fault.status,
-            "assigned_to": fault.assigned_to,
-            "reported_by": fault.reported_by.email,
-            "reporter_email": fault.reported_by.email,  # For compatibility
-            "created_at": fault.created_at.isoformat(),
-            "created_date": fault.created_at.isoformat(),  # For compatibility
-            "updated_at": fault.updated_at.isoformat() if fault.updated_at else None,
-        } for fault in faults]
+        "faults": [_fault_to_dict(fault) for fault in reports.select_related("reported_by", "photo")]
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def search_faults(request):
+    """Full-text search over fault title, description and location"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"message": "q is required"}, status=400)
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+        page_size = min(max(int(request.GET.get("page_size", 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({"message": "page and page_size must be integers"}, status=400)
+    
+    filters = {field: request.GET.get(field) for field in search.FILTER_FIELDS}
+    # Managers and admins search everything, others only their own reports
+    reporter_id = None if prof.role in ["manager", "admin"] else user.id
+    hits, has_more = search.search_faults(query, filters, reporter_id, page, page_size)
+    
+    return JsonResponse({
+        "results": [{
+            **_fault_to_dict(fault),
+            "rank": rank,
+            "title_highlight": title,
+            "snippet": snippet,
+        } for fault, rank, title, snippet in hits],
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more,
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def fault_analytics(request):
+    """Fault counts grouped by status, severity, category, building and/or time bucket"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+
+    group_by = [field for field in request.GET.get("group_by", "status").split(",") if field]
+    bucket = request.GET.get("bucket") or None
+    if not set(group_by) <= set(analytics.DIMENSIONS) or len(set(group_by)) != len(group_by):
+        return JsonResponse({"message": f"group_by must be a combination of {', '.join(analytics.DIMENSIONS)}"}, status=400)
+    if bucket is not None and bucket not in analytics.BUCKETS:
+        return JsonResponse({"message": "bucket must be day, week or month"}, status=400)
+    if not group_by and bucket is None:
+        return JsonResponse({"message": "group_by or bucket is required"}, status=400)
+    try:
+        since = date.fromisoformat(request.GET["since"]) if request.GET.get("since") else None
+        until = date.fromisoformat(request.GET["until"]) if request.GET.get("until") else None
+    except ValueError:
+        return JsonResponse({"message": "since and until must be YYYY-MM-DD dates"}, status=400)
+
+    filters = {field: request.GET.get(field) for field in analytics.DIMENSIONS}
+    # Managers and admins see every report, others only their own
+    user_id = None if prof.role in ["manager", "admin"] else user.id
+    groups = analytics.fault_counts(group_by, bucket, filters, since, until, user_id)
+
+    return JsonResponse({
+        "group_by": group_by,
+        "bucket": bucket,
+        "total": sum(group["count"] for group in groups),
+        "groups": groups,
     })
 
 @csrf_exempt
 @require_http_methods(["POST", "PUT"])
 @require_auth
+@transaction.atomic
 def update_fault(request, fault_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -1098,8 +1735,9 @@ def update_fault(request, fault_id):
         return JsonResponse({"message": "Only managers and admins can update faults"}, status=403)
     
     try:
-        fault = FaultReport.objects.get(id=fault_id)
+        fault = FaultReport.objects.select_for_update().get(id=fault_id)
         data = json.loads(request.body)
+        previous_status = fault.status
         
         if "status" in data:
             fault.status = data["status"]
@@ -1110,15 +1748,15 @@ def update_fault(request, fault_id):
         if "category" in data:
             fault.category = data["category"]
         
+        if fault.status != previous_status:
+            lifecycle.record_transition(fault, previous_status, user)
         fault.save()
         
-        # Notify the reporter
-        Notification.objects.create(
-            user=fault.reported_by,
-            title="Fault Report Update",
-            message=f"The status of your report '{fault.title}' has been updated to {fault.status}.",
-            action_link="/reports"
-        )
+        # Notify the reporter and everyone who added a "+1"
+        reporters = [fault.reported_by] + [r.user for r in fault.extra_reporters.select_related("user")]
+        notify.notify_many([
+            notify.notice(reporter, "fault.updated", title=fault.title, status=fault.status) for reporter in reporters
+        ])
         
         return JsonResponse({
             "fault": {
@@ -1133,27 +1771,185 @@ def update_fault(request, fault_id):
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+def upload_fault_photo(request, fault_id):
+    """Attaches a photo to a fault; the multipart body streams to disk as it is parsed"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    try:
+        fault = FaultReport.objects.get(id=fault_id)
+    except FaultReport.DoesNotExist:
+        return JsonResponse({"message": "Fault not found"}, status=404)
+    if prof.role not in ["manager", "admin"] and fault.reported_by_id != user.id:
+        return JsonResponse({"message": "Only the reporter or a manager can add a photo"}, status=403)
+    too_large = {"message": f"Photos must be under {settings.FAULT_PHOTO_MAX_BYTES // (1024 * 1024)} MB"}
+    # Multipart overhead is small; refuse obviously oversized bodies before reading them
+    if int(request.META.get("CONTENT_LENGTH") or 0) > settings.FAULT_PHOTO_MAX_BYTES + 64 * 1024:
+        return JsonResponse(too_large, status=413)
+    
+    # Must be set before request.FILES is first read
+    handler = photos.PhotoUploadHandler(request)
+    request.upload_handlers = [handler]
+    upload = request.FILES.get(photos.FIELD_NAME)
+    if handler.error == "too_large":
+        return JsonResponse(too_large, status=413)
+    if handler.error == "not_an_image":
+        return JsonResponse({"message": "Photo must be a JPEG, PNG, GIF or WebP image"}, status=400)
+    if upload is None:
+        return JsonResponse({"message": "photo file is required"}, status=400)
+    
+    try:
+        with transaction.atomic():
+            photo, created = photos.store(upload)
+            fault.photo = photo
+            fault.save(update_fields=["photo", "updated_at"])
+    except Exception:
+        handler.discard()
+        raise
+    return JsonResponse({
+        "message": "Photo uploaded" if created else "Photo already stored; linked to this fault",
+        "photo": _photo_to_dict(photo),
+        "deduplicated": not created,
+    })
+
+@require_http_methods(["GET", "HEAD"])
+def fault_photo(request, sha256, thumbnail=False):
+    """Serves a stored photo or its thumbnail.
+
+    No login, so <img> tags can load it: the content hash in the URL is only
+    known to those who saw the fault, much like the calendar feed token.
+    """
+    photo = FaultPhoto.objects.filter(sha256=sha256).first()
+    # A thumbnail lost to a crash before the upload's after-commit step is made now
+    if photo is None or (thumbnail and not photo.has_thumbnail and not photos.ensure_thumbnail(sha256)):
+        return HttpResponse("Photo not found", status=404, content_type="text/plain")
+    if thumbnail:
+        return photos.serve(request, photos.path_for(sha256, thumbnail=True), f'"{sha256}-thumb"', "image/jpeg")
+    return photos.serve(request, photos.path_for(sha256), f'"{sha256}"', photo.content_type)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def fault_metrics(request):
+    """p50/p90/p99 time to acknowledge and resolve faults, overall or per group"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view fault metrics"}, status=403)
+    
+    group_by = request.GET.get("group_by", "all")
+    if group_by not in lifecycle.DIMENSIONS:
+        return JsonResponse({"message": f"group_by must be one of {', '.join(lifecycle.DIMENSIONS)}"}, status=400)
+    
+    return JsonResponse({"group_by": group_by, "unit": "seconds", "metrics": lifecycle.percentiles(group_by)})
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def fault_history(request, fault_id):
+    """Status transitions of one fault, oldest first"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    try:
+        fault = FaultReport.objects.get(id=fault_id)
+    except FaultReport.DoesNotExist:
+        return JsonResponse({"message": "Fault not found"}, status=404)
+    # Reporters and "+1" reporters can follow their own faults
+    if (prof.role not in ["manager", "admin"] and fault.reported_by_id != user.id
+            and not fault.extra_reporters.filter(user=user).exists()):
+        return JsonResponse({"message": "Fault not found"}, status=404)
+    
+    return JsonResponse({
+        "created_at": fault.created_at.isoformat(),
+        "acknowledged_at": fault.acknowledged_at.isoformat() if fault.acknowledged_at else None,
+        "resolved_at": fault.resolved_at.isoformat() if fault.resolved_at else None,
+        "transitions": [{
+            "from_status": t.from_status,
+            "to_status": t.to_status,
+            "changed_by": t.changed_by.email if t.changed_by else None,
+            "created_at": t.created_at.isoformat(),
+        } for t in fault.transitions.select_related("changed_by")],
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def export_data(request, dataset):
+    """Streams faults, bookings or overloads as CSV or NDJSON, optionally gzipped"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+
+    if dataset not in exports.DATASETS:
+        return JsonResponse({"message": "Unknown export"}, status=404)
+    see_all = prof.role in ["manager", "admin"]
+    if exports.DATASETS[dataset].managers_only and not see_all:
+        return JsonResponse({"message": "Only managers and admins can export this data"}, status=403)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        return JsonResponse({"message": "format must be csv or ndjson"}, status=400)
+    try:
+        since = date.fromisoformat(request.GET["since"]) if request.GET.get("since") else None
+        until = date.fromisoformat(request.GET["until"]) if request.GET.get("until") else None
+    except ValueError:
+        return JsonResponse({"message": "since and until must be YYYY-MM-DD dates"}, status=400)
+    compress = request.GET.get("gzip") in ("1", "true")
+
+    rows = exports.queryset(dataset, user, see_all, request.GET, since, until)
+    filename = f"{dataset}-{date.today().isoformat()}.{fmt}"
+    if compress:
+        response = StreamingHttpResponse(exports.stream(dataset, fmt, rows, compress=True), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(exports.stream(dataset, fmt, rows), content_type=exports.FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
 # Admin endpoints
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_auth
 def admin_users(request):
+    """One page of the user directory, searchable by email/username prefix and role"""
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
     if prof.role != "admin":
         return JsonResponse({"message": "Only admins can view all users"}, status=403)
     
-    users = User.objects.all().order_by("email")
-    return JsonResponse({
-        "users": [{
+    role = request.GET.get("role") or None
+    if role and role not in directory.ROLES:
+        return JsonResponse({"message": f"role must be one of: {', '.join(directory.ROLES)}"}, status=400)
+    try:
+        page_size = min(max(int(request.GET.get("page_size", 50)), 1), 200)
+    except ValueError:
+        return JsonResponse({"message": "page_size must be an integer"}, status=400)
+    try:
+        users, next_cursor = directory.list_users(
+            request.GET.get("q", ""), role, request.GET.get("after") or None, page_size
+        )
+    except ValueError:
+        return JsonResponse({"message": "Invalid cursor"}, status=400)
+    
+    def to_dict(u):
+        profile = directory.profile_of(u)
+        return {
             "id": u.id,
             "email": u.email,
             "username": u.username,
-            "role": Profile.objects.get(user=u).role if Profile.objects.filter(user=u).exists() else "student",
-            "department": Profile.objects.get(user=u).department if Profile.objects.filter(user=u).exists() and Profile.objects.get(user=u).department else "",
-            "manager_type": Profile.objects.get(user=u).manager_type if Profile.objects.filter(user=u).exists() else None,
+            "role": profile.role if profile else "student",
+            "department": (profile.department if profile else None) or "",
+            "manager_type": profile.manager_type if profile else None,
             "date_joined": u.date_joined.isoformat() if u.date_joined else None,
-        } for u in users]
+        }
+    
+    return JsonResponse({
+        "users": [to_dict(u) for u in users],
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
     })
 
 @csrf_exempt
@@ -1196,6 +1992,17 @@ def admin_stats(request):
         "pending_role_requests": pending_role_requests,
     })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def admin_job_stats(request):
+    """Background job queue depth, for monitoring the run_jobs worker"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["admin", "manager"]:
+        return JsonResponse({"message": "Only admins and managers can view job stats"}, status=403)
+    return JsonResponse(jobs.queue_stats())
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_auth
@@ -1206,25 +2013,30 @@ def admin_role_requests(request):
         return JsonResponse({"message": "Only admins and managers can view role requests"}, status=403)
     
     # Get all role requests, not just pending
-    requests = RoleRequest.objects.all().order_by("-created_at")
+    requests = RoleRequest.objects.order_by("-created_at").values(
+        "id", "requested_role", "reason", "status", "created_at",
+        user_email=F("user__email"), manager_type=F("user__profile__manager_type"),
+    )
     return JsonResponse({
         "requests": [{
-            "id": req.id,
-            "user_email": req.user.email,
-            "requested_role": req.requested_role,
-            "reason": req.reason or "",
-            "status": req.status,
-            "manager_type": Profile.objects.get(user=req.user).manager_type if Profile.objects.filter(user=req.user).exists() else None,  # Get manager_type from Profile
-            "rejection_reason": getattr(req, 'rejection_reason', None) or None,
-            "requested_at": req.created_at.isoformat() if hasattr(req, 'created_at') and req.created_at else None,
-            "approved_at": getattr(req, 'approved_at', None).isoformat() if hasattr(req, 'approved_at') and getattr(req, 'approved_at', None) else None,
-            "approved_by": getattr(req, 'approved_by', None).email if hasattr(req, 'approved_by') and getattr(req, 'approved_by') else None,
+            "id": req["id"],
+            "user_email": req["user_email"],
+            "requested_role": req["requested_role"],
+            "reason": req["reason"] or "",
+            "status": req["status"],
+            "manager_type": req["manager_type"],
+            # RoleRequest does not record who decided it or why
+            "rejection_reason": None,
+            "requested_at": req["created_at"].isoformat() if req["created_at"] else None,
+            "approved_at": None,
+            "approved_by": None,
         } for req in requests]
     })
 
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def admin_approve_role(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -1235,44 +2047,21 @@ def admin_approve_role(request, request_id):
         req = RoleRequest.objects.get(id=request_id, status="pending")
         user_prof, _ = Profile.objects.get_or_create(user=req.user)
         
-        # Update the role
-        user_prof.role = req.requested_role
-        
         # Manager type should already be saved in profile from when the request was created
         # But verify it's there for manager role
         if req.requested_role == "manager" and not user_prof.manager_type:
             print(f"WARNING: Manager role approved but manager_type is not set for {req.user.email}")
         
-        user_prof.save()
-        
-        # Update request status
+        # Update request status (RoleRequest has no approved_by/approved_at); the
+        # post_save handler in signals.py sets the profile's role
         req.status = "approved"
-        # Try to set approved_by if the field exists
-        try:
-            req.approved_by = user
-            req.approved_at = datetime.now()
-        except:
-            pass
-        req.save()
+        req.save(update_fields=["status"])
         
         # Create notification
         try:
-            Notification.objects.create(
-                user=req.user,
-                title="Role Request Approved",
-                message=f"Your request for the {req.requested_role} role has been approved.",
-                action_link="/dashboard"
-            )
+            notify.notify_user(req.user, "role.approved", role=req.requested_role)
         except Exception as e:
             print(f"Error creating notification: {e}")
-
-        req.save()
-        
-        req.save()
-        
-        if user_prof.manager_type:
-             pass # Removed debug print
-
         
         return JsonResponse({
             "message": "Role approved",
@@ -1289,6 +2078,7 @@ def admin_approve_role(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transaction.atomic
 def admin_reject_role(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -1301,12 +2091,7 @@ def admin_reject_role(request, request_id):
         req.save()
         
         # Create notification
-        Notification.objects.create(
-            user=req.user,
-            title="Role Request Rejected",
-            message=f"Your request for the {req.requested_role} role was rejected. Please contact an administrator.",
-            action_link="/role-select"
-        )
+        notify.notify_user(req.user, "role.rejected", role=req.requested_role)
         return JsonResponse({"message": "Role rejected"})
     except RoleRequest.DoesNotExist:
         return JsonResponse({"message": "Request not found"}, status=404)
@@ -1322,26 +2107,79 @@ def get_recurring_issues(request):
     if prof.role not in ["manager", "admin"]:
         return JsonResponse({"message": "Only managers and admins can view recurring issues"}, status=403)
     
+    # Optional window (days) and threshold; both read from the daily rollup
+    try:
+        days = int(request.GET["days"]) if request.GET.get("days") else None
+        min_count = int(request.GET.get("min_count", 2))
+    except ValueError:
+        return JsonResponse({"message": "days and min_count must be integers"}, status=400)
+    if days is not None and days < 1 or min_count < 1:
+        return JsonResponse({"message": "days and min_count must be positive"}, status=400)
+
     # Identify Recurring Fault Patterns (US-11.1)
-    # Group by building, room_number, and title or category
-    recurring_faults = FaultReport.objects.values(
-        'building', 'room_number', 'category'
-    ).annotate(
-        count=Count('id')
-    ).filter(count__gte=2).order_by('-count')
+    # Grouped by building, room_number and category
+    recurring_faults = [
+        {"building": building, "room_number": room, "category": category, "count": count}
+        for building, room, category, count in rollups.recurring("fault", days, min_count)
+    ]
     
     # Identify Recurring Overload Patterns (US-11.2)
-    recurring_overloads = OverloadRecord.objects.values(
-        'building', 'room_number', 'resource_type'
-    ).annotate(
-        count=Count('id')
-    ).filter(count__gte=2).order_by('-count')
+    recurring_overloads = [
+        {"building": building, "room_number": room, "resource_type": resource_type, "count": count}
+        for building, room, resource_type, count in rollups.recurring("overload", days, min_count)
+    ]
     
     return JsonResponse({
-        "recurring_faults": list(recurring_faults),
-        "recurring_overloads": list(recurring_overloads),
+        "recurring_faults": recurring_faults,
+        "recurring_overloads": recurring_overloads,
+        "days": days,
+        "min_count": min_count,
     })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def get_issue_trends(request):
+    """US-11: locations whose faults or overloads are getting worse"""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view issue trends"}, status=403)
+
+    kind = request.GET.get("kind", "fault")
+    if kind not in ("fault", "overload"):
+        return JsonResponse({"message": "kind must be fault or overload"}, status=400)
+    try:
+        days = int(request.GET.get("days", 90))
+        limit = int(request.GET.get("limit", 20))
+    except ValueError:
+        return JsonResponse({"message": "days and limit must be integers"}, status=400)
+    if not 2 * trends.WINDOW < days <= 730 or not 1 <= limit <= 200:
+        return JsonResponse({"message": f"days must be {2 * trends.WINDOW + 1}-730 and limit 1-200"}, status=400)
+
+    # Counts for every location over the window as one array; statistics are vectorized
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    locations, counts = trends.matrix(rollups.daily_counts(kind, start, end), start, days)
+    stats = trends.analyze_parallel(counts)
+    results = []
+    for i in trends.worsening(stats, limit=limit):
+        building, room_number, category = locations[i]
+        results.append({
+            "building": building,
+            "room_number": room_number,
+            "category": category,
+            "recent_count": int(counts[i, -trends.WINDOW:].sum()),
+            "recent_rate": round(float(stats["recent_rate"][i]), 3),
+            "previous_rate": round(float(stats["previous_rate"][i]), 3),
+            "week_change": round(float(stats["week_change"][i]), 3),
+            "baseline": round(float(stats["baseline"][i]), 3),
+            "z_score": round(float(stats["z_score"][i]), 2),
+            "spike": bool(stats["z_score"][i] >= trends.SPIKE_Z),
+        })
+
+    return JsonResponse({"kind": kind, "days": days, "locations": results})
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
@@ -1373,39 +2211,67 @@ def log_overload(request):
 @require_auth
 def list_notifications(request):
     user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
     
-    # Get unread notifications first, then read ones, limited to 50 recent
-    notifications = Notification.objects.filter(user=user).order_by("is_read", "-created_at")[:50]
+    # Direct and role broadcast notifications merged: unread first, 50 most recent
+    notifications, state = notify.inbox(user, prof.role)
     
     return JsonResponse({
-        "notifications": [{
-            "id": n.id,
-            "title": n.title,
-            "message": n.message,
-            "is_read": n.is_read,
-            "action_link": n.action_link,
-            "created_at": n.created_at.isoformat(),
-        } for n in notifications],
-        "unread_count": Notification.objects.filter(user=user, is_read=False).count()
+        "notifications": notifications,
+        "unread_count": state.unread_count,
+        "cursor": notify.make_cursor(state),
     })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def notifications_sync(request):
+    """Changes since ?since=<cursor>; an unchanged inbox costs one state lookup."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    return JsonResponse(notify.sync(user, prof.role, request.GET.get("since")))
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@require_auth
+def notification_preferences(request):
+    user = request.user_obj
+    if request.method == "GET":
+        return JsonResponse({"digest_minutes": notify.digest_preference(user)})
+    try:
+        data = json.loads(request.body)
+        digest_minutes = int(data.get("digest_minutes", 0))
+    except (ValueError, TypeError):
+        return JsonResponse({"message": "digest_minutes must be a whole number of minutes"}, status=400)
+    if not 0 <= digest_minutes <= 7 * 24 * 60:
+        return JsonResponse({"message": "digest_minutes must be between 0 and 10080"}, status=400)
+    return JsonResponse({"digest_minutes": notify.digest_preference(user, digest_minutes)})
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
 def mark_notification_read(request, notification_id):
     user = request.user_obj
-    try:
-        notification = Notification.objects.get(id=notification_id, user=user)
-        notification.is_read = True
-        notification.save()
-        return JsonResponse({"message": "Notification marked as read"})
-    except Notification.DoesNotExist:
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if not notify.mark_read(user, prof.role, notification_id):
         return JsonResponse({"message": "Notification not found"}, status=404)
+    return JsonResponse({"message": "Notification marked as read"})
 
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
 def mark_all_notifications_read(request):
     user = request.user_obj
-    Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+    prof, _ = Profile.objects.get_or_create(user=user)
+    notify.mark_all_read(user, prof.role)
     return JsonResponse({"message": "All notifications marked as read"})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+def mark_broadcast_read(request, broadcast_id):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if not notify.mark_broadcast_read(user, prof.role, broadcast_id):
+        return JsonResponse({"message": "Notification not found"}, status=404)
+    return JsonResponse({"message": "Notification marked as read"})
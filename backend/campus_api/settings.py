@@ -32,6 +32,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "accounts.middleware.UnreadNotificationsMiddleware",
 ]
 
 ROOT_URLCONF = "campus_api.urls"
@@ -53,19 +54,120 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "campus_api.wsgi.application"
 
+# SQLite tuning applied to every new connection. WAL lets readers keep going
+# while an approval or update endpoint writes, and busy_timeout makes
+# concurrent gunicorn workers wait for the write lock instead of failing with
+# "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-20000")),  # negative = KiB, ~20 MB
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {key}={value}" for key, value in SQLITE_PRAGMAS.items()),
+            # Atomic blocks start with BEGIN IMMEDIATE so write views take the
+            # write lock up front rather than failing on lock upgrade.
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
+    }
+}
+
+# The primary database as a URL (e.g. Render's managed Postgres). Every
+# process that shares data, such as the web service and the run_jobs worker,
+# must point at the same database; without it each uses its own db.sqlite3.
+DATABASE_URL = os.environ.get("DATABASE_URL", "").strip()
+if DATABASE_URL:
+    import dj_database_url
+
+    primary = dj_database_url.parse(DATABASE_URL, conn_max_age=int(os.environ.get("DATABASE_CONN_MAX_AGE", "600")))
+    if primary["ENGINE"] == DATABASES["default"]["ENGINE"]:
+        primary["OPTIONS"] = dict(DATABASES["default"]["OPTIONS"])
+    DATABASES["default"] = primary
+
+# Read replicas, as comma separated database URLs (e.g. two local SQLite files:
+# "sqlite:////tmp/replica1.sqlite3,sqlite:////tmp/replica2.sqlite3", or
+# postgres:// URLs). When set, GET traffic is routed to them by
+# PrimaryReplicaRouter; leave unset to run everything on "default".
+REPLICA_DATABASE_URLS = [url.strip() for url in os.environ.get("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get("REPLICA_LAG_CHECK_SECONDS", "5"))
+# How long a client keeps reading from the primary after a write request
+REPLICA_PIN_SECONDS = float(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+
+if REPLICA_DATABASE_URLS:
+    import dj_database_url
+
+    for index, url in enumerate(REPLICA_DATABASE_URLS, start=1):
+        replica = dj_database_url.parse(url)
+        if replica["ENGINE"] == DATABASES["default"]["ENGINE"]:
+            replica["OPTIONS"] = dict(DATABASES["default"]["OPTIONS"])
+        replica["TEST"] = {"MIRROR": "default"}
+        DATABASES[f"replica{index}"] = replica
+    DATABASE_ROUTERS = ["accounts.routers.PrimaryReplicaRouter"]
+    # Outermost, so every middleware that reads the database is routed
+    MIDDLEWARE.insert(0, "accounts.middleware.ReplicaPinningMiddleware")
+    TEST_RUNNER = "campus_api.test_runner.ReplicaTestRunner"
+
+# Shared cache for replica pins and short-lived counters. The in-process
+# default is fine for a single worker; point CACHE_BACKEND at a shared backend
+# (e.g. django.core.cache.backends.db.DatabaseCache) when running several.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "campus-hub"),
     }
 }
 
+# Retention windows (days) used by the apply_retention command
+RETENTION_DAYS = {
+    "read_notifications": int(os.environ.get("RETENTION_READ_NOTIFICATIONS_DAYS", "30")),
+    "broadcasts": int(os.environ.get("RETENTION_BROADCASTS_DAYS", "90")),
+    "finished_jobs": int(os.environ.get("RETENTION_FINISHED_JOBS_DAYS", "7")),
+    "overload_records": int(os.environ.get("RETENTION_OVERLOAD_RECORDS_DAYS", "90")),
+}
+
+# Database-backed job queue (accounts/jobs.py, worker: manage.py run_jobs).
+# Jobs run in a run_jobs worker, off the request path; production must run
+# one. JOBS_EAGER=true also runs each job in the process that queued it once
+# its transaction commits: handy for local development without a worker, but
+# it puts notification fan-out and thumbnails back on the request path.
+JOBS_EAGER = os.environ.get("JOBS_EAGER", "false").lower() == "true"
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_BACKOFF_SECONDS = float(os.environ.get("JOBS_BACKOFF_SECONDS", "10"))
+JOBS_BACKOFF_MAX_SECONDS = float(os.environ.get("JOBS_BACKOFF_MAX_SECONDS", "3600"))
+JOBS_STALE_SECONDS = int(os.environ.get("JOBS_STALE_SECONDS", "300"))
+
+# Notifications with a summary merge with a similar unread one sent this recently
+NOTIFY_COALESCE_SECONDS = int(os.environ.get("NOTIFY_COALESCE_SECONDS", "3600"))
+
+# A new fault report matching an open one this recent is merged into it as a "+1"
+FAULT_DUPLICATE_WINDOW_HOURS = int(os.environ.get("FAULT_DUPLICATE_WINDOW_HOURS", "72"))
+
+# Fault analytics responses are cached this long; counts may lag by as much
+FAULT_ANALYTICS_CACHE_SECONDS = int(os.environ.get("FAULT_ANALYTICS_CACHE_SECONDS", "30"))
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
 USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = "static/"
+
+# Uploaded fault photos and their thumbnails
+MEDIA_ROOT = Path(os.environ.get("MEDIA_ROOT", BASE_DIR / "media"))
+FAULT_PHOTO_MAX_BYTES = int(os.environ.get("FAULT_PHOTO_MAX_BYTES", str(25 * 1024 * 1024)))
+FAULT_PHOTO_THUMBNAIL_SIZE = int(os.environ.get("FAULT_PHOTO_THUMBNAIL_SIZE", "320"))
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # CORS - Allow React frontend
@@ -99,7 +201,7 @@ CORS_ALLOW_METHODS = [
     'PUT',
 ]
 
-CORS_EXPOSE_HEADERS = ['authorization', 'Authorization']
+CORS_EXPOSE_HEADERS = ['authorization', 'Authorization', 'X-Unread-Notifications', 'X-Notifications-Token']
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [],
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import iter_test_cases
+
+
+class ReplicaTestRunner(DiscoverRunner):
+    """Runs the suite with REPLICA_DATABASE_URLS set, routing and all.
+
+    Test mirrors are separate connections, so they cannot see rows a
+    TestCase writes inside its open transaction. Each replica alias is
+    pointed at the primary's connection instead, and tests may use the
+    replica aliases: the router still picks replicas, and reads through
+    them see the test's own writes.
+    """
+
+    def _replicas(self):
+        return {alias for alias in settings.DATABASES if alias.startswith("replica")}
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        for test in iter_test_cases(suite):
+            cls = type(test)
+            if cls.databases != "__all__":
+                cls.databases = set(cls.databases) | self._replicas()
+        return suite
+
+    def setup_databases(self, **kwargs):
+        config = super().setup_databases(**kwargs)
+        for alias in self._replicas():
+            connections[alias] = connections[DEFAULT_DB_ALIAS]
+        return config
@@ -7,22 +7,72 @@ import { Link } from 'react-router-dom';
 
 const API_BASE = import.meta.env.DEV ? "" : "http://127.0.0.1:8000";
 
+// Applies a sync delta: changed items replace their old copies, read-all
+// done elsewhere shows up as a moved broadcast watermark
+function mergeChanges(prev, data) {
+    const byKey = new Map(prev.map(n => [`${n.kind}-${n.id}`, n]));
+    for (const n of data.notifications || []) {
+        byKey.set(`${n.kind}-${n.id}`, n);
+    }
+    let merged = [...byKey.values()];
+    if (data.broadcasts_read_until) {
+        const watermark = new Date(data.broadcasts_read_until);
+        merged = merged.map(n => n.kind === 'broadcast' && new Date(n.created_at) <= watermark ? { ...n, is_read: true } : n);
+    }
+    merged.sort((a, b) => (a.is_read - b.is_read) || (new Date(b.created_at) - new Date(a.created_at)));
+    return merged.slice(0, 50);
+}
+
 export default function Notifications() {
     const { user } = useAuth();
     const [notifications, setNotifications] = useState([]);
     const [unreadCount, setUnreadCount] = useState(0);
     const [isOpen, setIsOpen] = useState(false);
+    const [digestMinutes, setDigestMinutes] = useState(0);
     const dropdownRef = useRef(null);
+    // Cursor from the last sync; polls with it only return what changed
+    const cursorRef = useRef(null);
+    const lastHeaderRef = useRef(0);
 
     useEffect(() => {
         if (user) {
             fetchNotifications();
-            // Poll for new notifications
-            const interval = setInterval(fetchNotifications, 60000); // Every minute
+            // Poll for new notifications, unless other API traffic already
+            // brought the count back within the last minute
+            const interval = setInterval(() => {
+                if (Date.now() - lastHeaderRef.current >= 60000) fetchNotifications();
+            }, 60000);
             return () => clearInterval(interval);
         }
     }, [user]);
 
+    // Every authenticated API response carries the unread count and an inbox
+    // change token; watch responses so a busy session never needs the poll
+    useEffect(() => {
+        if (!user) return;
+        const originalFetch = window.fetch;
+        window.fetch = async (...args) => {
+            const res = await originalFetch(...args);
+            const unread = res.headers.get('X-Unread-Notifications');
+            const token = res.headers.get('X-Notifications-Token');
+            if (unread !== null) {
+                lastHeaderRef.current = Date.now();
+                setUnreadCount(Number(unread));
+                const known = cursorRef.current && cursorRef.current.split('.').slice(0, 2).join('.');
+                const url = typeof args[0] === 'string' ? args[0] : args[0]?.url || '';
+                if (token && token !== known && !url.includes('/api/notifications/')) {
+                    fetchNotifications();
+                }
+            }
+            return res;
+        };
+        return () => { window.fetch = originalFetch; };
+    }, [user]);
+
+    useEffect(() => {
+        if (isOpen) fetchDigest();
+    }, [isOpen]);
+
     // Close dropdown when clicking outside
     useEffect(() => {
         function handleClickOutside(event) {
@@ -41,36 +91,76 @@ export default function Notifications() {
             const token = localStorage.getItem("token");
             if (!token) return;
 
-            const res = await fetch(`${API_BASE || ''}/api/notifications/list`, {
+            const since = cursorRef.current ? `?since=${encodeURIComponent(cursorRef.current)}` : '';
+            const res = await fetch(`${API_BASE || ''}/api/notifications/sync${since}`, {
                 headers: { 'Authorization': `Bearer ${token}` }
             });
 
             if (res.ok) {
                 const data = await res.json();
-                setNotifications(data.notifications || []);
+                cursorRef.current = data.cursor;
                 setUnreadCount(data.unread_count || 0);
+                if (data.full) {
+                    setNotifications(data.notifications || []);
+                } else if (data.notifications?.length || data.broadcasts_read_until) {
+                    setNotifications(prev => mergeChanges(prev, data));
+                }
             }
         } catch (error) {
             console.error("Failed to fetch notifications:", error);
         }
     };
 
-    const markAsRead = async (id, e) => {
+    const markAsRead = async (notification, e) => {
         e.stopPropagation();
+        const { id, kind } = notification;
         try {
             const token = localStorage.getItem("token");
-            await fetch(`${API_BASE || ''}/api/notifications/${id}/read`, {
+            // Role broadcasts are shared rows with their own read receipts
+            const path = kind === 'broadcast' ? `broadcast/${id}` : id;
+            await fetch(`${API_BASE || ''}/api/notifications/${path}/read`, {
                 method: 'POST',
                 headers: { 'Authorization': `Bearer ${token}` }
             });
             // Update local state
-            setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n));
+            setNotifications(prev => prev.map(n => n.id === id && n.kind === kind ? { ...n, is_read: true } : n));
             setUnreadCount(prev => Math.max(0, prev - 1));
         } catch (error) {
             console.error("Failed to mark notification as read:", error);
         }
     };
 
+    const fetchDigest = async () => {
+        try {
+            const token = localStorage.getItem("token");
+            const res = await fetch(`${API_BASE || ''}/api/notifications/preferences`, {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (res.ok) {
+                const data = await res.json();
+                setDigestMinutes(data.digest_minutes || 0);
+            }
+        } catch (error) {
+            console.error("Failed to fetch notification preferences:", error);
+        }
+    };
+
+    const saveDigest = async (minutes) => {
+        try {
+            const token = localStorage.getItem("token");
+            const res = await fetch(`${API_BASE || ''}/api/notifications/preferences`, {
+                method: 'POST',
+                headers: { 'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json' },
+                body: JSON.stringify({ digest_minutes: minutes })
+            });
+            if (res.ok) {
+                setDigestMinutes(minutes);
+            }
+        } catch (error) {
+            console.error("Failed to save notification preferences:", error);
+        }
+    };
+
     const markAllRead = async () => {
         try {
             const token = localStorage.getItem("token");
@@ -114,6 +204,19 @@ export default function Notifications() {
                         )}
                     </div>
 
+                    <div className="px-3 py-2 border-b border-slate-100 flex items-center justify-between text-xs text-slate-500">
+                        <span>Deliver my notifications</span>
+                        <select
+                            value={digestMinutes}
+                            onChange={(e) => saveDigest(Number(e.target.value))}
+                            className="bg-transparent text-slate-700 font-medium focus:outline-none"
+                        >
+                            <option value={0}>As they happen</option>
+                            <option value={60}>Hourly digest</option>
+                            <option value={1440}>Daily digest</option>
+                        </select>
+                    </div>
+
                     <div className="overflow-y-auto flex-1 max-h-[400px]">
                         {notifications.length === 0 ? (
                             <div className="p-6 text-center text-slate-500 text-sm">
@@ -123,13 +226,18 @@ export default function Notifications() {
                             <div className="divide-y divide-slate-100">
                                 {notifications.map(n => (
                                     <div
-                                        key={n.id}
+                                        key={`${n.kind}-${n.id}`}
                                         className={`p-3 hover:bg-slate-50 transition-colors ${!n.is_read ? 'bg-blue-50/50' : ''}`}
                                     >
                                         <div className="flex justify-between items-start gap-2">
                                             <div className="flex-1">
                                                 <h4 className={`text-sm ${!n.is_read ? 'font-semibold text-slate-900' : 'text-slate-700'}`}>
                                                     {n.title}
+                                                    {n.count > 1 && (
+                                                        <span className="ml-1.5 px-1.5 py-0.5 rounded-full bg-slate-100 text-[10px] font-medium text-slate-600">
+                                                            {n.count}
+                                                        </span>
+                                                    )}
                                                 </h4>
                                                 <p className="text-xs text-slate-500 mt-1 line-clamp-2">
                                                     {n.message}
@@ -151,7 +259,7 @@ export default function Notifications() {
                                             </div>
                                             {!n.is_read && (
                                                 <button
-                                                    onClick={(e) => markAsRead(n.id, e)}
+                                                    onClick={(e) => markAsRead(n, e)}
                                                     className="text-slate-400 hover:text-blue-600 p-1"
                                                     title="Mark as read"
                                                 >
@@ -1,9 +1,9 @@
-import React, { useState, useMemo } from 'react';
+import React, { useState, useMemo, useEffect } from 'react';
 import { Card } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { ChevronLeft, ChevronRight, Clock } from 'lucide-react';
 
-export default function ScheduleCalendar({ requests = [], onTimeSlotClick, loading = false }) {
+export default function ScheduleCalendar({ requests = [], onTimeSlotClick, onRangeChange, loading = false }) {
     const [currentDate, setCurrentDate] = useState(new Date());
 
     // Helper to format hours
@@ -30,6 +30,11 @@ export default function ScheduleCalendar({ requests = [], onTimeSlotClick, loadi
         return days;
     }, [currentDate]);
 
+    // Let the parent load only the bookings for the visible week
+    useEffect(() => {
+        if (onRangeChange) onRangeChange(weekDays[0], weekDays[6]);
+    }, [weekDays]);
+
     // Navigate functions
     const nextWeek = () => {
         const next = new Date(currentDate);
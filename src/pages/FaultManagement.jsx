@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '@/state/AuthContext';
-import { AlertTriangle, CheckCircle, Clock, XCircle, Search, Filter } from 'lucide-react';
+import { AlertTriangle, CheckCircle, Clock, XCircle, Search, Filter, Download } from 'lucide-react';
 import { Card } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -19,13 +19,63 @@ export default function FaultManagement() {
   const [updateStatus, setUpdateStatus] = useState('');
   const [assignedTo, setAssignedTo] = useState('');
   const [resolutionNotes, setResolutionNotes] = useState('');
+  const [timings, setTimings] = useState(null);
 
   useEffect(() => {
     if (user?.role === 'manager' || user?.role === 'admin') {
       fetchFaults();
+      fetchTimings();
     }
   }, [user]);
 
+  // Overall p50/p90 time to acknowledge and resolve, from the server-side sketches
+  const fetchTimings = async () => {
+    try {
+      const token = localStorage.getItem("token");
+      const response = await fetch(`${API_BASE || ''}/api/faults/metrics`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setTimings(data.metrics);
+      }
+    } catch (error) {
+      console.error('Error fetching fault metrics:', error);
+    }
+  };
+
+  // The export streams from the server; the status filter is applied there too
+  const handleExport = async () => {
+    try {
+      const token = localStorage.getItem("token");
+      const params = new URLSearchParams({ format: 'csv' });
+      if (statusFilter !== 'all') params.set('status', statusFilter);
+      const response = await fetch(`${API_BASE || ''}/api/exports/faults?${params}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (!response.ok) {
+        toast.error('Failed to export fault reports');
+        return;
+      }
+      const url = URL.createObjectURL(await response.blob());
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `faults-${new Date().toISOString().slice(0, 10)}.csv`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Error exporting faults:', error);
+      toast.error('Failed to export fault reports');
+    }
+  };
+
+  const formatDuration = (seconds) => {
+    if (seconds == null) return '-';
+    if (seconds < 3600) return `${Math.round(seconds / 60)}m`;
+    if (seconds < 86400) return `${(seconds / 3600).toFixed(1)}h`;
+    return `${(seconds / 86400).toFixed(1)}d`;
+  };
+
   useEffect(() => {
     filterFaults();
   }, [faults, searchTerm, statusFilter]);
@@ -113,6 +163,7 @@ export default function FaultManagement() {
         setAssignedTo('');
         setResolutionNotes('');
         fetchFaults();
+        fetchTimings();
       } else {
         const error = await response.json();
         toast.error(error.message || 'Failed to update fault report');
@@ -189,9 +240,15 @@ export default function FaultManagement() {
 
   return (
     <div className="p-6 space-y-6">
-      <div>
-        <h1 className="text-3xl font-bold text-slate-900 mb-2">Fault Management</h1>
-        <p className="text-slate-600">Manage and update fault reports</p>
+      <div className="flex flex-col md:flex-row justify-between items-start md:items-center gap-4">
+        <div>
+          <h1 className="text-3xl font-bold text-slate-900 mb-2">Fault Management</h1>
+          <p className="text-slate-600">Manage and update fault reports</p>
+        </div>
+        <Button variant="outline" onClick={handleExport} className="flex items-center gap-2">
+          <Download className="w-4 h-4" />
+          Export CSV
+        </Button>
       </div>
 
       {/* Stats */}
@@ -204,6 +261,26 @@ export default function FaultManagement() {
         ))}
       </div>
 
+      {timings && (timings.acknowledge.length > 0 || timings.resolve.length > 0) && (
+        <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+          {[['acknowledge', 'Time to acknowledge'], ['resolve', 'Time to resolve']].map(([metric, label]) => {
+            const row = timings[metric][0];
+            return (
+              <Card key={metric} className="p-4 flex items-center justify-between">
+                <div className="flex items-center gap-2 text-slate-700">
+                  <Clock className="w-4 h-4 text-slate-400" />
+                  <span className="text-sm font-medium">{label}</span>
+                </div>
+                <p className="text-sm text-slate-600">
+                  median <span className="font-semibold text-slate-900">{formatDuration(row?.p50)}</span>
+                  {' · '}p90 <span className="font-semibold text-slate-900">{formatDuration(row?.p90)}</span>
+                </p>
+              </Card>
+            );
+          })}
+        </div>
+      )}
+
       {/* Filters */}
       <Card className="p-4">
         <div className="flex flex-col md:flex-row gap-4">
@@ -256,6 +333,11 @@ export default function FaultManagement() {
                     <span className={`px-2 py-1 rounded text-xs font-medium ${getSeverityColor(fault.severity)}`}>
                       {fault.severity}
                     </span>
+                    {fault.duplicate_count > 0 && (
+                      <span className="px-2 py-1 rounded text-xs font-medium bg-slate-100 text-slate-700" title="Other users who reported the same fault">
+                        +{fault.duplicate_count}
+                      </span>
+                    )}
                   </div>
                   <p className="text-slate-600 mb-3">{fault.description || 'No description'}</p>
                   <div className="grid grid-cols-2 md:grid-cols-4 gap-4 text-sm">
@@ -15,6 +15,7 @@ export default function ManagerRequests() {
   const [loading, setLoading] = useState(true);
   const [processing, setProcessing] = useState({});
   const [rejectionReasons, setRejectionReasons] = useState({});
+  const [hasMore, setHasMore] = useState(false);
 
   // Check if user is manager or admin
   const isManagerOrAdmin = user?.role === 'manager' || user?.role === 'admin';
@@ -40,19 +41,38 @@ export default function ManagerRequests() {
         'Content-Type': 'application/json',
       };
 
-      // Fetch Update Requests (Labs/Library)
-      const res = await fetch(`${API_BASE || ''}/api/updates/pending`, { headers });
+      // One queue for role, library and lab requests, most urgent and oldest first
+      const params = new URLSearchParams({ kind: 'role,library,lab', page_size: '200' });
+      const res = await fetch(`${API_BASE || ''}/api/approvals/queue?${params}`, { headers });
       if (res.ok) {
         const data = await res.json();
-        setPendingUpdates(data);
-      }
-
-      // Fetch Role Requests (New Users)
-      const roleRes = await fetch(`${API_BASE || ''}/api/admin/role-requests`, { headers });
-      if (roleRes.ok) {
-        const roleData = await roleRes.json();
-        // Filter only pending requests
-        setRoleRequests(roleData.requests.filter(r => r.status === 'pending') || []);
+        const ofKind = (kind) => data.requests.filter(r => r.kind === kind);
+        setRoleRequests(ofKind('role').map(r => ({
+          id: r.id,
+          user_email: r.requested_by,
+          requested_role: r.details.requested_role,
+          manager_type: r.details.manager_type,
+          reason: r.details.reason,
+          requested_at: r.created_at,
+        })));
+        setPendingUpdates({
+          library_requests: ofKind('library').map(r => ({
+            ...r.details,
+            id: r.id,
+            library_name: r.details.library_name || r.details.requested_name,
+            requested_by: r.requested_by,
+            requested_at: r.created_at,
+            requested_occupancy: r.details.requested_current_occupancy,
+          })),
+          lab_requests: ofKind('lab').map(r => ({
+            ...r.details,
+            id: r.id,
+            requested_by: r.requested_by,
+            requested_at: r.created_at,
+            requested_occupancy: r.details.requested_current_occupancy,
+          })),
+        });
+        setHasMore(data.has_more);
       }
 
     } catch (error) {
@@ -125,6 +145,50 @@ export default function ManagerRequests() {
     }
   };
 
+  // One request for a whole queue; the backend reports an outcome per id
+  const handleBulkApprove = async (kind, ids) => {
+    setProcessing({ ...processing, [`bulk-${kind}`]: true });
+    try {
+      const token = localStorage.getItem("token");
+      const res = await fetch(`${API_BASE || ''}/api/approvals/bulk`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ kind, ids, action: 'approve' }),
+      });
+      const data = await res.json();
+      if (res.ok) {
+        if (data.failed > 0) {
+          toast.warning(data.message);
+        } else {
+          toast.success(data.message);
+        }
+        fetchPendingUpdates();
+      } else {
+        toast.error(data.message || 'Failed to approve requests');
+      }
+    } catch (error) {
+      console.error('Failed to approve requests:', error);
+      toast.error('Failed to approve requests');
+    } finally {
+      setProcessing({ ...processing, [`bulk-${kind}`]: false });
+    }
+  };
+
+  const bulkButton = (kind, items) => (
+    <Button
+      size="sm"
+      className="ml-auto bg-green-600 hover:bg-green-700"
+      disabled={processing[`bulk-${kind}`]}
+      onClick={() => handleBulkApprove(kind, items.map((req) => req.id))}
+    >
+      <CheckCircle className="w-4 h-4 mr-2" />
+      {processing[`bulk-${kind}`] ? 'Approving...' : `Approve all (${items.length})`}
+    </Button>
+  );
+
   const handleReject = async (type, requestId) => {
     const reason = rejectionReasons[`${type}-${requestId}`] || '';
     setProcessing({ ...processing, [`${type}-${requestId}-reject`]: true });
@@ -205,6 +269,9 @@ export default function ManagerRequests() {
               <p className="text-sm text-slate-600">
                 {pendingUpdates.library_requests?.length || 0} library, {pendingUpdates.lab_requests?.length || 0} lab, {roleRequests.length} user roles
               </p>
+              {hasMore && (
+                <p className="text-xs text-slate-500 mt-1">Showing the 200 most urgent; decide these to see the rest.</p>
+              )}
             </div>
           </div>
         </div>
@@ -224,6 +291,7 @@ export default function ManagerRequests() {
               <h2 className="text-2xl font-bold text-slate-900 mb-4 flex items-center gap-2">
                 <User className="w-6 h-6" />
                 New User Enrollments ({roleRequests.length})
+                {bulkButton('role', roleRequests)}
               </h2>
               <div className="space-y-4">
                 {roleRequests.map((req) => (
@@ -293,6 +361,7 @@ export default function ManagerRequests() {
               <h2 className="text-2xl font-bold text-slate-900 mb-4 flex items-center gap-2">
                 <BookOpen className="w-6 h-6" />
                 Library Update Requests ({pendingUpdates.library_requests.length})
+                {bulkButton('library', pendingUpdates.library_requests)}
               </h2>
               <div className="space-y-4">
                 {pendingUpdates.library_requests.map((req) => (
@@ -404,6 +473,7 @@ export default function ManagerRequests() {
               <h2 className="text-2xl font-bold text-slate-900 mb-4 flex items-center gap-2">
                 <FlaskConical className="w-6 h-6" />
                 Lab Update Requests ({pendingUpdates.lab_requests.length})
+                {bulkButton('lab', pendingUpdates.lab_requests)}
               </h2>
               <div className="space-y-4">
                 {pendingUpdates.lab_requests.map((req) => (
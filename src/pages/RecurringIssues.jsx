@@ -16,15 +16,38 @@ export default function RecurringIssues() {
     const { user } = useAuth();
     const [data, setData] = useState({ recurring_faults: [], recurring_overloads: [] });
     const [loading, setLoading] = useState(true);
+    // Empty string = all time
+    const [days, setDays] = useState('');
+    const [trends, setTrends] = useState([]);
 
     useEffect(() => {
         fetchRecurringIssues();
+    }, [user, days]);
+
+    useEffect(() => {
+        fetchTrends();
     }, [user]);
 
+    const fetchTrends = async () => {
+        try {
+            const token = localStorage.getItem("token");
+            const response = await fetch(`${API_BASE || ''}/api/reports/trends?kind=fault&days=90`, {
+                headers: { 'Authorization': `Bearer ${token}` },
+            });
+            if (response.ok) {
+                const result = await response.json();
+                setTrends(result.locations);
+            }
+        } catch (error) {
+            console.error('Error fetching issue trends:', error);
+        }
+    };
+
     const fetchRecurringIssues = async () => {
         try {
             const token = localStorage.getItem("token");
-            const response = await fetch(`${API_BASE || ''}/api/reports/recurring`, {
+            const query = days ? `?days=${days}` : '';
+            const response = await fetch(`${API_BASE || ''}/api/reports/recurring${query}`, {
                 headers: {
                     'Authorization': `Bearer ${token}`,
                     'Content-Type': 'application/json',
@@ -86,17 +109,59 @@ export default function RecurringIssues() {
                     <h1 className="text-3xl font-bold text-slate-900 mb-2">Recurring Issues Analytics</h1>
                     <p className="text-slate-600">Identify systemic problems and plan infrastructure improvements (US-11)</p>
                 </div>
-                <Button
-                    variant="outline"
-                    onClick={fetchRecurringIssues}
-                    disabled={loading}
-                    className="flex items-center gap-2"
-                >
-                    <RefreshCw className={`w-4 h-4 ${loading ? 'animate-spin' : ''}`} />
-                    Refresh Data
-                </Button>
+                <div className="flex items-center gap-2">
+                    <select
+                        value={days}
+                        onChange={(e) => setDays(e.target.value)}
+                        className="h-9 rounded-md border border-slate-200 bg-white px-3 text-sm text-slate-700"
+                    >
+                        <option value="">All time</option>
+                        <option value="7">Last 7 days</option>
+                        <option value="30">Last 30 days</option>
+                        <option value="90">Last 90 days</option>
+                    </select>
+                    <Button
+                        variant="outline"
+                        onClick={() => { fetchRecurringIssues(); fetchTrends(); }}
+                        disabled={loading}
+                        className="flex items-center gap-2"
+                    >
+                        <RefreshCw className={`w-4 h-4 ${loading ? 'animate-spin' : ''}`} />
+                        Refresh Data
+                    </Button>
+                </div>
             </div>
 
+            {/* Locations getting worse: last week against their own baseline */}
+            {trends.length > 0 && (
+                <Card className="p-6">
+                    <h3 className="text-lg font-semibold text-slate-900 mb-4 flex items-center gap-2">
+                        <TrendingUp className="w-5 h-5 text-red-500" />
+                        Getting Worse
+                    </h3>
+                    <div className="divide-y divide-slate-100">
+                        {trends.map((item, idx) => (
+                            <div key={idx} className="py-2 flex items-center justify-between gap-4 text-sm">
+                                <div className="flex items-center gap-2">
+                                    <MapPin className="w-4 h-4 text-slate-400" />
+                                    <span className="font-medium text-slate-900">{item.building} {item.room_number}</span>
+                                    <span className="px-2 py-0.5 bg-slate-100 text-slate-600 rounded text-xs uppercase">{item.category}</span>
+                                    {item.spike && (
+                                        <span className="px-2 py-0.5 bg-red-100 text-red-700 rounded text-xs font-medium">Spike</span>
+                                    )}
+                                </div>
+                                <div className="text-right text-slate-600">
+                                    {item.recent_count} this week
+                                    <span className={item.week_change > 0 ? 'text-red-600 ml-2' : 'text-slate-400 ml-2'}>
+                                        {item.week_change > 0 ? '+' : ''}{item.week_change} vs last week
+                                    </span>
+                                </div>
+                            </div>
+                        ))}
+                    </div>
+                </Card>
+            )}
+
             {/* Analytics Section */}
             {(buildingData.length > 0 || categoryData.length > 0) && (
                 <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
@@ -28,6 +28,7 @@ export default function ReportFault() {
   const { user } = useAuth();
   const navigate = useNavigate();
   const [loading, setLoading] = useState(false);
+  const [photo, setPhoto] = useState(null);
   const [formData, setFormData] = useState({
     title: '',
     description: '',
@@ -73,6 +74,26 @@ export default function ReportFault() {
     }));
   };
 
+  const uploadPhoto = async (faultId, token) => {
+    // Sent as multipart so the server can stream it to disk
+    const body = new FormData();
+    body.append('photo', photo);
+    try {
+      const response = await fetch(`${API_BASE || ''}/api/faults/${faultId}/photo`, {
+        method: 'POST',
+        headers: { 'Authorization': `Bearer ${token}` },
+        body,
+      });
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        toast.error(error.message || 'The report was saved but the photo could not be uploaded');
+      }
+    } catch (error) {
+      console.error('Error uploading photo:', error);
+      toast.error('The report was saved but the photo could not be uploaded');
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -124,7 +145,16 @@ export default function ReportFault() {
 
       if (response.ok) {
         const data = await response.json();
-        toast.success('Fault report submitted successfully!');
+        if (data.duplicate_of) {
+          // Already on file: the report was added to the existing one as a +1
+          toast.success(data.message);
+        } else {
+          toast.success('Fault report submitted successfully!');
+          if (photo) {
+            await uploadPhoto(data.fault.id, token);
+          }
+        }
+        setPhoto(null);
         // Reset form
         setFormData({
           title: '',
@@ -278,6 +308,17 @@ export default function ReportFault() {
                 className="w-full px-3 py-2 border border-slate-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500"
               />
             </div>
+            <div>
+              <label className="block text-sm font-medium text-slate-700 mb-2">
+                Photo
+              </label>
+              <input
+                type="file"
+                accept="image/jpeg,image/png,image/gif,image/webp"
+                onChange={(e) => setPhoto(e.target.files[0] || null)}
+                className="block w-full text-sm text-slate-600"
+              />
+            </div>
           </div>
         </Card>
 
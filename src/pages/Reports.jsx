@@ -16,13 +16,21 @@ export default function Reports() {
   const [filteredFaults, setFilteredFaults] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
+  const [statusSummary, setStatusSummary] = useState([]);
 
   useEffect(() => {
     fetchReports();
+    fetchStatusSummary();
   }, [user]);
 
   useEffect(() => {
-    filterReports();
+    if (!searchTerm.trim()) {
+      setFilteredFaults(faults);
+      return;
+    }
+    // Debounce so typing does not fire a request per keystroke
+    const timer = setTimeout(searchReports, 250);
+    return () => clearTimeout(timer);
   }, [faults, searchTerm]);
 
   const fetchReports = async () => {
@@ -70,18 +78,40 @@ export default function Reports() {
     }
   };
 
-  const filterReports = () => {
-    let filtered = [...faults];
-
-    if (searchTerm) {
-      filtered = filtered.filter(fault =>
-        fault.title?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        fault.description?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        fault.location?.toLowerCase().includes(searchTerm.toLowerCase())
-      );
+  // Counts are grouped server-side, so this is a few rows however many reports exist
+  const fetchStatusSummary = async () => {
+    try {
+      const token = localStorage.getItem("token");
+      if (!token) return;
+      const response = await fetch(`${API_BASE || ''}/api/faults/analytics?group_by=status`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setStatusSummary(data.groups || []);
+      }
+    } catch (error) {
+      console.error('Error fetching report summary:', error);
     }
+  };
 
-    setFilteredFaults(filtered);
+  const searchReports = async () => {
+    try {
+      const token = localStorage.getItem("token");
+      const params = new URLSearchParams({ q: searchTerm.trim(), page_size: '100' });
+      const response = await fetch(`${API_BASE || ''}/api/faults/search?${params}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setFilteredFaults(data.results || []);
+      }
+    } catch (error) {
+      console.error('Error searching reports:', error);
+    }
   };
 
   const getStatusBadge = (status) => {
@@ -175,6 +205,15 @@ export default function Reports() {
         </p>
       </div>
 
+      {/* Status Summary */}
+      {statusSummary.length > 0 && (
+        <div className="mb-6 flex flex-wrap gap-2">
+          {statusSummary.map(({ status, count }) => (
+            <div key={status}>{getStatusBadge(status)}<span className="ml-1 text-sm font-semibold text-slate-700">{count}</span></div>
+          ))}
+        </div>
+      )}
+
       {/* Search Bar */}
       <div className="mb-6">
         <div className="relative max-w-md">
@@ -221,6 +260,16 @@ export default function Reports() {
                     {getSeverityBadge(fault.severity)}
                   </div>
                 </div>
+                {fault.photo?.thumbnail_url && (
+                  <a href={`${API_BASE || ''}${fault.photo.url}`} target="_blank" rel="noreferrer" className="ml-4 shrink-0">
+                    <img
+                      src={`${API_BASE || ''}${fault.photo.thumbnail_url}`}
+                      alt="Fault photo"
+                      loading="lazy"
+                      className="w-20 h-20 object-cover rounded-md border border-slate-200"
+                    />
+                  </a>
+                )}
               </div>
 
               {/* Description */}
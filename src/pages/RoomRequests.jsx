@@ -12,6 +12,8 @@ const API_BASE = import.meta.env.DEV ? "" : "http://127.0.0.1:8000";
 export default function RoomRequests() {
   const { user } = useAuth();
   const [requests, setRequests] = useState([]);
+  const [calendarEvents, setCalendarEvents] = useState([]);
+  const [calendarRange, setCalendarRange] = useState(null);
   const [classrooms, setClassrooms] = useState([]);
   const [labs, setLabs] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -67,6 +69,27 @@ export default function RoomRequests() {
     }
   };
 
+  // Local YYYY-MM-DD (toISOString would shift the day in non-UTC zones)
+  const toDateParam = (d) =>
+    `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+
+  const fetchCalendar = async (from, to) => {
+    setCalendarRange({ from, to });
+    try {
+      const token = localStorage.getItem("token");
+      const params = new URLSearchParams({ from: toDateParam(from), to: toDateParam(to), mine: '1' });
+      const res = await fetch(`${API_BASE || ''}/api/calendar?${params}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (res.ok) {
+        const data = await res.json();
+        setCalendarEvents(data.events || []);
+      }
+    } catch (error) {
+      console.error('Failed to fetch calendar:', error);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setSubmitting(true);
@@ -101,6 +124,7 @@ export default function RoomRequests() {
         });
         setShowForm(false);
         fetchData();
+        if (calendarRange) fetchCalendar(calendarRange.from, calendarRange.to);
       } else {
         const error = await res.json();
         toast.error(error.message || 'Failed to submit request');
@@ -322,9 +346,10 @@ export default function RoomRequests() {
       {!showForm && (
         <div className="mb-8">
           <ScheduleCalendar
-            requests={requests}
+            requests={calendarEvents}
             loading={loading}
             onTimeSlotClick={handleTimeSlotClick}
+            onRangeChange={fetchCalendar}
           />
         </div>
       )}
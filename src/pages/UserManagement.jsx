@@ -3,6 +3,7 @@ import { useAuth } from '@/state/AuthContext';
 import { Users, CheckCircle, XCircle, Clock, AlertCircle, Shield, GraduationCap, Briefcase, User } from 'lucide-react';
 import { Card } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
 import { toast } from 'sonner';
 
 const API_BASE = import.meta.env.DEV ? "" : "http://127.0.0.1:8000";
@@ -10,6 +11,10 @@ const API_BASE = import.meta.env.DEV ? "" : "http://127.0.0.1:8000";
 export default function UserManagement() {
   const { user } = useAuth();
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [userSearch, setUserSearch] = useState('');
+  const [roleFilter, setRoleFilter] = useState('');
+  const [loadingUsers, setLoadingUsers] = useState(false);
   const [roleRequests, setRoleRequests] = useState([]);
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -21,6 +26,40 @@ export default function UserManagement() {
     }
   }, [user]);
 
+  useEffect(() => {
+    if (user?.role !== 'admin') return;
+    // Debounced so typing a search does not send a request per keystroke
+    const timer = setTimeout(() => fetchUsers(), 250);
+    return () => clearTimeout(timer);
+  }, [user, userSearch, roleFilter]);
+
+  const fetchUsers = async (after = null) => {
+    setLoadingUsers(true);
+    try {
+      const token = localStorage.getItem("token");
+      const params = new URLSearchParams({ page_size: '50' });
+      if (userSearch.trim()) params.set('q', userSearch.trim());
+      if (roleFilter) params.set('role', roleFilter);
+      if (after) params.set('after', after);
+      const response = await fetch(`${API_BASE || ''}/api/admin/users?${params}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (!response.ok) {
+        const error = await response.json();
+        toast.error(error.message || 'Failed to load users');
+        return;
+      }
+      const data = await response.json();
+      setUsers(prev => (after ? [...prev, ...data.users] : data.users));
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching users:', error);
+      toast.error('Failed to load users');
+    } finally {
+      setLoadingUsers(false);
+    }
+  };
+
   const fetchData = async () => {
     try {
       const token = localStorage.getItem("token");
@@ -36,13 +75,6 @@ export default function UserManagement() {
         setStats(statsData);
       }
 
-      // Fetch users
-      const usersRes = await fetch(`${API_BASE || ''}/api/admin/users`, { headers });
-      if (usersRes.ok) {
-        const usersData = await usersRes.json();
-        setUsers(usersData.users || []);
-      }
-
       // Fetch role requests
       const requestsRes = await fetch(`${API_BASE || ''}/api/admin/role-requests`, { headers });
       if (requestsRes.ok) {
@@ -71,6 +103,7 @@ export default function UserManagement() {
       if (response.ok) {
         toast.success('Role request approved!');
         fetchData();
+        fetchUsers();
       } else {
         const error = await response.json();
         toast.error(error.message || 'Failed to approve request');
@@ -220,7 +253,7 @@ export default function UserManagement() {
                 : 'border-transparent text-slate-500 hover:text-slate-700 hover:border-slate-300'
             }`}
           >
-            All Users ({users.length})
+            All Users{stats ? ` (${stats.users.total})` : ''}
           </button>
           <button
             onClick={() => setActiveTab('requests')}
@@ -300,7 +333,28 @@ export default function UserManagement() {
       {/* Users Tab */}
       {activeTab === 'users' && (
         <Card className="p-6">
-          <h3 className="text-lg font-semibold text-slate-900 mb-4">All Users</h3>
+          <div className="flex flex-col md:flex-row md:items-center md:justify-between gap-3 mb-4">
+            <h3 className="text-lg font-semibold text-slate-900">All Users</h3>
+            <div className="flex gap-2">
+              <Input
+                placeholder="Search email or username..."
+                value={userSearch}
+                onChange={(e) => setUserSearch(e.target.value)}
+                className="w-64"
+              />
+              <select
+                value={roleFilter}
+                onChange={(e) => setRoleFilter(e.target.value)}
+                className="border border-slate-300 rounded-md px-3 py-2 text-sm"
+              >
+                <option value="">All roles</option>
+                <option value="student">Students</option>
+                <option value="lecturer">Lecturers</option>
+                <option value="manager">Managers</option>
+                <option value="admin">Admins</option>
+              </select>
+            </div>
+          </div>
           <div className="overflow-x-auto">
             <table className="w-full">
               <thead>
@@ -346,7 +400,17 @@ export default function UserManagement() {
                 ))}
               </tbody>
             </table>
+            {users.length === 0 && !loadingUsers && (
+              <p className="text-center text-slate-500 py-8">No users found</p>
+            )}
           </div>
+          {nextCursor && (
+            <div className="flex justify-center mt-4">
+              <Button variant="outline" onClick={() => fetchUsers(nextCursor)} disabled={loadingUsers}>
+                {loadingUsers ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </Card>
       )}
 